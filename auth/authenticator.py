@@ -1,34 +1,40 @@
+import time
 from asyncio import sleep
 from pathlib import Path
+from typing import Optional
 
 from loguru import logger
 from selenium.common import TimeoutException, NoSuchElementException
-from selenium.webdriver import Chrome
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 
+from auth.session_store import SessionStore, StoredSession, is_login_response
 from captcha.captcha_resolver import CaptchaResolver
 from config.configuration import AUTH_TIMER_THRESHOLD_SECONDS, AUTHENTICATOR_MODE, EUID_KEY_PASSWORD, EUID_KEY_PATH, \
-    AUTH_RETRY_THRESHOLD
+    AUTH_RETRY_THRESHOLD, HSC_BASE_URL
 from exceptions.exceptions import AuthenticationException
 from notification.notifier import Notifier
+from utils.async_driver import AsyncDriver
 from utils.driver_utils import take_screenshot
 
 
 class Authenticator:
 
-    def __init__(self, driver: Chrome, notifier: Notifier, captcha_resolver: CaptchaResolver):
+    def __init__(self, driver: AsyncDriver, notifier: Notifier, captcha_resolver: CaptchaResolver,
+                 session_store: Optional[SessionStore] = None):
         self.driver = driver
         self.captcha_resolver = captcha_resolver
-        self.driver_wait = WebDriverWait(driver=self.driver, timeout=30)
         self.notifier = notifier
+        self.session_store = session_store
+        self.authenticated_at: Optional[float] = None
 
     async def try_authenticate(self) -> bool:
-        logger.info("Authentication to https://eq.hsc.gov.ua/ started...")
+        if self.session_store and await self.try_restore_session():
+            return True
+
+        logger.info(f"Authentication to {HSC_BASE_URL} started...")
 
         for i in range(AUTH_RETRY_THRESHOLD):
-            self.driver.get("https://eq.hsc.gov.ua/")
+            await self.driver.get(f"{HSC_BASE_URL}/")
 
             try:
                 if AUTHENTICATOR_MODE == 'BANK_ID':
@@ -36,8 +42,8 @@ class Authenticator:
                 else:
                     await self.euid_authenticate()
 
-                if await self.captcha_resolver.has_captcha():
-                    await self.captcha_resolver.resolve_captcha_code()
+                await self._pass_captcha()
+                await self._remember_session(time.time())
 
                 return True
             except (NoSuchElementException, TimeoutException):
@@ -45,76 +51,115 @@ class Authenticator:
                 continue
 
         await take_screenshot(self.driver)
-        raise AuthenticationException("Cannot authenticate to site 'https://eq.hsc.gov.ua/'. Retries limit exceeded.")
+        raise AuthenticationException(f"Cannot authenticate to site '{HSC_BASE_URL}'. Retries limit exceeded.")
+
+    async def try_restore_session(self) -> bool:
+        stored_session = self.session_store.load()
+
+        if not stored_session:
+            return False
+
+        logger.info(f"Restoring stored session ({len(stored_session.cookies)} cookies)...")
+
+        if not await self.adopt_session(stored_session):
+            logger.info("Stored session is expired. Performing authentication...")
+            await self.clear_session()
+            return False
+
+        logger.success(f"Restored stored session to {HSC_BASE_URL} successfully!")
+        return True
+
+    async def adopt_session(self, session: StoredSession) -> bool:
+        # Cookies could be added only for currently opened domain
+        await self.driver.get(HSC_BASE_URL)
+        await self.driver.delete_all_cookies()
+        for cookie in session.cookies:
+            await self.driver.add_cookie(cookie)
+
+        # Single page load tells if server still accepts the session
+        await self.driver.get(f"{HSC_BASE_URL}/site/step0")
+        current_url = await self.driver.current_url()
+        page_source = await self.driver.page_source()
+
+        if 'captcha' not in current_url and (not current_url.startswith(f"{HSC_BASE_URL}/site/step0")
+                                             or is_login_response(200, None, page_source)):
+            return False
+
+        await self._pass_captcha()
+        await self._remember_session(session.authenticated_at)
+        return True
+
+    async def save_session(self):
+        if self.session_store and self.authenticated_at:
+            self.session_store.save(StoredSession(cookies=await self.driver.get_cookies(),
+                                                  authenticated_at=self.authenticated_at))
+
+    async def clear_session(self):
+        if self.session_store:
+            self.session_store.clear()
+
+        self.authenticated_at = None
+        await self.driver.delete_all_cookies()
+
+    async def _remember_session(self, authenticated_at: float):
+        # Session age is kept across restores, so its expiry could be expected ahead of time
+        self.authenticated_at = authenticated_at
+        await self.save_session()
+
+    async def _pass_captcha(self):
+        # Page was changed during authentication, so previously known captcha state is not relevant anymore
+        self.captcha_resolver.state_tracker.invalidate()
+
+        if await self.captcha_resolver.has_captcha():
+            await self.captcha_resolver.resolve_captcha_code()
 
     async def bank_id_authenticate(self):
         # Authorize via bank id
-        self.driver_wait.until(
-            EC.element_to_be_clickable(
-                self.driver.find_element(by=By.CSS_SELECTOR, value="input[type=checkbox]"))).click()
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.CLASS_NAME, value="btn-hsc-green_s"))).click()
-        self.driver_wait.until(EC.element_to_be_clickable(
-            self.driver.find_element(by=By.CSS_SELECTOR, value="a[href='/bankid-nbu-auth']"))).click()
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.ID, value="selBankConnect-button"))).click()
-        self.driver_wait.until(EC.element_to_be_clickable(self.driver.find_element(by=By.XPATH, value="//div[contains(text(), 'УНІВЕРСАЛ БАНК')]"))).click()
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.ID, value="btnBankIDChoose"))).click()
+        await self.driver.click_when_clickable(by=By.CSS_SELECTOR, value="input[type=checkbox]")
+        await self.driver.click_when_clickable(by=By.CLASS_NAME, value="btn-hsc-green_s")
+        await self.driver.click_when_clickable(by=By.CSS_SELECTOR, value="a[href='/bankid-nbu-auth']")
+        await self.driver.click_when_clickable(by=By.ID, value="selBankConnect-button")
+        await self.driver.click_when_clickable(by=By.XPATH, value="//div[contains(text(), 'УНІВЕРСАЛ БАНК')]")
+        await self.driver.click_when_clickable(by=By.ID, value="btnBankIDChoose")
         await sleep(5)
-        authentication_link = self.driver_wait.until(EC.visibility_of(self.driver.find_element(by=By.ID, value="qrcode"))).get_attribute("title")
+        qrcode_element = await self.driver.wait_visible(by=By.ID, value="qrcode")
+        authentication_link = await self.driver.get_attribute(qrcode_element, "title")
         # Send authorization link via telegram bot
         await self.notifier.notify_wait_auth(authentication_link)
         logger.info("Sent authentication link via telegram bot! Waiting for approval...")
-        # Wait until button would be ready
-        self.driver.implicitly_wait(AUTH_TIMER_THRESHOLD_SECONDS)
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.ID, value="btnAcceptUserDataAgreement"))
-        ).click()
-        self.driver.implicitly_wait(0)
-        logger.success("Authorized to https://eq.hsc.gov.ua/ successfully!")
+        # Wait until button would be ready (blocks browser thread only, event loop keeps serving bot updates)
+        await self.driver.implicitly_wait(AUTH_TIMER_THRESHOLD_SECONDS)
+        await self.driver.click_when_clickable(by=By.ID, value="btnAcceptUserDataAgreement")
+        await self.driver.implicitly_wait(0)
+        logger.success(f"Authorized to {HSC_BASE_URL} successfully!")
         await self.notifier.notify_auth_success()
 
     async def euid_authenticate(self):
         # Authorize via euid key
-        self.driver_wait.until(
-            EC.element_to_be_clickable(
-                self.driver.find_element(by=By.CSS_SELECTOR, value="input[type=checkbox]")
-            )
-        ).click()
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.CLASS_NAME, value="btn-hsc-green_s"))).click()
+        await self.driver.click_when_clickable(by=By.CSS_SELECTOR, value="input[type=checkbox]")
+        await self.driver.click_when_clickable(by=By.CLASS_NAME, value="btn-hsc-green_s")
 
-        self.driver_wait.until(EC.element_to_be_clickable(
-            self.driver.find_element(by=By.CSS_SELECTOR, value="a[href='/euid-auth-js']"))).click()
+        await self.driver.click_when_clickable(by=By.CSS_SELECTOR, value="a[href='/euid-auth-js']")
 
         # Upload key file
         key_file_path = Path(EUID_KEY_PATH).absolute().__str__()
         # Somehow this action trick id-gov system, and it thinks that something was uploaded in natural way
-        self.driver_wait.until(
-            EC.visibility_of(
-                self.driver.find_element(by=By.XPATH, value="//span[text()='оберіть його на своєму носієві']")
-            )
-        ).click()
-        key_input = self.driver.find_element(by=By.ID, value="PKeyFileInput")
-        key_input.send_keys(key_file_path)
+        await self.driver.click(
+            await self.driver.wait_visible(by=By.XPATH, value="//span[text()='оберіть його на своєму носієві']")
+        )
+        key_input = await self.driver.find_element(by=By.ID, value="PKeyFileInput")
+        await self.driver.send_keys(key_input, key_file_path)
 
         # Input password for key
-        pwd_input = self.driver.find_element(by=By.ID, value="PKeyPassword")
-        pwd_input.send_keys(EUID_KEY_PASSWORD)
+        pwd_input = await self.driver.find_element(by=By.ID, value="PKeyPassword")
+        await self.driver.send_keys(pwd_input, EUID_KEY_PASSWORD)
 
-        self.driver_wait.until(
-            EC.element_to_be_clickable(
-                self.driver.find_element(by=By.ID, value="id-app-login-sign-form-file-key-sign-button")
-            )
-        ).click()
+        await self.driver.click_when_clickable(by=By.ID, value="id-app-login-sign-form-file-key-sign-button")
 
         # Wait until button would be ready
-        self.driver.implicitly_wait(30)
-        self.driver_wait.until(
-            EC.element_to_be_clickable(self.driver.find_element(by=By.ID, value="btnAcceptUserDataAgreement"))
-        ).click()
-        self.driver.implicitly_wait(0)
+        await self.driver.implicitly_wait(30)
+        await self.driver.click_when_clickable(by=By.ID, value="btnAcceptUserDataAgreement")
+        await self.driver.implicitly_wait(0)
 
-        logger.success("Authorized to https://eq.hsc.gov.ua/ successfully!")
+        logger.success(f"Authorized to {HSC_BASE_URL} successfully!")
         await self.notifier.notify_auth_success()
@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from cryptography.fernet import Fernet, InvalidToken
+from loguru import logger
+
+from config.configuration import SESSION_STORE_FILE, SESSION_STORE_KEY, SESSION_STORE_KEY_FILE
+
+# Environment variable with session encryption key, checked when key is not set in configuration
+SESSION_STORE_KEY_ENV = 'HSC_SESSION_STORE_KEY'
+
+# Links of authentication methods, they are rendered on login page only
+LOGIN_PAGE_MARKERS = ('/bankid-nbu-auth', '/euid-auth-js')
+
+
+def is_login_response(status: Optional[int], location: Optional[str], content: str) -> bool:
+    if status == 401:
+        return True
+
+    # Captcha is served via redirect as well, any other redirect away from site pages leads to login
+    if status in (301, 302, 303, 307) and location and 'captcha' not in location:
+        return True
+
+    return any(marker in content for marker in LOGIN_PAGE_MARKERS)
+
+
+class StoredSession:
+    def __init__(self, cookies: list[dict], authenticated_at: float):
+        self.cookies = cookies
+        self.authenticated_at = authenticated_at
+
+
+# Keeps authenticated session cookies encrypted on disk, so restart doesn't require new login
+class SessionStore:
+    def __init__(self, file_path: str = SESSION_STORE_FILE, key: str = SESSION_STORE_KEY,
+                 key_file_path: str = SESSION_STORE_KEY_FILE):
+        self.file_path = Path(file_path)
+        self.fernet = Fernet(
+            key or os.environ.get(SESSION_STORE_KEY_ENV) or self._load_or_create_key(Path(key_file_path).expanduser())
+        )
+
+    @classmethod
+    def for_chat(cls, chat_id: int) -> 'SessionStore':
+        # Every chat searches with its own authenticated session
+        file_path = Path(SESSION_STORE_FILE)
+        return cls(file_path=str(file_path.with_name(f"{file_path.stem}_{chat_id}{file_path.suffix}")))
+
+    def load(self) -> Optional[StoredSession]:
+        if not self.file_path.exists():
+            return None
+
+        try:
+            payload = json.loads(self.fernet.decrypt(self.file_path.read_bytes()))
+        except (InvalidToken, ValueError) as e:
+            logger.warning(f"Cannot read stored session from '{self.file_path}': {str(e) or type(e).__name__}")
+            return None
+
+        now = time.time()
+        cookies = [cookie for cookie in payload['cookies'] if cookie.get('expiry', now + 1) > now]
+
+        return StoredSession(cookies=cookies, authenticated_at=payload['authenticated_at']) if cookies else None
+
+    def save(self, session: StoredSession):
+        payload = {'cookies': session.cookies, 'authenticated_at': session.authenticated_at}
+        temp_path = self.file_path.with_suffix('.tmp')
+        temp_path.write_bytes(self.fernet.encrypt(json.dumps(payload).encode()))
+        os.chmod(temp_path, 0o600)
+        os.replace(temp_path, self.file_path)
+        logger.info(f"Session cookies stored to '{self.file_path}' ({len(session.cookies)} cookies)")
+
+    def clear(self):
+        self.file_path.unlink(missing_ok=True)
+
+    @staticmethod
+    def _load_or_create_key(key_file_path: Path) -> bytes:
+        if key_file_path.absolute().parent == Path(SESSION_STORE_FILE).absolute().parent:
+            logger.warning(f"Session encryption key '{key_file_path}' is kept next to session files. "
+                           f"Move it elsewhere or set {SESSION_STORE_KEY_ENV} environment variable.")
+
+        if key_file_path.exists():
+            return key_file_path.read_bytes().strip()
+
+        key = Fernet.generate_key()
+        key_file_path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        # Key file is created readable by owner only, it's never visible with wider permissions
+        descriptor = os.open(key_file_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(key)
+        logger.info(f"Generated session encryption key into '{key_file_path}'")
+        return key
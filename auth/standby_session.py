@@ -0,0 +1,112 @@
+import asyncio
+import time
+from typing import Optional
+
+from loguru import logger
+
+from auth.authenticator import Authenticator
+from auth.session_store import StoredSession
+from captcha.captcha_resolver import CaptchaResolver
+from captcha.token_pool import CaptchaTokenPool
+from config.configuration import SESSION_EXPECTED_LIFETIME_HOURS, STANDBY_SESSION_LEAD_SECONDS, \
+    STANDBY_SESSION_RETRY_DELAY_SECONDS
+from notification.notifier import Notifier
+from utils.browser_pool import BrowserPool
+from utils.driver_utils import cleanup_browser
+
+BROWSER_LEASE_TIMEOUT_SECONDS = 60
+
+
+# Authenticates new session in second pooled browser ahead of expected expiry of the active one.
+# Active session keeps polling meanwhile, and new session cookies are handed over once they're ready.
+class StandbySession:
+    def __init__(self, browser_pool: BrowserPool, notifier: Notifier,
+                 captcha_token_pool: Optional[CaptchaTokenPool] = None,
+                 lead_seconds: float = STANDBY_SESSION_LEAD_SECONDS,
+                 retry_delay_seconds: float = STANDBY_SESSION_RETRY_DELAY_SECONDS):
+        self.browser_pool = browser_pool
+        self.notifier = notifier
+        self.captcha_token_pool = captcha_token_pool
+        self.lead_seconds = lead_seconds
+        self.retry_delay_seconds = retry_delay_seconds
+        self.session_lifetime_seconds = SESSION_EXPECTED_LIFETIME_HOURS * 3600
+        self.next_attempt_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self.task is not None
+
+    @property
+    def ready(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    def expected_expiry(self, authenticator: Authenticator) -> Optional[float]:
+        if not authenticator.authenticated_at:
+            return None
+
+        return authenticator.authenticated_at + self.session_lifetime_seconds
+
+    def maybe_start(self, authenticator: Authenticator):
+        expected_expiry = self.expected_expiry(authenticator)
+        now = time.time()
+
+        if self.task or not expected_expiry or now < max(expected_expiry - self.lead_seconds, self.next_attempt_at):
+            return
+
+        logger.info(f"Session is expected to expire in {max(0.0, expected_expiry - now) / 60:.0f} minutes. "
+                    f"Starting standby authentication...")
+        self.task = asyncio.create_task(self._authenticate())
+
+    def record_expiry(self, authenticator: Authenticator):
+        if not authenticator.authenticated_at:
+            return
+
+        # Next standby authentication is planned by actually observed session lifetime
+        self.session_lifetime_seconds = time.time() - authenticator.authenticated_at
+        logger.info(f"Session expired after {self.session_lifetime_seconds / 3600:.1f} hours")
+
+    async def take(self) -> Optional[StoredSession]:
+        if not self.task:
+            return None
+
+        try:
+            return await self.task
+        finally:
+            self.task = None
+
+    async def cancel(self):
+        if self.task:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    async def _authenticate(self) -> Optional[StoredSession]:
+        try:
+            browser = await self.browser_pool.lease(timeout=BROWSER_LEASE_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning("No browser available for standby authentication. Trying again later...")
+            self.next_attempt_at = time.time() + self.retry_delay_seconds
+            return None
+
+        recycle = False
+
+        try:
+            captcha_resolver = CaptchaResolver(driver=browser.driver, token_pool=self.captcha_token_pool)
+            authenticator = Authenticator(driver=browser.driver, notifier=self.notifier, captcha_resolver=captcha_resolver)
+            await authenticator.try_authenticate()
+
+            logger.success("Standby session is authenticated and ready for promotion")
+            return StoredSession(cookies=await browser.driver.get_cookies(), authenticated_at=authenticator.authenticated_at)
+        except asyncio.CancelledError:
+            recycle = True
+            raise
+        except Exception as e:
+            logger.error(f"Standby authentication failed: {str(e)}. Trying again later...")
+            self.next_attempt_at = time.time() + self.retry_delay_seconds
+            return None
+        finally:
+            if not recycle:
+                recycle = not await cleanup_browser(browser.driver)
+
+            await self.browser_pool.release(browser, recycle=recycle)
@@ -0,0 +1,267 @@
+import asyncio
+import html
+import json
+import random
+import secrets
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+
+from loguru import logger
+
+# Smallest valid PDF document, enough for ticket download emulation
+TICKET_PDF = (b"%PDF-1.1\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n"
+              b"trailer<</Root 1 0 R>>\n%%EOF\n")
+
+
+class SlotRelease:
+    def __init__(self, after_seconds: float, office_id: int, date: str, times: list[str]):
+        self.after_seconds = after_seconds
+        self.office_id = office_id
+        self.date = date
+        self.times = times
+
+
+class FakeSlot:
+    def __init__(self, slot_id: int, office_id: int, date: str, ch_time: str, taken_by_competitor_at: Optional[float]):
+        self.id = slot_id
+        self.office_id = office_id
+        self.date = date
+        self.ch_time = ch_time
+        self.taken_by_competitor_at = taken_by_competitor_at
+        self.taken_by: Optional[str] = None
+
+
+class FakeSiteSession:
+    def __init__(self):
+        self.csrf_token = secrets.token_hex(16)
+        self.freetimes_requests = 0
+        self.captcha_pending = False
+
+
+# Local stand-in for eq.hsc.gov.ua pages and XHR endpoints used by search, with configurable latency,
+# slot release schedule, captcha frequency and competing bookers
+class FakeHscSite:
+    def __init__(self, office_ids: list[int], dates: list[str], releases: list[SlotRelease],
+                 latency_seconds: tuple[float, float] = (0.05, 0.15), captcha_every_requests: int = 0,
+                 competitor_delay_seconds: Optional[float] = None, seed: Optional[int] = None):
+        self.office_ids = office_ids
+        self.dates = dates
+        self.pending_releases = sorted(releases, key=lambda release: release.after_seconds)
+        self.latency_seconds = latency_seconds
+        self.captcha_every_requests = captcha_every_requests
+        self.competitor_delay_seconds = competitor_delay_seconds
+        self.random = random.Random(seed)
+
+        self.sessions: dict[str, FakeSiteSession] = {}
+        self.slots: dict[int, FakeSlot] = {}
+        self.next_slot_id = 1
+        self.started_at = time.monotonic()
+        self.server: Optional[asyncio.Server] = None
+        self.connections: dict[asyncio.Task, asyncio.StreamWriter] = {}
+        self.base_url = ''
+
+        self.requests: Counter = Counter()
+        self.captcha_triggers = 0
+        self.captcha_redirects = 0
+        self.released_slots = 0
+        self.approved_slots: set[int] = set()
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        self.server = await asyncio.start_server(self._handle, host=host, port=port)
+        self.started_at = time.monotonic()
+        self.base_url = f"http://{host}:{self.server.sockets[0].getsockname()[1]}"
+        logger.info(f"Fake HSC site started on {self.base_url}")
+        return self.base_url
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+
+            # Kept alive connections are closed, so their handlers finish before event loop is closed
+            for writer in self.connections.values():
+                writer.close()
+            await asyncio.gather(*self.connections, return_exceptions=True)
+
+            await self.server.wait_closed()
+            self.server = None
+
+    def stats(self) -> dict:
+        taken = Counter(slot.taken_by for slot in self.slots.values() if slot.taken_by)
+        return {
+            'requests': dict(self.requests),
+            'captcha_triggers': self.captcha_triggers,
+            'captcha_redirects': self.captcha_redirects,
+            'released_slots': self.released_slots,
+            'reserved_slots': taken.get('user', 0),
+            'approved_slots': len(self.approved_slots),
+            'taken_by_competitors': taken.get('competitor', 0),
+        }
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections[asyncio.current_task()] = writer
+
+        try:
+            # Connections are kept alive, as HTTP client reuses them between probes
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                method, target, _ = request_line.decode().split(' ', 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode().partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                await asyncio.sleep(self.random.uniform(*self.latency_seconds))
+
+                status, response_headers, payload = self._route(method, target, headers, body.decode())
+                response_headers = {'Content-Length': str(len(payload)), **response_headers}
+                writer.write(f"HTTP/1.1 {status}\r\n".encode() +
+                             ''.join(f"{name}: {value}\r\n" for name, value in response_headers.items()).encode() +
+                             b"\r\n" + payload)
+                await writer.drain()
+
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            self.connections.pop(asyncio.current_task(), None)
+
+    def _route(self, method: str, target: str, headers: dict, body: str) -> tuple[str, dict, bytes]:
+        self._apply_schedule()
+
+        url = urlsplit(target)
+        path = url.path
+        self.requests[path] += 1
+
+        cookies = dict(part.strip().split('=', 1) for part in headers.get('cookie', '').split(';') if '=' in part)
+        session = self.sessions.get(cookies.get('PHPSESSID', ''))
+
+        if path == '/site/step0' and not session:
+            session_id = secrets.token_hex(16)
+            self.sessions[session_id] = session = FakeSiteSession()
+            return self._page(session, '<h1>step0</h1>', {'Set-Cookie': f'PHPSESSID={session_id}; Path=/'})
+
+        if not session:
+            # Same as expired session on real site
+            return '302 Found', {'Location': '/'}, b''
+
+        if path == '/site/captcha':
+            if method == 'POST':
+                session.captcha_pending = False
+                return '302 Found', {'Location': '/site/step0'}, b''
+
+            return self._page(session, '<iframe title="reCAPTCHA"></iframe><input id="g-recaptcha-response">')
+
+        # Reservation request is not gated, since captcha is triggered by free slots polling
+        if session.captcha_pending and path != '/site/reservecherga':
+            self.captcha_redirects += 1
+            return '302 Found', {'Location': '/site/captcha'}, b''
+
+        if path == '/site/step0':
+            return self._page(session, '<h1>step0</h1>')
+
+        if path == '/site/step1' and parse_qs(url.query).get('value') == ['55']:
+            params = [html.escape(json.dumps({'chdate': date, 'question_id': 55})) for date in self.dates]
+            return self._page(session, ''.join(f'<a href="#" data-params="{value}">{value}</a>' for value in params))
+
+        if path == '/site/step3':
+            return self._reservation_page(session, parse_qs(url.query).get('id', ['0'])[0])
+
+        if path == '/site/approve':
+            return self._approve(session, parse_qs(url.query).get('id', ['0'])[0])
+
+        if path == '/site/mpdf':
+            return '200 OK', {'Content-Type': 'application/pdf'}, TICKET_PDF
+
+        if method != 'POST' or headers.get('x-csrf-token') != session.csrf_token:
+            return '400 Bad Request', {'Content-Type': 'text/html'}, b'<h1>Bad Request</h1>'
+
+        form = {name: values[0] for name, values in parse_qs(body).items()}
+
+        if path == '/site/freetimes':
+            return self._freetimes(session, form)
+
+        if path == '/site/reservecherga':
+            return self._reserve(form)
+
+        return '404 Not Found', {'Content-Type': 'text/html'}, b'<h1>Not Found</h1>'
+
+    def _freetimes(self, session: FakeSiteSession, form: dict) -> tuple[str, dict, bytes]:
+        session.freetimes_requests += 1
+
+        if self.captcha_every_requests and session.freetimes_requests % self.captcha_every_requests == 0:
+            session.captcha_pending = True
+            self.captcha_triggers += 1
+            self.captcha_redirects += 1
+            return '302 Found', {'Location': '/site/captcha'}, b''
+
+        rows = [
+            {'id': slot.id, 'chtime': slot.ch_time}
+            for slot in self.slots.values()
+            if not slot.taken_by and slot.office_id == int(form.get('office_id', 0))
+            and slot.date == form.get('date_of_admission')
+        ]
+
+        return '200 OK', {'Content-Type': 'application/json'}, json.dumps({'rows': rows}).encode()
+
+    def _reserve(self, form: dict) -> tuple[str, dict, bytes]:
+        slot = self.slots.get(int(form.get('id_chtime', 0)))
+
+        if not slot or slot.taken_by:
+            return '200 OK', {'Content-Type': 'text/html'}, b'error01'
+
+        slot.taken_by = 'user'
+        return '200 OK', {'Content-Type': 'text/html', 'X-Redirect': f"{self.base_url}/site/step3?id={slot.id}"}, b''
+
+    def _reservation_page(self, session: FakeSiteSession, slot_id: str) -> tuple[str, dict, bytes]:
+        slot = self.slots.get(int(slot_id)) if slot_id.isdigit() else None
+
+        if not slot or slot.taken_by != 'user':
+            return '404 Not Found', {'Content-Type': 'text/html'}, b'<h1>Not Found</h1>'
+
+        return self._page(session, f'<a class="btn btn-hsc-green" href="/site/approve?id={slot.id}">Approve</a>')
+
+    def _approve(self, session: FakeSiteSession, slot_id: str) -> tuple[str, dict, bytes]:
+        slot = self.slots.get(int(slot_id)) if slot_id.isdigit() else None
+
+        if not slot or slot.taken_by != 'user':
+            return '404 Not Found', {'Content-Type': 'text/html'}, b'<h1>Not Found</h1>'
+
+        self.approved_slots.add(slot.id)
+        # Same as tickets page of real site: every approved reservation has its date and PDF link
+        slot_date = datetime.strptime(slot.date, '%Y-%m-%d').strftime('%d.%m.%y')
+        return self._page(session, f'<div><strong>ДАТА {slot_date} ЧАС {slot.ch_time}</strong>'
+                                   f'<a href="/site/mpdf?id={slot.id}">Талон</a></div>')
+
+    def _apply_schedule(self):
+        now = time.monotonic()
+        elapsed = now - self.started_at
+
+        while self.pending_releases and self.pending_releases[0].after_seconds <= elapsed:
+            release = self.pending_releases.pop(0)
+
+            for ch_time in release.times:
+                competitor_at = now + self.random.expovariate(1 / self.competitor_delay_seconds) \
+                    if self.competitor_delay_seconds else None
+                self.slots[self.next_slot_id] = FakeSlot(self.next_slot_id, release.office_id, release.date, ch_time,
+                                                         taken_by_competitor_at=competitor_at)
+                self.next_slot_id += 1
+                self.released_slots += 1
+
+        for slot in self.slots.values():
+            if not slot.taken_by and slot.taken_by_competitor_at and slot.taken_by_competitor_at <= now:
+                slot.taken_by = 'competitor'
+
+    @staticmethod
+    def _page(session: FakeSiteSession, content: str, headers: Optional[dict] = None) -> tuple[str, dict, bytes]:
+        page = (f'<html><head><meta name="csrf-token" content="{session.csrf_token}"></head>'
+                f'<body>{content}</body></html>')
+        return '200 OK', {'Content-Type': 'text/html; charset=UTF-8', **(headers or {})}, page.encode()
@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Optional, Callable
+from urllib.parse import urljoin
+
+import httpx
+from loguru import logger
+from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.webdriver.common.by import By
+
+from benchmarks.fake_hsc_server import FakeHscSite, SlotRelease
+from captcha.captcha_state import CaptchaState, CaptchaStateTracker
+from captcha.solve_budget import CaptchaSolveBudget
+from config.configuration import HTTP_REQUEST_TIMEOUT_SECONDS, REQUEST_RATE_LIMIT_PER_SECOND, REQUEST_RATE_LIMIT_BURST
+from exceptions.exceptions import ReservationException
+from model.events import TicketDownloaded
+from model.models import Office
+from monitoring.approval_engine import ApprovalEngine
+from monitoring.http_client import HscHttpClient
+from monitoring.search_controller import SearchFeedbackController
+from monitoring.slot_reserver import SlotReserver
+from monitoring.tenants import SearchSettings
+from storage.trace_recorder import TraceRecorder
+from utils.event_bus import EventBus
+from utils.histogram import LatencyHistogram
+from utils.rate_limiter import TokenBucketRateLimiter
+
+# Metrics compared with baseline, all of them are better when lower
+COMPARED_METRICS = ('sweep_p50', 'sweep_p95', 'detection_to_reservation_p50', 'detection_to_reservation_p95',
+                    'detection_to_ticket_p50', 'detection_to_ticket_p95', 'requests_per_found_slot',
+                    'captcha_triggers_per_hour')
+# Request rate of benchmark run by default. Production rate limit is tuned for real release times, fake site releases
+# slots every few seconds, so it would find nothing.
+BENCHMARK_RATE_PER_SECOND = 2
+
+
+# There is no browser in benchmark, so site session is opened over HTTP directly
+class BenchmarkHttpClient(HscHttpClient):
+    def __init__(self, base_url: str):
+        super().__init__(driver=None, base_url=base_url)
+
+    async def sync_session(self):
+        # Site session (and captcha state bound to it) survives re-sync, same as browser cookies
+        cookies = self.client.cookies if self.client else None
+        await self.close()
+        self.client = httpx.AsyncClient(base_url=self.base_url, cookies=cookies, timeout=HTTP_REQUEST_TIMEOUT_SECONDS,
+                                        follow_redirects=False)
+
+        response = await self.client.get('/site/step0')
+        match = re.search(r'name="csrf-token" content="([^"]+)"', response.text)
+        self.csrf_token = match.group(1) if match else None
+
+
+# Solves captcha of fake site after fixed delay, which stands for solver service latency
+class BenchmarkCaptchaResolver:
+    def __init__(self, http_client: BenchmarkHttpClient, solve_seconds: float, solve_budget: CaptchaSolveBudget):
+        self.http_client = http_client
+        self.solve_seconds = solve_seconds
+        self.solve_budget = solve_budget
+        self.state_tracker = CaptchaStateTracker()
+
+    async def has_captcha(self) -> bool:
+        response = await self.http_client.client.get('/site/step0')
+        pending = 'captcha' in response.headers.get('Location', '')
+        self.state_tracker.mark(CaptchaState.PENDING if pending else CaptchaState.CLEAR)
+        return pending
+
+    def expected_solve_seconds(self) -> float:
+        return self.solve_seconds
+
+    async def resolve_captcha_code(self):
+        await self.solve_budget.acquire()
+        await asyncio.sleep(self.solve_seconds)
+        await self.http_client.post_xhr('/site/captcha', {'g-recaptcha-response': 'benchmark'})
+        self.state_tracker.mark(CaptchaState.CLEAR)
+
+
+class BenchmarkElement:
+    def __init__(self, page: 'BenchmarkPage', markup: str, href: Optional[str] = None):
+        self.page = page
+        self.markup = markup
+        self.href = urljoin(page.current_url, href) if href else None
+
+    def is_displayed(self) -> bool:
+        return True
+
+    def find_element(self, by: str, value: str) -> 'BenchmarkElement':
+        return self.page.find_element(by, value, markup=self.markup)
+
+
+# Page loaded by benchmark driver. Elements are looked up in markup by the few locators approval and ticket download use.
+class BenchmarkPage:
+    def __init__(self, url: str, markup: str):
+        self.current_url = url
+        self.markup = markup
+
+    def find_element(self, by: str, value: str, markup: Optional[str] = None) -> BenchmarkElement:
+        markup = self.markup if markup is None else markup
+
+        if by == By.CLASS_NAME:
+            match = re.search(rf'<a class="[^"]*\b{re.escape(value)}\b[^"]*" href="([^"]+)"', markup)
+            if match:
+                return BenchmarkElement(self, match.group(0), href=match.group(1))
+        elif by == By.XPATH and (text := re.search(r"contains\(text\(\), '([^']+)'\)", value)):
+            match = re.search(rf'<div>(?:(?!</div>).)*{re.escape(text.group(1))}.*?</div>', markup)
+            if match:
+                return BenchmarkElement(self, match.group(0))
+        elif by == By.XPATH and (href := re.search(r"contains\(@href, '([^']+)'\)", value)):
+            match = re.search(rf'href="([^"]*{re.escape(href.group(1))}[^"]*)"', markup)
+            if match:
+                return BenchmarkElement(self, match.group(0), href=match.group(1))
+
+        raise NoSuchElementException(f"Element '{value}' not found on {self.current_url}")
+
+
+# Stands for browser during approval: pages of fake site are loaded with the same session as HTTP client,
+# so reservation approval and ticket download run through the same code as in bot
+class BenchmarkDriver:
+    def __init__(self, http_client: BenchmarkHttpClient):
+        self.http_client = http_client
+        self.page = BenchmarkPage('', '')
+
+    async def execute_script(self, script: str, *args):
+        match = re.search(r"location\.href = '([^']+)'", script)
+        if match:
+            await self._load(match.group(1))
+
+    async def execute_cdp_cmd(self, cmd: str, params: dict):
+        return {}
+
+    async def wait_until(self, condition: Callable, timeout: float = 0):
+        # Pages are loaded before wait starts, so condition is checked once
+        try:
+            result = condition(self.page)
+        except NoSuchElementException:
+            result = None
+
+        if not result:
+            raise TimeoutException(f"Condition is not met on {self.page.current_url}")
+
+        return result
+
+    async def run(self, command: str, fn: Callable, *args):
+        return fn(*args)
+
+    async def click(self, element: BenchmarkElement):
+        if element.href:
+            await self._load(element.href)
+
+    async def get_attribute(self, element: BenchmarkElement, name: str) -> Optional[str]:
+        return element.href if name == 'href' else None
+
+    async def save_screenshot(self, file_path: str) -> bool:
+        return False
+
+    async def _load(self, url: str):
+        response = await self.http_client.client.get(url)
+        self.page = BenchmarkPage(str(response.url), response.text)
+
+
+def build_site(args: argparse.Namespace) -> FakeHscSite:
+    rng = random.Random(args.seed)
+    office_ids = list(range(1, args.offices + 1))
+    dates = [(date.today() + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(1, args.dates + 1)]
+    releases = [
+        SlotRelease(after_seconds=after_seconds, office_id=rng.choice(office_ids), date=rng.choice(dates),
+                    times=sorted(f"{rng.randint(8, 17):02d}:{rng.choice(('00', '20', '40'))}"
+                                 for _ in range(args.slots_per_release)))
+        for after_seconds in range(args.release_interval, args.duration, args.release_interval)
+    ]
+
+    return FakeHscSite(office_ids=office_ids, dates=dates, releases=releases,
+                       latency_seconds=(args.min_latency, args.max_latency),
+                       captcha_every_requests=args.captcha_every_requests,
+                       competitor_delay_seconds=args.competitor_delay or None, seed=args.seed)
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    site = build_site(args)
+    base_url = await site.start()
+
+    http_client = BenchmarkHttpClient(base_url=base_url)
+    await http_client.sync_session()
+
+    settings = SearchSettings(chat_id=0, offices=[
+        Office(office_id=office_id, name=f"Office {office_id}", address='', latitude=50.45, longitude=30.52)
+        for office_id in site.office_ids
+    ])
+    tickets = []
+    event_bus = EventBus()
+    event_bus.subscribe('tickets', tickets.append, TicketDownloaded)
+    event_bus.start()
+    trace_recorder = TraceRecorder(args.record_trace) if args.record_trace else None
+    rate_limiter = TokenBucketRateLimiter(rate_per_second=args.rate, capacity=REQUEST_RATE_LIMIT_BURST)
+    # Every run starts with full captcha budget
+    solve_budget = CaptchaSolveBudget()
+    search_controller = SearchFeedbackController(rate_limiter=rate_limiter, solve_budget=solve_budget)
+    slot_reserver = SlotReserver(driver=BenchmarkDriver(http_client), event_bus=event_bus,
+                                 captcha_resolver=BenchmarkCaptchaResolver(http_client, args.captcha_solve_seconds, solve_budget),
+                                 settings=settings, http_client=http_client, trace_recorder=trace_recorder,
+                                 rate_limiter=rate_limiter, search_controller=search_controller)
+    approval_engine = ApprovalEngine(slot_reserver=slot_reserver)
+
+    sweeps = LatencyHistogram()
+    detection_to_reservation = LatencyHistogram()
+    detection_to_ticket = LatencyHistogram()
+    found_slot_ids = set()
+    lost = 0
+
+    async def search():
+        nonlocal lost
+
+        while True:
+            sweep_started_at = time.perf_counter()
+            free_slots = await slot_reserver.get_free_slots()
+            sweeps.observe(time.perf_counter() - sweep_started_at)
+
+            if free_slots:
+                found_slot_ids.update(slot.id for slot in free_slots)
+
+                try:
+                    reservation = await slot_reserver.reserve_best_slot(free_slots)
+                    detection_to_reservation.observe(time.time() - reservation.slot.detected_at)
+
+                    # Same as search loop: approval given up early moves on to next ranked candidate
+                    while not await approval_engine.approve(reservation):
+                        reservation = await slot_reserver.reserve_best_slot()
+
+                    # Ticket is downloaded as part of approval
+                    detection_to_ticket.observe(time.time() - reservation.slot.detected_at)
+                except ReservationException:
+                    lost += 1
+
+            await asyncio.sleep(args.poll_interval)
+
+    started_at = time.monotonic()
+
+    try:
+        # Run ends at its duration, even in the middle of sweep or approval
+        await asyncio.wait_for(search(), timeout=args.duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await slot_reserver.close()
+        await event_bus.stop()
+        await http_client.close()
+
+        if trace_recorder:
+            trace_recorder.flush()
+
+        await site.stop()
+
+    elapsed_hours = (time.monotonic() - started_at) / 3600
+    site_stats = site.stats()
+    freetimes_requests = site_stats['requests'].get('/site/freetimes', 0)
+
+    return {
+        'sweeps': sweeps.count,
+        'sweep_p50': sweeps.percentile(0.5),
+        'sweep_p95': sweeps.percentile(0.95),
+        'detection_to_reservation_p50': detection_to_reservation.percentile(0.5),
+        'detection_to_reservation_p95': detection_to_reservation.percentile(0.95),
+        'detection_to_ticket_p50': detection_to_ticket.percentile(0.5),
+        'detection_to_ticket_p95': detection_to_ticket.percentile(0.95),
+        'tickets_downloaded': len(tickets),
+        'found_slots': len(found_slot_ids),
+        'requests_per_found_slot': freetimes_requests / len(found_slot_ids) if found_slot_ids else None,
+        'captcha_triggers_per_hour': site_stats['captcha_triggers'] / elapsed_hours,
+        'lost_reservations': lost,
+        'slots_per_captcha': len(found_slot_ids) / site_stats['captcha_triggers'] if site_stats['captcha_triggers'] else None,
+        'search_controller': search_controller.summary(),
+        **site_stats,
+    }
+
+
+def compare_with_baseline(results: dict, baseline: dict) -> str:
+    lines = []
+
+    for name in COMPARED_METRICS:
+        value, baseline_value = results.get(name), baseline.get(name)
+
+        if value is None or not baseline_value:
+            lines.append(f"  {name}: {value} (baseline {baseline_value})")
+            continue
+
+        change = (value - baseline_value) / baseline_value * 100
+        lines.append(f"  {name}: {value:.3f} vs {baseline_value:.3f} ({change:+.1f}%{' REGRESSION' if change > 10 else ''})")
+
+    return '\n'.join(lines)
+
+
+async def main(args: argparse.Namespace):
+    results = await run_benchmark(args)
+    logger.info("Search benchmark results:\n" + json.dumps(results, indent=2))
+
+    if args.baseline and Path(args.baseline).exists():
+        logger.info("Compared with baseline:\n" + compare_with_baseline(results, json.loads(Path(args.baseline).read_text())))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Runs search, reservation, approval and ticket download end to end '
+                                                 'against local fake HSC site')
+    parser.add_argument('--duration', type=int, default=120, help='Benchmark duration in seconds')
+    parser.add_argument('--offices', type=int, default=2)
+    parser.add_argument('--dates', type=int, default=5)
+    parser.add_argument('--release-interval', type=int, default=20, help='Seconds between slot releases')
+    parser.add_argument('--slots-per-release', type=int, default=2)
+    parser.add_argument('--min-latency', type=float, default=0.05)
+    parser.add_argument('--max-latency', type=float, default=0.2)
+    parser.add_argument('--captcha-every-requests', type=int, default=50, help='0 disables captcha')
+    parser.add_argument('--captcha-solve-seconds', type=float, default=5)
+    parser.add_argument('--competitor-delay', type=float, default=5,
+                        help='Mean seconds until released slot is taken by someone else, 0 disables competitors')
+    parser.add_argument('--poll-interval', type=float, default=3)
+    parser.add_argument('--rate', type=float, default=BENCHMARK_RATE_PER_SECOND,
+                        help=f'Requests per second limit (production limit is {REQUEST_RATE_LIMIT_PER_SECOND:.3f})')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--baseline', help='Results JSON of previous run to compare with')
+    parser.add_argument('--output', help='File to save results JSON to (e.g. as new baseline)')
+    parser.add_argument('--record-trace', help='File to record search trace to (for replay benchmark)')
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
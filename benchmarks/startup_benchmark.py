@@ -0,0 +1,92 @@
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from pathlib import Path
+
+from loguru import logger
+
+from config.configuration import HSC_BASE_URL, HSC_OFFICE_ID
+from monitoring.http_client import HscHttpClient
+from utils.async_driver import AsyncDriver
+from utils.driver_resolver import resolve_chromedriver
+from utils.driver_utils import setup_chrome_driver
+from utils.histogram import LatencyHistogram
+
+# Modules which are expected to be imported on first use only
+LAZY_MODULES = ('selenium_recaptcha_solver', 'twocaptcha', 'webdriver_manager.chrome')
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+started_at = time.perf_counter()
+import main
+print(json.dumps({{
+    'seconds': time.perf_counter() - started_at,
+    'eager_modules': [name for name in {LAZY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def measure_import() -> float:
+    # Fresh interpreter each time, otherwise modules are already imported
+    output = subprocess.run([sys.executable, '-c', IMPORT_SCRIPT], capture_output=True, text=True, check=True,
+                            cwd=PROJECT_ROOT).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+
+    if result['eager_modules']:
+        logger.warning(f"Modules expected to be lazy are imported on startup: {', '.join(result['eager_modules'])}")
+
+    return result['seconds']
+
+
+async def measure_browser(timings: dict[str, LatencyHistogram]):
+    started_at = time.perf_counter()
+    await asyncio.to_thread(resolve_chromedriver)
+    timings['driver_resolve'].observe(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    driver = AsyncDriver(webdriver=await asyncio.to_thread(setup_chrome_driver), name='benchmark')
+    timings['driver_launch'].observe(time.perf_counter() - started_at)
+
+    http_client = HscHttpClient(driver=driver)
+
+    try:
+        started_at = time.perf_counter()
+        await driver.get(HSC_BASE_URL)
+        timings['first_page_load'].observe(time.perf_counter() - started_at)
+
+        started_at = time.perf_counter()
+        await http_client.sync_session()
+        # Browser is not authenticated here, so raw request is sent without login check (site answers with redirect)
+        await http_client.post_xhr('/site/freetimes', {
+            'office_id': HSC_OFFICE_ID or '', 'date_of_admission': (date.today() + timedelta(days=1)).isoformat(),
+            'question_id': 55, 'es_date': '', 'es_time': '',
+        })
+        timings['first_probe'].observe(time.perf_counter() - started_at)
+    finally:
+        await http_client.close()
+        await driver.quit()
+
+
+async def main(runs: int):
+    timings: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+
+    for run in range(runs):
+        timings['import'].observe(measure_import())
+        await measure_browser(timings)
+        # Chromedriver path is resolved once per process, so only the first run shows cold resolution
+        logger.info(f"Startup benchmark run #{run + 1} finished")
+
+    logger.info("Startup benchmark results:\n" +
+                '\n'.join(f"  {stage}: {histogram.summary()}" for stage, histogram in timings.items()))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measures import, browser launch and first probe latency separately')
+    parser.add_argument('--runs', type=int, default=3)
+    asyncio.run(main(parser.parse_args().runs))
@@ -0,0 +1,275 @@
+import argparse
+import asyncio
+import bisect
+import html
+import json
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from benchmarks.virtual_clock import VirtualClock
+from captcha.captcha_state import CaptchaState, CaptchaStateTracker
+from captcha.solve_budget import CaptchaSolveBudget
+from config.configuration import REQUEST_RATE_LIMIT_PER_SECOND, REQUEST_RATE_LIMIT_BURST
+from model.events import SlotsFound, ReservationMade, ReservationFailed
+from model.models import Office
+from monitoring.http_client import HscHttpClient
+from monitoring.polling_scheduler import AdaptivePollingScheduler
+from monitoring.search_controller import SearchFeedbackController
+from monitoring.search_loop import SearchLoop
+from monitoring.slot_reserver import SlotReserver
+from monitoring.tenants import SearchSettings
+from utils.event_bus import EventBus
+from utils.histogram import LatencyHistogram
+from utils.rate_limiter import TokenBucketRateLimiter
+
+# Scheduling policies compared on the same trace
+POLICIES = {
+    'fixed': {'adaptive': False, 'fan_out': False},
+    'adaptive': {'adaptive': True, 'fan_out': False},
+    'fan-out': {'adaptive': False, 'fan_out': True},
+    'adaptive-fan-out': {'adaptive': True, 'fan_out': True},
+}
+
+
+# Timeline of site responses recorded by TraceRecorder. Free slots of (office, date) are known at recorded times only,
+# so between two observations the latest one holds.
+class Trace:
+    def __init__(self, events: list[dict]):
+        self.events = sorted(events, key=lambda event: event['t'])
+        self.start = self.events[0]['t']
+        self.end = self.events[-1]['t']
+
+        self.dates: list[tuple[float, list[str]]] = []
+        self.freetimes: dict[tuple[int, str], list[tuple[float, list[dict]]]] = defaultdict(list)
+        self.first_seen: dict[int, float] = {}
+        self.slot_keys: dict[int, tuple[int, str]] = {}
+        self.taken_at: dict[int, float] = {}
+        self.freetimes_requests = 0
+        self.captcha_redirects = 0
+
+        for event in self.events:
+            if event['kind'] == 'dates':
+                self.dates.append((event['t'], event['dates']))
+            elif event['kind'] == 'freetimes':
+                self._add_freetimes(event)
+            elif event['kind'] == 'reservation' and not event['reserved']:
+                self.taken_at.setdefault(event['slot_id'], event['t'])
+
+    @classmethod
+    def load(cls, file_path: str) -> 'Trace':
+        with open(file_path, encoding='utf-8') as file:
+            return cls([json.loads(line) for line in file if line.strip()])
+
+    def _add_freetimes(self, event: dict):
+        self.freetimes_requests += 1
+
+        if event['status'] == 302:
+            self.captcha_redirects += 1
+
+        if event['rows'] is None:
+            return
+
+        key = (event['office_id'], event['date'])
+        self.freetimes[key].append((event['t'], event['rows']))
+
+        for row in event['rows']:
+            self.first_seen.setdefault(row['id'], event['t'])
+            self.slot_keys[row['id']] = key
+
+    @property
+    def office_ids(self) -> list[int]:
+        return sorted({office_id for office_id, _ in self.freetimes})
+
+    @property
+    def captcha_every_requests(self) -> int:
+        # Captcha frequency of production run, so policies which send more requests get more captchas
+        return self.freetimes_requests // self.captcha_redirects if self.captcha_redirects else 0
+
+    def dates_at(self, moment: float) -> list[str]:
+        index = bisect.bisect_right(self.dates, moment, key=lambda item: item[0])
+
+        if self.dates:
+            return self.dates[max(0, index - 1)][1]
+
+        return sorted({date for _, date in self.freetimes})
+
+    def rows_at(self, office_id: int, date: str, moment: float) -> list[dict]:
+        observations = self.freetimes.get((office_id, date), [])
+        index = bisect.bisect_right(observations, moment, key=lambda item: item[0])
+        return observations[index - 1][1] if index else []
+
+
+# Answers search requests from recorded trace at current (virtual) time
+class ReplayHttpClient(HscHttpClient):
+    def __init__(self, trace: Trace, latency_seconds: float, captcha_every_requests: int):
+        super().__init__(driver=None, base_url='https://replay.local')
+        self.trace = trace
+        self.latency_seconds = latency_seconds
+        self.captcha_every_requests = captcha_every_requests
+        self.captcha_pending = False
+        self.reserved: set[int] = set()
+        self.requests: Counter = Counter()
+        self.captcha_triggers = 0
+
+    async def sync_session(self):
+        self.csrf_token = 'replay'
+
+    async def close(self):
+        pass
+
+    async def get_page(self, path: str) -> httpx.Response:
+        self.requests['page'] += 1
+        await asyncio.sleep(self.latency_seconds)
+
+        links = [html.escape(json.dumps({'chdate': date})) for date in self.trace.dates_at(time.time())]
+        return httpx.Response(200, text=''.join(f'<a data-params="{params}"></a>' for params in links))
+
+    async def get_free_times(self, office_id: int, date: str) -> dict:
+        self.requests['freetimes'] += 1
+        await asyncio.sleep(self.latency_seconds)
+
+        if not self.captcha_pending and self.captcha_every_requests \
+                and self.requests['freetimes'] % self.captcha_every_requests == 0:
+            self.captcha_pending = True
+            self.captcha_triggers += 1
+
+        if self.captcha_pending:
+            return {'content': '', 'status': 302}
+
+        return {'content': json.dumps({'rows': self._free_rows(office_id, date)}), 'status': 200}
+
+    async def reserve(self, slot_id: int, email: str) -> dict:
+        self.requests['reserve'] += 1
+        await asyncio.sleep(self.latency_seconds)
+
+        key = self.trace.slot_keys.get(slot_id)
+        if not key or slot_id not in {row['id'] for row in self._free_rows(*key)}:
+            return {'content': 'error01', 'redirect-to': None}
+
+        self.reserved.add(slot_id)
+        return {'content': '', 'redirect-to': f"{self.base_url}/site/step3?id={slot_id}"}
+
+    def _free_rows(self, office_id: int, date: str) -> list[dict]:
+        now = time.time()
+        return [
+            row for row in self.trace.rows_at(office_id, date, now)
+            if row['id'] not in self.reserved and self.trace.taken_at.get(row['id'], now + 1) > now
+        ]
+
+
+class ReplayCaptchaResolver:
+    def __init__(self, http_client: ReplayHttpClient, solve_seconds: float, solve_budget: CaptchaSolveBudget):
+        self.http_client = http_client
+        self.solve_seconds = solve_seconds
+        self.solve_budget = solve_budget
+        self.state_tracker = CaptchaStateTracker()
+        self.solved = 0
+
+    async def has_captcha(self) -> bool:
+        self.state_tracker.mark(CaptchaState.PENDING if self.http_client.captcha_pending else CaptchaState.CLEAR)
+        return self.http_client.captcha_pending
+
+    async def resolve_captcha_code(self):
+        await self.solve_budget.acquire()
+        await asyncio.sleep(self.solve_seconds)
+        self.http_client.captcha_pending = False
+        self.solved += 1
+        self.state_tracker.mark(CaptchaState.CLEAR)
+
+
+async def replay_search(trace: Trace, adaptive: bool, fan_out: bool, args: argparse.Namespace) -> dict:
+    http_client = ReplayHttpClient(trace, latency_seconds=args.latency,
+                                   captcha_every_requests=args.captcha_every_requests or trace.captcha_every_requests)
+    # Every policy starts with full captcha budget
+    solve_budget = CaptchaSolveBudget()
+    captcha_resolver = ReplayCaptchaResolver(http_client, solve_seconds=args.captcha_solve_seconds,
+                                             solve_budget=solve_budget)
+    settings = SearchSettings(chat_id=0, offices=[
+        Office(office_id=office_id, name=f"Office {office_id}", address='', latitude=50.45, longitude=30.52)
+        for office_id in trace.office_ids
+    ])
+    event_bus = EventBus()
+    rate_limiter = TokenBucketRateLimiter(rate_per_second=REQUEST_RATE_LIMIT_PER_SECOND, capacity=REQUEST_RATE_LIMIT_BURST)
+    search_controller = SearchFeedbackController(rate_limiter=rate_limiter, solve_budget=solve_budget)
+    slot_reserver = SlotReserver(driver=None, event_bus=event_bus, captcha_resolver=captcha_resolver, settings=settings,
+                                 http_client=http_client, fan_out=fan_out, rate_limiter=rate_limiter,
+                                 search_controller=search_controller)
+    appearance_to_reservation = LatencyHistogram()
+    lost_reservations = []
+
+    with tempfile.TemporaryDirectory() as folder:
+        # Release history is learned from scratch during replay
+        polling_scheduler = AdaptivePollingScheduler(history_file=str(Path(folder) / 'history.json'), enabled=adaptive)
+        # Approval needs browser, so reservation made is the end of search attempt here
+        search_loop = SearchLoop(slot_reserver=slot_reserver, polling_scheduler=polling_scheduler, fast_path=True)
+
+        # Same consumers as bot has, plus the ones collecting results
+        event_bus.subscribe('slot_release_history', lambda event: polling_scheduler.record_free_slots(event.slots),
+                            SlotsFound)
+        event_bus.subscribe('appearance_to_reservation', lambda event: appearance_to_reservation.observe(
+            event.created_at - trace.first_seen[event.reservation.slot.id]), ReservationMade)
+        event_bus.subscribe('lost_reservations', lost_reservations.append, ReservationFailed)
+        event_bus.start()
+
+        try:
+            # Search continues after reservation to collect more samples
+            while await search_loop.run(should_continue=lambda: time.time() < trace.end):
+                await polling_scheduler.sleep_until_next_poll(wake_up=slot_reserver.dates_cache.dates_opened)
+        finally:
+            await slot_reserver.close()
+            await event_bus.stop()
+
+    return {
+        'reserved_slots': len(http_client.reserved),
+        'recorded_slots': len(trace.first_seen),
+        'lost_reservations': len(lost_reservations),
+        'appearance_to_reservation_p50': appearance_to_reservation.percentile(0.5),
+        'appearance_to_reservation_p95': appearance_to_reservation.percentile(0.95),
+        'freetimes_requests': http_client.requests['freetimes'],
+        'captcha_triggers': http_client.captcha_triggers,
+        'search_controller': search_controller.summary(),
+    }
+
+
+def replay_policy(trace: Trace, policy: str, args: argparse.Namespace) -> dict:
+    started_at = time.perf_counter()
+    # Every policy starts from the beginning of trace with its own virtual clock
+    result = VirtualClock(start=trace.start).run(replay_search(trace, args=args, **POLICIES[policy]))
+    result['replay_seconds'] = round(time.perf_counter() - started_at, 2)
+    return result
+
+
+def main(argv: Optional[list[str]] = None):
+    parser = argparse.ArgumentParser(description='Replays recorded search trace under virtual clock with different '
+                                                 'scheduling policies')
+    parser.add_argument('trace', help='JSON lines trace file recorded with TRACE_RECORDING_ENABLED')
+    parser.add_argument('--policies', nargs='+', choices=list(POLICIES), default=list(POLICIES))
+    parser.add_argument('--latency', type=float, default=0.3, help='Emulated response latency in seconds')
+    parser.add_argument('--captcha-every-requests', type=int, default=0,
+                        help='Captcha frequency, taken from trace by default')
+    parser.add_argument('--captcha-solve-seconds', type=float, default=20)
+    parser.add_argument('--output', help='File to save results JSON to')
+    args = parser.parse_args(argv)
+
+    trace = Trace.load(args.trace)
+    logger.info(f"Replaying {len(trace.events)} events over {(trace.end - trace.start) / 3600:.1f} hours...")
+
+    # Search logs every request, only results are interesting here
+    logger.disable('monitoring')
+    results = {policy: replay_policy(trace, policy, args) for policy in args.policies}
+    logger.enable('monitoring')
+
+    logger.info("Replay results:\n" + json.dumps(results, indent=2))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
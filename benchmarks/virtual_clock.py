@@ -0,0 +1,71 @@
+import asyncio
+import selectors
+import time
+from contextlib import contextmanager
+from typing import Awaitable, TypeVar
+from unittest.mock import patch
+
+T = TypeVar('T')
+
+
+# Selector which doesn't wait for timers: when nothing is ready, virtual time jumps to the next scheduled timer.
+# Code under replay should not wait on threads, since time could jump ahead while thread is still working.
+class VirtualTimeSelector:
+    def __init__(self, clock: 'VirtualClock'):
+        self.clock = clock
+        self.selector = selectors.DefaultSelector()
+
+    def select(self, timeout=None):
+        events = self.selector.select(0)
+
+        if not events and timeout is None:
+            # Nothing is scheduled, so only real I/O could wake the loop up
+            return self.selector.select(None)
+
+        if not events and timeout > 0:
+            self.clock.advance(timeout)
+
+        return events
+
+    def __getattr__(self, name):
+        return getattr(self.selector, name)
+
+
+class VirtualTimeEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self, clock: 'VirtualClock'):
+        super().__init__(selector=VirtualTimeSelector(clock))
+        self.clock = clock
+
+    def time(self) -> float:
+        return self.clock.elapsed
+
+
+# Virtual unix time for replay: asyncio sleeps and timeouts complete instantly, while 'time.time()',
+# 'time.monotonic()' and 'time.perf_counter()' used by search code (rate limits, caches, scheduler) follow the clock
+class VirtualClock:
+    def __init__(self, start: float):
+        self.start = start
+        # Kept apart from start, since small timer steps are lost in float precision of unix time
+        self.elapsed = 0.0
+
+    def advance(self, seconds: float):
+        self.elapsed += seconds
+
+    def time(self) -> float:
+        return self.start + self.elapsed
+
+    @contextmanager
+    def patched(self):
+        with patch.object(time, 'time', self.time), patch.object(time, 'monotonic', self.time), \
+                patch.object(time, 'perf_counter', self.time):
+            yield self
+
+    def run(self, coroutine: Awaitable[T]) -> T:
+        loop = VirtualTimeEventLoop(self)
+
+        try:
+            with self.patched():
+                return loop.run_until_complete(coroutine)
+        finally:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            loop.close()
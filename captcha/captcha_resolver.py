@@ -1,52 +1,115 @@
+import asyncio
+from functools import cached_property
+from typing import Optional
+
 from loguru import logger
-from selenium.common import NoSuchElementException
-from selenium.webdriver import Chrome
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
-from selenium_recaptcha_solver import RecaptchaSolver, RecaptchaException
-from twocaptcha import TwoCaptcha
 
-from config.configuration import CAPTCHA_SOLVE_RETRY_THRESHOLD, TWOCAPTCHA_API_KEY, HSC_SITE_KEY
+from captcha.captcha_state import CaptchaStateTracker, CaptchaState
+from captcha.solve_budget import CaptchaSolveBudget, captcha_budget
+from captcha.token_pool import CaptchaTokenPool
+from config.configuration import CAPTCHA_SOLVE_RETRY_THRESHOLD, TWOCAPTCHA_API_KEY, HSC_SITE_KEY, \
+    CAPTCHA_EXPECTED_SOLVE_SECONDS
 from exceptions.exceptions import CaptchaSolverException
+from utils.async_driver import AsyncDriver
+from utils.metrics import metrics
 
 
 class CaptchaResolver:
-    def __init__(self, driver: Chrome):
+    def __init__(self, driver: AsyncDriver, token_pool: Optional[CaptchaTokenPool] = None,
+                 solve_budget: CaptchaSolveBudget = captcha_budget):
         self.driver = driver
-        self.driver_wait = WebDriverWait(driver=self.driver, timeout=30)
-        self.recaptcha_solver = RecaptchaSolver(driver=self.driver)
-        self.twocaptcha_solver = TwoCaptcha(apiKey=TWOCAPTCHA_API_KEY)
+        self.token_pool = token_pool
+        self.solve_budget = solve_budget
+        self.state_tracker = CaptchaStateTracker()
+
+    # Solvers are imported on first use, audio solver pulls speech recognition stack which slows down startup
+    @cached_property
+    def recaptcha_solver(self):
+        from selenium_recaptcha_solver import RecaptchaSolver
+
+        return RecaptchaSolver(driver=self.driver.webdriver)
+
+    @cached_property
+    def twocaptcha_solver(self):
+        from twocaptcha import TwoCaptcha
+
+        return TwoCaptcha(apiKey=TWOCAPTCHA_API_KEY)
+
+    def expected_solve_seconds(self) -> float:
+        # Pooled token is submitted right away, only page interaction is left
+        if self.token_pool and self.token_pool.has_tokens():
+            return 0
+
+        return CAPTCHA_EXPECTED_SOLVE_SECONDS
 
     async def has_captcha(self) -> bool:
-        try:
-            self.driver.refresh()
-            self.driver_wait.until(EC.visibility_of(self.driver.find_element(By.XPATH, '//iframe[@title="reCAPTCHA"]')))
+        with metrics.measure_stage('captcha_detect'):
+            displayed = await self._detect_captcha()
+
+        metrics.inc('hsc_captcha_checks_total', result='displayed' if displayed else 'clear')
+        return displayed
+
+    async def _detect_captcha(self) -> bool:
+        if self.state_tracker.current_state() == CaptchaState.CLEAR:
+            self.state_tracker.record_page_load_saved()
+            logger.info(f"No captcha expected. Processing action as usual without page reload ({self.state_tracker.summary()})...")
+            return False
+
+        self.state_tracker.on_url(await self.driver.current_url())
+
+        # Captcha could be already displayed, so page is checked without reload first
+        if await self._is_captcha_displayed():
+            self.state_tracker.record_page_load_saved()
+            logger.info("reCAPTCHA iframe found! Resolving captcha...")
+            return True
+
+        await self.driver.refresh()
+        self.state_tracker.record_page_load()
+
+        if await self._is_captcha_displayed():
             logger.info("reCAPTCHA iframe found! Resolving captcha...")
             return True
-        except NoSuchElementException:
-            logger.info("No captcha found. Processing action as usual...")
+
+        self.state_tracker.mark(CaptchaState.CLEAR)
+        logger.info(f"No captcha found. Processing action as usual ({self.state_tracker.summary()})...")
+        return False
+
+    async def _is_captcha_displayed(self) -> bool:
+        recaptcha_frames = await self.driver.find_elements(By.XPATH, '//iframe[@title="reCAPTCHA"]')
+
+        if not recaptcha_frames:
             return False
 
+        await self.driver.wait_until(EC.visibility_of(recaptcha_frames[0]))
+        self.state_tracker.mark(CaptchaState.PENDING)
+        return True
+
     async def resolve_captcha_audio(self):
+        with metrics.measure_stage('captcha_solve'):
+            await self._resolve_captcha_audio()
+
+        metrics.inc('hsc_captcha_solved_total', solver='audio')
+
+    async def _resolve_captcha_audio(self):
+        from selenium_recaptcha_solver import RecaptchaException
+
         solved = False
 
         for i in range(CAPTCHA_SOLVE_RETRY_THRESHOLD):
-            self.driver_wait.until(
-                EC.visibility_of(self.driver.find_element(By.XPATH, '//iframe[@title="reCAPTCHA"]'))
-            )
-            recaptcha_control_frame = self.driver.find_element(By.XPATH, '//iframe[@title="reCAPTCHA"]')
+            recaptcha_control_frame = await self.driver.wait_visible(By.XPATH, '//iframe[@title="reCAPTCHA"]')
 
             try:
-                self.recaptcha_solver.click_recaptcha_v2(recaptcha_control_frame)
-                self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
+                await self.driver.run('recaptcha_audio', self.recaptcha_solver.click_recaptcha_v2, recaptcha_control_frame)
+                await self.driver.click(await self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
 
                 solved = True
                 break
             except RecaptchaException as e:
                 if str(e) == 'Speech recognition API could not understand audio, try again':
                     logger.warning(f"[Attempt #{i + 1}] Failed to resolve captcha... Trying again...")
-                    self.driver.refresh()
+                    await self.driver.refresh()
                     continue
                 else:
                     logger.error(f"Error during captcha resolve: {str(e)}")
@@ -55,24 +118,33 @@ class CaptchaResolver:
         if not solved:
             raise CaptchaSolverException("Captcha was not solved. Check logs for more details.")
 
-        self.driver_wait.until(EC.url_to_be('https://eq.hsc.gov.ua/step0'))
+        await self.driver.wait_until(EC.url_to_be('https://eq.hsc.gov.ua/step0'))
+        self.state_tracker.mark(CaptchaState.CLEAR)
         logger.success('Captcha resolved successfully!')
 
     async def resolve_captcha_code(self):
+        with metrics.measure_stage('captcha_solve'):
+            await self._resolve_captcha_code()
+
+        metrics.inc('hsc_captcha_solved_total', solver='2captcha')
+
+    async def _resolve_captcha_code(self):
         solved = False
 
+        if self.token_pool:
+            self.token_pool.record_demand()
+
         for i in range(CAPTCHA_SOLVE_RETRY_THRESHOLD):
             try:
-                response = self.twocaptcha_solver.recaptcha(sitekey=HSC_SITE_KEY, url=self.driver.current_url)
-                code = response['code']
+                code = await self._get_captcha_code()
 
-                recaptcha_response_element = self.driver.find_element(By.ID, 'g-recaptcha-response')
-                self.driver.execute_script(f'arguments[0].value = "{code}";', recaptcha_response_element)
+                recaptcha_response_element = await self.driver.find_element(By.ID, 'g-recaptcha-response')
+                await self.driver.execute_script(f'arguments[0].value = "{code}";', recaptcha_response_element)
 
-                recaptcha_hidden_input_element = self.driver.find_element(By.ID, 'captcha-recaptcha')
-                self.driver.execute_script(f'arguments[0].value = "{code}";', recaptcha_hidden_input_element)
+                recaptcha_hidden_input_element = await self.driver.find_element(By.ID, 'captcha-recaptcha')
+                await self.driver.execute_script(f'arguments[0].value = "{code}";', recaptcha_hidden_input_element)
 
-                self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']").click()
+                await self.driver.click(await self.driver.find_element(By.CSS_SELECTOR, "button[type='submit']"))
 
                 solved = True
                 break
@@ -83,5 +155,21 @@ class CaptchaResolver:
         if not solved:
             raise CaptchaSolverException("Captcha was not solved. Check logs for more details.")
 
-        self.driver_wait.until(EC.url_to_be('https://eq.hsc.gov.ua/step0'))
+        await self.driver.wait_until(EC.url_to_be('https://eq.hsc.gov.ua/step0'))
+        self.state_tracker.mark(CaptchaState.CLEAR)
         logger.success('Captcha resolved successfully!')
+
+    async def _get_captcha_code(self) -> str:
+        if self.token_pool:
+            code = self.token_pool.take()
+            logger.info(f"Captcha token pool {'hit' if code else 'miss'} ({self.token_pool.summary()})")
+
+            if code:
+                return code
+
+        await self.solve_budget.acquire()
+
+        current_url = await self.driver.current_url()
+        # 2captcha client polls for the solution synchronously, so it runs outside of event loop and browser thread
+        response = await asyncio.to_thread(lambda: self.twocaptcha_solver.recaptcha(sitekey=HSC_SITE_KEY, url=current_url))
+        return response['code']
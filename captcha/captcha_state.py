@@ -0,0 +1,57 @@
+import time
+from enum import Enum
+
+from config.configuration import CAPTCHA_STATE_TTL_SECONDS
+
+
+class CaptchaState(Enum):
+    UNKNOWN = 'unknown'
+    PENDING = 'pending'
+    CLEAR = 'clear'
+
+
+# Infers if captcha challenge is pending from signals which are already available (free slots response status,
+# current url, DOM probe), so page is reloaded only when captcha state is unknown
+class CaptchaStateTracker:
+    def __init__(self, ttl_seconds: float = CAPTCHA_STATE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.state = CaptchaState.UNKNOWN
+        self.updated_at = 0.0
+        self.started_at = time.monotonic()
+        self.page_loads = 0
+        self.page_loads_saved = 0
+
+    def current_state(self) -> CaptchaState:
+        # Clear state becomes stale, while pending captcha stays pending until it's resolved
+        if self.state == CaptchaState.CLEAR and time.monotonic() - self.updated_at > self.ttl_seconds:
+            return CaptchaState.UNKNOWN
+
+        return self.state
+
+    def mark(self, state: CaptchaState):
+        self.state = state
+        self.updated_at = time.monotonic()
+
+    def invalidate(self):
+        self.mark(CaptchaState.UNKNOWN)
+
+    def on_freetimes_status(self, status: int):
+        if status == 302:
+            self.mark(CaptchaState.PENDING)
+        elif status == 200:
+            self.mark(CaptchaState.CLEAR)
+
+    def on_url(self, url: str):
+        if 'captcha' in url.lower():
+            self.mark(CaptchaState.PENDING)
+
+    def record_page_load(self):
+        self.page_loads += 1
+
+    def record_page_load_saved(self):
+        self.page_loads_saved += 1
+
+    def summary(self) -> str:
+        hours = max((time.monotonic() - self.started_at) / 3600, 1 / 60)
+        return (f"page loads {self.page_loads} ({self.page_loads / hours:.1f}/hour), "
+                f"saved {self.page_loads_saved} ({self.page_loads_saved / hours:.1f}/hour)")
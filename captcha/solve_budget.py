@@ -0,0 +1,55 @@
+import asyncio
+import time
+from collections import deque
+
+from loguru import logger
+
+from config.configuration import CAPTCHA_MAX_SOLVES_PER_HOUR
+from utils.metrics import metrics
+
+
+# Hourly cap of captchas sent to 2captcha (spend cap) shared by all solvers: search, authentication, approval and
+# token pool. Every solve is charged when it's actually submitted, so pooled tokens are not paid twice.
+class CaptchaSolveBudget:
+    def __init__(self, max_solves_per_hour: int = CAPTCHA_MAX_SOLVES_PER_HOUR):
+        self.max_solves_per_hour = max_solves_per_hour
+        self.solve_timestamps: deque[float] = deque()
+        self.spent = 0
+
+    def try_acquire(self) -> bool:
+        if self.wait_seconds() > 0:
+            return False
+
+        self.solve_timestamps.append(time.monotonic())
+        self.spent += 1
+        metrics.inc('hsc_captcha_budget_spent_total')
+        return True
+
+    async def acquire(self):
+        while not self.try_acquire():
+            await self.wait_available()
+
+    async def wait_available(self):
+        # Waiting doesn't charge budget, so it could be done before taking any lock
+        while (wait_seconds := self.wait_seconds()) > 0:
+            logger.warning(f"Hourly captcha budget ({self.max_solves_per_hour} solves) is spent. "
+                           f"Waiting {wait_seconds:.0f} seconds...")
+            metrics.inc('hsc_captcha_budget_waits_total')
+            await asyncio.sleep(wait_seconds)
+
+    def wait_seconds(self) -> float:
+        now = time.monotonic()
+        while self.solve_timestamps and now - self.solve_timestamps[0] >= 3600:
+            self.solve_timestamps.popleft()
+
+        if len(self.solve_timestamps) < self.max_solves_per_hour:
+            return 0
+
+        return 3600 - (now - self.solve_timestamps[0])
+
+    def summary(self) -> str:
+        self.wait_seconds()
+        return f"{len(self.solve_timestamps)}/{self.max_solves_per_hour}"
+
+
+captcha_budget = CaptchaSolveBudget()
@@ -0,0 +1,165 @@
+import asyncio
+import math
+import time
+from collections import deque
+from functools import cached_property
+from typing import Optional
+
+from loguru import logger
+
+from captcha.solve_budget import captcha_budget
+from config.configuration import TWOCAPTCHA_API_KEY, HSC_SITE_KEY, HSC_BASE_URL, CAPTCHA_TOKEN_POOL_MIN_SIZE, \
+    CAPTCHA_TOKEN_POOL_MAX_SIZE, CAPTCHA_TOKEN_TTL_SECONDS, CAPTCHA_DEMAND_WINDOW_SECONDS, \
+    CAPTCHA_TOKEN_POOL_MAX_SOLVES_PER_HOUR, CAPTCHA_TOKEN_POOL_DEMAND_PROBABILITY
+
+REFILL_INTERVAL_SECONDS = 1
+
+
+class SolvedToken:
+    def __init__(self, code: str, ttl_seconds: float):
+        self.code = code
+        self.expires_at = time.monotonic() + ttl_seconds
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+
+# Keeps reCAPTCHA tokens solved in background, so captcha redirect could be passed without waiting for 2captcha
+class CaptchaTokenPool:
+    def __init__(self, site_key: str = HSC_SITE_KEY, page_url: str = HSC_BASE_URL,
+                 min_size: int = CAPTCHA_TOKEN_POOL_MIN_SIZE, max_size: int = CAPTCHA_TOKEN_POOL_MAX_SIZE,
+                 ttl_seconds: float = CAPTCHA_TOKEN_TTL_SECONDS,
+                 max_solves_per_hour: int = CAPTCHA_TOKEN_POOL_MAX_SOLVES_PER_HOUR):
+        self.site_key = site_key
+        self.page_url = page_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.max_solves_per_hour = max_solves_per_hour
+
+        self.tokens: deque[SolvedToken] = deque()
+        self.demand_timestamps: deque[float] = deque()
+        self.solve_timestamps: deque[float] = deque()
+        self.solving_count = 0
+        self.solve_tasks: set[asyncio.Task] = set()
+        self.refill_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.solved = 0
+        self.failed = 0
+
+    # 2captcha client is imported on first solve, so it doesn't slow down startup
+    @cached_property
+    def solver(self):
+        from twocaptcha import TwoCaptcha
+
+        return TwoCaptcha(apiKey=TWOCAPTCHA_API_KEY)
+
+    def start(self):
+        if not self.refill_task:
+            self.refill_task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self.refill_task:
+            self.refill_task.cancel()
+            self.refill_task = None
+
+        for task in self.solve_tasks:
+            task.cancel()
+
+    def take(self) -> Optional[str]:
+        self._evict_expired()
+
+        if self.tokens:
+            self.hits += 1
+            # Oldest token goes first, since it would expire sooner
+            return self.tokens.popleft().code
+
+        self.misses += 1
+        return None
+
+    def has_tokens(self) -> bool:
+        self._evict_expired()
+        return bool(self.tokens)
+
+    def record_demand(self):
+        self.demand_timestamps.append(time.monotonic())
+
+    @property
+    def target_size(self) -> int:
+        now = time.monotonic()
+        while self.demand_timestamps and now - self.demand_timestamps[0] > CAPTCHA_DEMAND_WINDOW_SECONDS:
+            self.demand_timestamps.popleft()
+
+        # Expected count of captchas during token lifetime
+        demand_rate = len(self.demand_timestamps) / CAPTCHA_DEMAND_WINDOW_SECONDS
+        expected_demand = demand_rate * self.ttl_seconds
+
+        # Captchas come as Poisson process, so k-th token is kept only if k captchas during its lifetime are likely
+        # enough. Rare captchas (less than ~0.7 per token lifetime) keep pool empty, so tokens are not solved to expire.
+        size = 0
+        probability_of_less = math.exp(-expected_demand)
+        term = probability_of_less
+
+        while size < self.max_size and 1 - probability_of_less >= CAPTCHA_TOKEN_POOL_DEMAND_PROBABILITY:
+            size += 1
+            term *= expected_demand / size
+            probability_of_less += term
+
+        return max(self.min_size, size)
+
+    def stats(self) -> dict:
+        return {
+            'size': len(self.tokens),
+            'target_size': self.target_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'solved': self.solved,
+            'failed': self.failed,
+            'solves_last_hour': len(self.solve_timestamps),
+        }
+
+    def summary(self) -> str:
+        return ' '.join(f"{name}={value}" for name, value in self.stats().items())
+
+    def _evict_expired(self):
+        while self.tokens and self.tokens[0].expired:
+            self.tokens.popleft()
+            self.expired += 1
+
+    def _spend_allowed(self) -> bool:
+        now = time.monotonic()
+        while self.solve_timestamps and now - self.solve_timestamps[0] > 3600:
+            self.solve_timestamps.popleft()
+
+        # Pool never waits for global budget, search solves captchas itself when pool is empty
+        return len(self.solve_timestamps) < self.max_solves_per_hour and captcha_budget.try_acquire()
+
+    async def _refill_loop(self):
+        while True:
+            self._evict_expired()
+
+            while len(self.tokens) + self.solving_count < self.target_size and self._spend_allowed():
+                self.solving_count += 1
+                self.solve_timestamps.append(time.monotonic())
+                task = asyncio.create_task(self._solve())
+                self.solve_tasks.add(task)
+                task.add_done_callback(self.solve_tasks.discard)
+
+            await asyncio.sleep(REFILL_INTERVAL_SECONDS)
+
+    async def _solve(self):
+        try:
+            response = await asyncio.to_thread(lambda: self.solver.recaptcha(sitekey=self.site_key, url=self.page_url))
+            self.tokens.append(SolvedToken(code=response['code'], ttl_seconds=self.ttl_seconds))
+            self.solved += 1
+            logger.info(f"Captcha token added to pool ({self.summary()})")
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Failed to solve captcha token for pool: {str(e)}")
+        finally:
+            self.solving_count -= 1
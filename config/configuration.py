@@ -1,7 +1,5 @@
 # Telegram bot token, you could find it after bot creation via @BotFather
 TELEGRAM_BOT_TOKEN_ID = 'YOUR_BOT_TOKEN_ID'
-# Telegram chat_id (should be your chat_id numeric identifier to allow notifier send you a message)
-CHAT_ID = None
 # Allow list of telegram chat_ids, who can interact with bot. Only numeric values.
 ALLOW_LIST = []
 # Basically its HSC office identifier that persists inside system
@@ -14,8 +12,6 @@ DELAYS_BETWEEN_DAY_MONITORING_SECONDS = (3, 5)
 DELAY_BEFORE_RESERVATION_SECONDS = (1, 3)
 # Time for authentication process, after exceeding this you would probably need to perform re-auth
 AUTH_TIMER_THRESHOLD_SECONDS = 600
-# Automatic re-auth time in hours, after exceeding this you would logout from system
-REAUTH_THRESHOLD_HOURS = 5
 # Count of retries for captcha solving
 CAPTCHA_SOLVE_RETRY_THRESHOLD = 5
 # Count of retries for slot approval
@@ -48,3 +44,165 @@ HSC_OFFICE_LOCATION = {
 }
 # Email for slot notification after approval
 USER_EMAIL = 'YOUR_EMAIL_HERE'
+# Base url of HSC electronic queue site (could be replaced with local stub server for testing)
+HSC_BASE_URL = 'https://eq.hsc.gov.ua'
+# Flag to define if free slots should be requested directly over HTTP using browser session (true by default)
+HTTP_POLLING_ENABLED = True
+# Timeout for direct HTTP requests to the site
+HTTP_REQUEST_TIMEOUT_SECONDS = 15
+# Flag to define if all dates should be requested concurrently during search attempt instead of one by one (HTTP polling only)
+FAN_OUT_MODE_ENABLED = True
+# Max count of concurrent free slots requests in fan-out mode
+FAN_OUT_CONCURRENCY = 4
+# Count of bookable dates requested during one sequential search attempt (baseline of request rate limit)
+BASELINE_DATES_PER_SEARCH_ATTEMPT = 14
+# Global request rate limit across all free slots requests. It's derived from the whole sequential search cycle
+# (every date with day monitoring delay after it, then delay between search attempts), so total rate stays the same.
+REQUEST_RATE_LIMIT_PER_SECOND = BASELINE_DATES_PER_SEARCH_ATTEMPT / (
+    BASELINE_DATES_PER_SEARCH_ATTEMPT * sum(DELAYS_BETWEEN_DAY_MONITORING_SECONDS) / 2
+    + sum(DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS) / 2
+)
+# Burst of requests allowed by global rate limiter (covers all bookable dates to let one search attempt run at once)
+REQUEST_RATE_LIMIT_BURST = BASELINE_DATES_PER_SEARCH_ATTEMPT
+# Identifiers of HSC offices to monitor in one search session (see 'id_offices' in hsc_offices.json). Empty means HSC_OFFICE_ID only.
+HSC_OFFICE_IDS = []
+# Area to pick all HSC offices within radius around point, e.g. {'latitude': 50.45, 'longitude': 30.52, 'radius_km': 20}. None by default.
+HSC_OFFICES_SEARCH_AREA = None
+# File with list of HSC offices
+HSC_OFFICES_FILE = 'hsc_offices.json'
+# Max count of browser sessions running simultaneously
+BROWSER_POOL_MAX_SESSIONS = 2
+# Memory limit for all browser sessions in megabytes
+BROWSER_POOL_MAX_MEMORY_MB = 2048
+# Approximate memory consumption of one browser session in megabytes (used to apply memory limit)
+BROWSER_SESSION_MEMORY_MB = 500
+# Browser session older than this would be recycled when it's returned to pool
+BROWSER_SESSION_MAX_AGE_HOURS = 12
+# Max time search waits for free browser session on start (search fails with notification after it)
+BROWSER_LEASE_TIMEOUT_SECONDS = 300
+# Folder for isolated browser profiles of pooled sessions
+BROWSER_PROFILES_FOLDER = 'profiles'
+# Flag to define if solved captcha tokens should be kept warm in background pool
+CAPTCHA_TOKEN_POOL_ENABLED = True
+# Min and max count of solved captcha tokens kept in pool (actual size adapts to observed captcha rate)
+CAPTCHA_TOKEN_POOL_MIN_SIZE = 0
+CAPTCHA_TOKEN_POOL_MAX_SIZE = 3
+# Lifetime of solved captcha token in pool. reCAPTCHA token is valid ~120 seconds, so it's evicted a bit earlier.
+CAPTCHA_TOKEN_TTL_SECONDS = 100
+# Pool keeps k-th token only if at least k captchas during token lifetime are expected with this probability
+CAPTCHA_TOKEN_POOL_DEMAND_PROBABILITY = 0.5
+# Time window used to estimate captcha rate for pool refill
+CAPTCHA_DEMAND_WINDOW_SECONDS = 1800
+# Max count of captcha solves per hour made by pool in background (part of CAPTCHA_MAX_SOLVES_PER_HOUR budget)
+CAPTCHA_TOKEN_POOL_MAX_SOLVES_PER_HOUR = 10
+# Time while known captcha state (e.g. successful free slots request) is trusted without page reload
+CAPTCHA_STATE_TTL_SECONDS = 60
+# Flag to define if delay between search attempts should adapt to learned slot release times (instead of fixed delay range)
+ADAPTIVE_POLLING_ENABLED = True
+# Min and max delay between search attempts in adaptive mode
+ADAPTIVE_POLLING_DELAY_RANGE_SECONDS = (20, 600)
+# Count of slot release observations required before polling starts to adapt
+ADAPTIVE_POLLING_MIN_OBSERVATIONS = 10
+# Count of releases at the same time of week to consider it as known release time (polling bursts at this time)
+ADAPTIVE_POLLING_BURST_MIN_OBSERVATIONS = 3
+# Duration of frequent polling after known release time
+ADAPTIVE_POLLING_BURST_DURATION_SECONDS = 180
+# File for slot release history
+SLOT_RELEASE_HISTORY_FILE = 'slot_release_history.json'
+# Flag to define if every free slots response should be stored to local database
+OBSERVATION_STORE_ENABLED = True
+# SQLite database file for free slots observations
+OBSERVATIONS_DB_FILE = 'observations.db'
+# Observations older than this would be removed from database
+OBSERVATIONS_RETENTION_DAYS = 60
+# Time window of observations summarized by '/stats' command (probe latency percentiles, slot appearances per office)
+OBSERVATIONS_STATS_WINDOW_HOURS = 24
+# Time while discovered bookable dates are considered fresh
+AVAILABLE_DATES_TTL_SECONDS = 1800
+# Interval of background refresh of bookable dates (newly opened dates are probed right away)
+AVAILABLE_DATES_REFRESH_INTERVAL_SECONDS = 600
+# Flag to define if best ranked slot should be reserved right away, falling through to next ranked slot if it's taken
+RESERVATION_FAST_PATH_ENABLED = True
+# Preferred time windows for slot, e.g. [('08:00', '12:00')]. Empty means any time is fine.
+PREFERRED_TIME_WINDOWS = []
+# Preferred HSC offices in order of preference. Offices which are not listed go after them.
+PREFERRED_OFFICE_IDS = []
+# Reservation is made again proactively when less than this time remains before its expiration
+APPROVAL_RE_RESERVE_MARGIN_SECONDS = 10
+# Escalating delays between approval retries (last one is used for all further retries)
+APPROVAL_RETRY_DELAYS_SECONDS = (0.5, 1, 2, 4)
+# Max count of reservations of the same slot before moving on to next candidate slot
+APPROVAL_MAX_RESERVATIONS_PER_SLOT = 2
+# Expected time of captcha solving by 2captcha. Approval renews reservation first when less time is left before deadline.
+CAPTCHA_EXPECTED_SOLVE_SECONDS = 40
+# Max time to wait for reservation PDF file downloading
+PDF_DOWNLOAD_TIMEOUT_SECONDS = 60
+# Flag to define if authenticated session cookies should be persisted and restored after restart
+SESSION_STORE_ENABLED = True
+# Encrypted file for session cookies
+SESSION_STORE_FILE = 'session.bin'
+# Fernet key for session cookies encryption. Taken from HSC_SESSION_STORE_KEY environment variable if empty,
+# then from SESSION_STORE_KEY_FILE (generated if missing).
+SESSION_STORE_KEY = ''
+# File for session cookies encryption key. It should live apart from session files (outside of bot folder and its
+# backups), otherwise anyone who gets session file gets the key as well.
+SESSION_STORE_KEY_FILE = '~/.config/hsc-monitoring/session.key'
+# Flag to define if re-authentication should be started in second browser ahead of expected session expiry
+STANDBY_SESSION_ENABLED = True
+# Expected lifetime of authenticated session until it's observed (then observed lifetime is used)
+SESSION_EXPECTED_LIFETIME_HOURS = 5
+# Standby re-authentication starts this time before expected session expiry (should cover authentication approval)
+STANDBY_SESSION_LEAD_SECONDS = 900
+# Delay before next standby re-authentication attempt after failed one
+STANDBY_SESSION_RETRY_DELAY_SECONDS = 300
+# File for resolved chromedriver path, it's reused while local Chrome major version stays the same
+CHROMEDRIVER_CACHE_FILE = 'chromedriver.json'
+# Telegram limits for outgoing notifications: overall and per chat messages rate (bursts are allowed up to given size)
+NOTIFICATION_GLOBAL_RATE_PER_SECOND = 25
+NOTIFICATION_GLOBAL_BURST = 25
+NOTIFICATION_CHAT_RATE_PER_SECOND = 1
+NOTIFICATION_CHAT_BURST = 3
+# Escalating delays between retries of failed notification (it's dropped after the last one)
+NOTIFICATION_RETRY_DELAYS_SECONDS = (1, 2, 5, 10, 30)
+# Max time to flush queued notifications on shutdown
+NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS = 10
+# Per-chat search settings, chats from ALLOW_LIST which are not listed here search with global settings. Example:
+# {123456789: {'office_ids': [151], 'search_area': None, 'start_from_date': '2024-09-01', 'end_date': '2024-10-01',
+#              'preferred_time_windows': [('08:00', '12:00')], 'preferred_office_ids': [151]}}
+SEARCH_TENANTS = {}
+# Free slots of (office, date) requested by one chat are shared with other chats requesting them within this time.
+# Search attempts of all chats start at the same poll time, so it covers one attempt, but not the next one.
+PROBE_RESULT_SHARE_SECONDS = ADAPTIVE_POLLING_DELAY_RANGE_SECONDS[0]
+# Flag to define if pipeline metrics should be exposed in Prometheus format on http://METRICS_HOST:METRICS_PORT/metrics
+METRICS_ENABLED = True
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+# Flag to define if '/stats' bot command with metrics summary should be available for chats from ALLOW_LIST
+STATS_COMMAND_ENABLED = True
+# Flag to define if search requests and responses should be recorded to trace file (for replay in benchmarks)
+TRACE_RECORDING_ENABLED = False
+# JSON lines file for recorded search trace
+TRACE_RECORDING_FILE = 'search_trace.jsonl'
+# Sliding window of free slots request outcomes (captchas, errors, latency) which request rate adapts to
+SEARCH_FEEDBACK_WINDOW_SECONDS = 1800
+# Captchas per free slots request above which request rate is halved (e.g. 0.02 is one captcha per 50 requests)
+SEARCH_CAPTCHA_TARGET_RATE = 0.02
+# Lowest fraction of REQUEST_RATE_LIMIT_PER_SECOND request rate could be slowed down to
+SEARCH_MIN_RATE_FRACTION = 0.1
+# Free slots requests slower than this are treated as sign of overloaded site, so request rate is slowed down
+SEARCH_SLOW_PROBE_SECONDS = 5
+# Count of consecutive failed free slots requests which pauses search (circuit is opened)
+SEARCH_CIRCUIT_FAILURE_THRESHOLD = 5
+# Escalating pauses of search after failures, single trial request is sent after pause (last one is used for all further)
+SEARCH_CIRCUIT_OPEN_SECONDS = (30, 60, 120, 300, 600)
+# Max count of captchas sent to 2captcha per hour by search, authentication, approval and token pool (spend cap).
+# Search waits when it's reached, token pool stops refilling.
+CAPTCHA_MAX_SOLVES_PER_HOUR = 20
+# Free slot which is still listed after it was offered for reservation is offered again only after this time
+LINGERING_SLOT_RETRY_SECONDS = 600
+# Slot which failed to be reserved (taken by someone else) is not offered again during this time, even if it reappears
+RESERVATION_NEGATIVE_CACHE_SECONDS = 300
+# Max count of search events waiting for each event bus consumer, search waits when consumer falls behind
+EVENT_BUS_QUEUE_SIZE = 100
+# Max time to handle queued search events on shutdown
+EVENT_BUS_SHUTDOWN_TIMEOUT_SECONDS = 10
@@ -10,5 +10,21 @@ class ReservationApprovalException(Exception):
     pass
 
 
+class ReservationExpiringException(ReservationApprovalException):
+    pass
+
+
 class ReservationException(Exception):
     pass
+
+
+class SessionExpiredException(Exception):
+    pass
+
+
+class AuthenticationExpiredException(Exception):
+    pass
+
+
+class BrowserUnavailableException(Exception):
+    pass
@@ -1,33 +1,53 @@
 import asyncio
-import random
+import html
 import sys
 import time
 from asyncio import Task
-from datetime import datetime
 from typing import Optional
 
 import telegram.error
 from loguru import logger
 from telegram import Bot, Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes
+from telegram.constants import ParseMode
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, ContextTypes
 
 from auth.authenticator import Authenticator
+from auth.session_store import SessionStore
+from auth.standby_session import StandbySession
 from captcha.captcha_resolver import CaptchaResolver
-from config.configuration import TELEGRAM_BOT_TOKEN_ID, CHAT_ID, HSC_OFFICE_ID, APPROVE_RESERVATION_RETRY_THRESHOLD, \
-    REAUTH_THRESHOLD_HOURS, DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS, ALLOW_LIST
-from exceptions.exceptions import ReservationApprovalException, ReservationException
+from captcha.token_pool import CaptchaTokenPool
+from config.configuration import TELEGRAM_BOT_TOKEN_ID, ALLOW_LIST, HTTP_POLLING_ENABLED, CAPTCHA_TOKEN_POOL_ENABLED, \
+    OBSERVATION_STORE_ENABLED, SESSION_STORE_ENABLED, STANDBY_SESSION_ENABLED, \
+    REQUEST_RATE_LIMIT_PER_SECOND, REQUEST_RATE_LIMIT_BURST, METRICS_ENABLED, METRICS_HOST, METRICS_PORT, \
+    STATS_COMMAND_ENABLED, TRACE_RECORDING_ENABLED, BROWSER_LEASE_TIMEOUT_SECONDS, OBSERVATIONS_STATS_WINDOW_HOURS
+from exceptions.exceptions import AuthenticationExpiredException, BrowserUnavailableException
+from model.events import SlotsFound, SearchFailed
+from monitoring.approval_engine import ApprovalEngine
+from monitoring.http_client import HscHttpClient
+from monitoring.polling_scheduler import AdaptivePollingScheduler
+from monitoring.probe_coalescer import ProbeCoalescer
+from monitoring.search_controller import SearchFeedbackController
+from monitoring.search_loop import SearchLoop
 from monitoring.slot_reserver import SlotReserver
+from monitoring.tenants import resolve_search_settings
+from notification.event_notifier import EventNotifier, NOTIFIED_EVENTS
 from notification.notifier import Notifier
-from utils.driver_utils import cleanup_browser, setup_chrome_driver
+from notification.outbox import NotificationOutbox
+from storage.observation_store import ObservationStore
+from storage.trace_recorder import TraceRecorder
+from utils.browser_pool import BrowserPool
+from utils.driver_utils import cleanup_browser
+from utils.event_bus import EventBus
+from utils.metrics import metrics, start_metrics_server
+from utils.rate_limiter import TokenBucketRateLimiter
 
 
-# Control variable to manage the running state of the search
-search_task: Optional[Task] = None
+# Running searches by chat id, every allowed chat could run its own search
+search_tasks: dict[int, Task] = {}
+metrics_server: Optional[asyncio.Server] = None
 
 
 async def search_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    global search_task
-
     logger.info(f"Received '/search_stop' command from '{update.message.from_user.full_name}' with chat id '{update.message.chat_id}'")
 
     try:
@@ -36,9 +56,9 @@ async def search_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
             logger.warning(f"'Someone '{update.message.from_user.full_name}' is trying to interact with bot without permissions")
             return None
 
+        search_task = search_tasks.pop(update.message.chat_id, None)
         if search_task:
             search_task.cancel()
-            search_task = None
 
         await update.message.reply_text(f'Пошук зупинено.')
     except telegram.error.Forbidden:
@@ -47,7 +67,7 @@ async def search_stop(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
 
 async def search_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    global search_task
+    chat_id = update.message.chat_id
 
     logger.info(f"Received '/search_start' command from '{update.message.from_user.full_name}' with chat id '{update.message.chat_id}'")
 
@@ -56,88 +76,225 @@ async def search_start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
             await update.message.reply_text(f'⛔ У вас немає прав на запуск поточної команди. Зверніться за допомогою до адміна бота.')
             return None
 
-        if search_task:
+        if chat_id in search_tasks:
             await update.message.reply_text(f'Пошук вже запущено.')
             return None
     except telegram.error.Forbidden:
         logger.error(f"'Cannot reply to the user '{update.message.from_user.full_name}'. Reason: bot was blocked by the user'")
         return None
 
+    settings = resolve_search_settings(chat_id)
     await update.message.reply_text(f'🔛 Запускаю пошук талонів в системі електронного запису МВС України...')
 
     async def run_search():
-        global search_task
+        notifier = Notifier(bot=tg_bot, chat_id=chat_id, outbox=notification_outbox)
+        session_store = SessionStore.for_chat(chat_id) if SESSION_STORE_ENABLED else None
+        standby_session = StandbySession(browser_pool=browser_pool, notifier=notifier,
+                                         captcha_token_pool=captcha_token_pool) if STANDBY_SESSION_ENABLED else None
+
+        async def promote_standby_session() -> bool:
+            # Cookies are swapped between search attempts, so no request is sent with half-switched session
+            standby = await standby_session.take()
+
+            if not standby or not await authenticator.adopt_session(standby):
+                logger.warning("Standby session cannot be promoted")
+                return False
+
+            if http_client:
+                await http_client.sync_session()
+
+            logger.success("Standby session promoted, search continues without re-authentication pause")
+            return True
 
-        has_reserved_slots = False
+        async def check_standby_session():
+            standby_session.maybe_start(authenticator)
 
+            if standby_session.ready:
+                await promote_standby_session()
+
+        browser = None
+        authenticator = None
+        http_client = None
+        slot_reserver = None
+
+        # Everything is set up inside try, so failed start is notified and chat could start search again
         try:
-            while True:
-                if has_reserved_slots:
-                    logger.success("Congratulations! Program successfully reserved slot for practice exam!")
-                    break
+            try:
+                browser = await browser_pool.lease(timeout=BROWSER_LEASE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                raise BrowserUnavailableException(
+                    f"Усі браузери зайняті іншими пошуками понад {BROWSER_LEASE_TIMEOUT_SECONDS} секунд. "
+                    f"Спробуйте запустити пошук пізніше."
+                )
+
+            driver = browser.driver
+            captcha_resolver = CaptchaResolver(driver=driver, token_pool=captcha_token_pool)
+            authenticator = Authenticator(driver=driver, notifier=notifier, captcha_resolver=captcha_resolver,
+                                          session_store=session_store)
+            http_client = HscHttpClient(driver=driver) if HTTP_POLLING_ENABLED else None
+            slot_reserver = SlotReserver(driver=driver, event_bus=event_bus, captcha_resolver=captcha_resolver,
+                                         settings=settings, http_client=http_client,
+                                         observation_store=observation_store, probe_coalescer=probe_coalescer,
+                                         rate_limiter=request_rate_limiter, trace_recorder=trace_recorder,
+                                         search_controller=search_controller)
+            search_loop = SearchLoop(slot_reserver=slot_reserver, polling_scheduler=polling_scheduler,
+                                     approval_engine=ApprovalEngine(slot_reserver=slot_reserver),
+                                     before_attempt=check_standby_session if standby_session else None)
+            needs_authentication = True
 
-                auth_start = time.time()
-                await authenticator.try_authenticate()
+            while True:
+                if needs_authentication:
+                    await authenticator.try_authenticate()
 
-                while True:
-                    auth_current = time.time()
+                    if http_client:
+                        await http_client.sync_session()
 
-                    if (auth_current - auth_start) / 3600 > REAUTH_THRESHOLD_HOURS:
-                        logger.info("Seems like authentication session time exceeded. Need to perform re-authentication.")
-                        driver.delete_all_cookies()
-                        break
+                try:
+                    await search_loop.run()
+                    logger.success("Congratulations! Program successfully reserved slot for practice exam!")
+                    break
+                except AuthenticationExpiredException as e:
+                    # Session is re-authenticated only when site actually rejects it
+                    logger.info(f"{str(e)}. Need to perform re-authentication.")
 
-                    free_slots = await slot_reserver.get_free_slots()
+                    if standby_session:
+                        standby_session.record_expiry(authenticator)
 
-                    if free_slots:
-                        try:
-                            slot = random.choice(free_slots)
-                            reservation = await slot_reserver.reserve_slot(slot)
-                        except ReservationException as e:
-                            logger.error(f"Error during slot reservation: {str(e)}. Continuing without fallback...")
+                        if standby_session.in_progress and await promote_standby_session():
+                            needs_authentication = False
                             continue
 
-                        for i in range(APPROVE_RESERVATION_RETRY_THRESHOLD):
-                            try:
-                                await slot_reserver.approve_reservation(reservation)
-                                has_reserved_slots = True
-                                break
-                            except ReservationApprovalException:
-                                logger.warning(f"Cannot approve reservation '{reservation.reservation_url}'. Trying again...")
-                                if datetime.now() > reservation.expired_at:
-                                    reservation = await slot_reserver.reserve_slot(slot)
-                                await asyncio.sleep(15)
-                                continue
-
-                        if has_reserved_slots:
-                            break
-
-                    sleep_time = random.uniform(*DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS)
-                    logger.info(f"Nothing was found during search attempt. Sleep for {sleep_time:.1f} seconds until next try...")
-                    await asyncio.sleep(sleep_time)
+                    await authenticator.clear_session()
+                    needs_authentication = True
         except Exception as e:
-            await notifier.notify_error(e)
+            await event_bus.publish(SearchFailed(chat_id, e))
             logger.error(e)
         finally:
-            search_task = None
-            await cleanup_browser(driver)
+            if search_tasks.get(chat_id) is asyncio.current_task():
+                del search_tasks[chat_id]
+
+            if standby_session:
+                await standby_session.cancel()
+
+            if slot_reserver:
+                await slot_reserver.close()
+
+            if http_client:
+                await http_client.close()
+
+            if authenticator:
+                try:
+                    # Cookies are wiped during browser cleanup, so latest session is stored before it
+                    await authenticator.save_session()
+                except Exception as e:
+                    logger.error(f"Cannot store session after search: {str(e)}")
+
+            if browser:
+                browser.driver.log_latency_report()
+                # Browser which cannot be cleaned up is recycled, so next search doesn't inherit previous session
+                await browser_pool.release(browser, recycle=not await cleanup_browser(browser.driver))
+
+    search_tasks[chat_id] = asyncio.create_task(run_search())
+
+
+async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    logger.info(f"Received '/stats' command from '{update.message.from_user.full_name}' with chat id '{update.message.chat_id}'")
+
+    try:
+        if update.message.chat_id not in ALLOW_LIST:
+            await update.message.reply_text(f'⛔ У вас немає прав на запуск поточної команди. Зверніться за допомогою до адміна бота.')
+            return None
+
+        summary = (f"{metrics.summary()}\nactive_searches: {len(search_tasks)}\nprobes: {probe_coalescer.summary()}"
+                   f"\nsearch_controller: {search_controller.summary()}\nevent_queues: {event_bus.summary()}")
+        if captcha_token_pool:
+            summary += f"\ncaptcha_pool: {captcha_token_pool.summary()}"
+
+        if observation_store:
+            office_ids = [office.id for office in resolve_search_settings(update.message.chat_id).offices]
+            observations = await observation_store.summary(
+                office_ids=office_ids, since=time.time() - OBSERVATIONS_STATS_WINDOW_HOURS * 3600
+            )
+            summary += f"\nobservations_{OBSERVATIONS_STATS_WINDOW_HOURS}h: {observations}"
+
+        # Telegram message is limited to 4096 characters
+        await update.message.reply_text(f"<pre>{html.escape(summary[:4000])}</pre>", parse_mode=ParseMode.HTML)
+    except telegram.error.Forbidden:
+        logger.error(f"'Cannot reply to the user '{update.message.from_user.full_name}'. Reason: bot was blocked by the user'")
+        return None
+
+
+async def startup(application: Application) -> None:
+    global metrics_server
+
+    notification_outbox.start()
+    event_bus.start()
+
+    if METRICS_ENABLED:
+        metrics_server = await start_metrics_server(host=METRICS_HOST, port=METRICS_PORT)
+
+    if captcha_token_pool:
+        captcha_token_pool.start()
+
+    if observation_store:
+        await observation_store.start()
+
+
+async def shutdown(application: Application) -> None:
+    if captcha_token_pool:
+        await captcha_token_pool.stop()
+
+    if observation_store:
+        await observation_store.stop()
+
+    if trace_recorder:
+        trace_recorder.flush()
+
+    await browser_pool.close()
+    # Events still queued are handled before outbox sends its last notifications
+    await event_bus.stop()
+    await notification_outbox.stop()
+    # Release history consumer is stopped with event bus, so history is complete by now
+    polling_scheduler.flush()
+
+    if metrics_server:
+        metrics_server.close()
+        await metrics_server.wait_closed()
 
-    search_task = asyncio.create_task(run_search())
 
 if __name__ == '__main__':
     if sys.platform == 'win32':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
-    driver = setup_chrome_driver()
+    browser_pool = BrowserPool()
+    captcha_token_pool = CaptchaTokenPool() if CAPTCHA_TOKEN_POOL_ENABLED else None
+    polling_scheduler = AdaptivePollingScheduler()
+    observation_store = ObservationStore() if OBSERVATION_STORE_ENABLED else None
+    trace_recorder = TraceRecorder() if TRACE_RECORDING_ENABLED else None
+    probe_coalescer = ProbeCoalescer()
+    request_rate_limiter = TokenBucketRateLimiter(rate_per_second=REQUEST_RATE_LIMIT_PER_SECOND,
+                                                  capacity=REQUEST_RATE_LIMIT_BURST)
+    # Captchas, errors and latency of all searches slow down (or pause) requests of all of them
+    search_controller = SearchFeedbackController(rate_limiter=request_rate_limiter)
     tg_bot = Bot(token=TELEGRAM_BOT_TOKEN_ID)
-    notifier = Notifier(bot=tg_bot, chat_id=CHAT_ID)
-    captcha_resolver = CaptchaResolver(driver=driver)
-    authenticator = Authenticator(driver=driver, notifier=notifier, captcha_resolver=captcha_resolver)
-    slot_reserver = SlotReserver(driver=driver, notifier=notifier, captcha_resolver=captcha_resolver, office_id=HSC_OFFICE_ID)
+    notification_outbox = NotificationOutbox(bot=tg_bot)
 
-    app = ApplicationBuilder().bot(tg_bot).build()
+    # Side effects of search (notifications, release history) are handled by consumers off the search loop.
+    # Discovery, reservation, captcha and re-authentication stay inline, since every step needs result of previous one.
+    event_bus = EventBus()
+    event_bus.subscribe('notifications', EventNotifier(bot=tg_bot, outbox=notification_outbox).handle, *NOTIFIED_EVENTS)
+    event_bus.subscribe('slot_release_history', lambda event: polling_scheduler.record_free_slots(event.slots), SlotsFound)
+
+    # Search settings of allowed chats are checked on start, so misconfiguration isn't found only on search start
+    for allowed_chat_id in ALLOW_LIST:
+        resolve_search_settings(allowed_chat_id)
+
+    app = ApplicationBuilder().bot(tg_bot).post_init(startup).post_shutdown(shutdown).build()
 
     app.add_handler(CommandHandler("search_start", search_start))
     app.add_handler(CommandHandler("search_stop", search_stop))
 
+    if STATS_COMMAND_ENABLED:
+        app.add_handler(CommandHandler("stats", stats))
+
     app.run_polling()
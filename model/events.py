@@ -0,0 +1,50 @@
+import time
+
+from model.models import Slot, SlotReservation
+
+
+class Event:
+    def __init__(self, chat_id: int):
+        self.chat_id = chat_id
+        self.created_at = time.time()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(chat_id={self.chat_id})"
+
+
+class SlotsFound(Event):
+    def __init__(self, chat_id: int, slots: list[Slot]):
+        super().__init__(chat_id)
+        self.slots = slots
+
+
+class ReservationMade(Event):
+    def __init__(self, chat_id: int, reservation: SlotReservation):
+        super().__init__(chat_id)
+        self.reservation = reservation
+
+
+class ReservationFailed(Event):
+    def __init__(self, chat_id: int, candidates_count: int):
+        super().__init__(chat_id)
+        self.candidates_count = candidates_count
+
+
+class ReservationApproved(Event):
+    def __init__(self, chat_id: int, reservation: SlotReservation):
+        super().__init__(chat_id)
+        self.reservation = reservation
+
+
+class TicketDownloaded(Event):
+    def __init__(self, chat_id: int, content: bytes, file_name: str):
+        super().__init__(chat_id)
+        # File content is carried in memory, since downloaded file is removed right after event is published
+        self.content = content
+        self.file_name = file_name
+
+
+class SearchFailed(Event):
+    def __init__(self, chat_id: int, error: Exception):
+        super().__init__(chat_id)
+        self.error = error
@@ -1,14 +1,38 @@
 from datetime import datetime, timedelta
 
 
+class Office:
+    def __init__(self, office_id: int, name: str, address: str, latitude: float, longitude: float, status: int = None):
+        self.id = office_id
+        self.name = name
+        self.address = address
+        self.latitude = latitude
+        self.longitude = longitude
+        self.status = status
+
+    @property
+    def location(self) -> dict:
+        return {
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'accuracy': 200
+        }
+
+    def __repr__(self):
+        return f"Office(id={self.id}, name='{self.name}' address='{self.address}')"
+
+
 class Slot:
-    def __init__(self, date: str, slot_id: int, ch_time: str):
+    def __init__(self, date: str, slot_id: int, ch_time: str, office_id: int = None, detected_at: float = None):
         self.id = slot_id
         self.ch_date = date
         self.ch_time = ch_time
+        self.office_id = office_id
+        # Unix time of free slots response which contained the slot
+        self.detected_at = detected_at
 
     def __repr__(self):
-        return f"Slot(id={self.id}, date='{self.ch_date}' chtime='{self.ch_time}')"
+        return f"Slot(id={self.id}, office_id={self.office_id} date='{self.ch_date}' chtime='{self.ch_time}')"
 
 
 class SlotReservation:
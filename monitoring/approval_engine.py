@@ -0,0 +1,77 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import APPROVE_RESERVATION_RETRY_THRESHOLD, APPROVAL_RE_RESERVE_MARGIN_SECONDS, \
+    APPROVAL_RETRY_DELAYS_SECONDS, APPROVAL_MAX_RESERVATIONS_PER_SLOT
+from exceptions.exceptions import ReservationApprovalException, ReservationExpiringException
+from model.models import SlotReservation
+from monitoring.slot_reserver import SlotReserver
+from utils.metrics import metrics
+
+
+def remaining_seconds(deadline: datetime) -> float:
+    return (deadline - datetime.now()).total_seconds()
+
+
+# Approves reservation within its expiration window: every step is budgeted against remaining time,
+# reservation is renewed before it expires and slot is given up early, so next candidate could be tried
+class ApprovalEngine:
+    def __init__(self, slot_reserver: SlotReserver):
+        self.slot_reserver = slot_reserver
+        self.step_timer = slot_reserver.step_timer
+
+    async def approve(self, reservation: SlotReservation) -> Optional[SlotReservation]:
+        slot = reservation.slot
+        reservations_count = 1
+        attempt = 0
+        renew = False
+
+        while attempt < APPROVE_RESERVATION_RETRY_THRESHOLD:
+            deadline = reservation.expired_at - timedelta(seconds=APPROVAL_RE_RESERVE_MARGIN_SECONDS)
+
+            if renew or remaining_seconds(deadline) <= 0:
+                renew = False
+
+                if reservations_count >= APPROVAL_MAX_RESERVATIONS_PER_SLOT:
+                    logger.warning(f"Reservation of {slot} expires and it was already made {reservations_count} times. Moving on...")
+                    return None
+
+                logger.info(f"Reservation of {slot} is about to expire. Reserving it again...")
+                with self.step_timer.measure('re_reserve'):
+                    renewed_reservation = await self.slot_reserver.renew_reservation(slot)
+
+                if not renewed_reservation:
+                    return None
+
+                reservation = renewed_reservation
+                reservations_count += 1
+                continue
+
+            try:
+                await self.slot_reserver.approve_reservation(reservation, deadline=deadline)
+                self.log_step_timings()
+
+                if slot.detected_at:
+                    metrics.observe('hsc_detection_to_reservation_seconds', time.time() - slot.detected_at)
+                return reservation
+            except ReservationExpiringException as e:
+                # Time left is not enough to approve, so fresh reservation gives whole window for approval
+                logger.warning(f"{str(e)}. Reserving {slot} again before approval...")
+                renew = True
+            except ReservationApprovalException:
+                delay = APPROVAL_RETRY_DELAYS_SECONDS[min(attempt, len(APPROVAL_RETRY_DELAYS_SECONDS) - 1)]
+                attempt += 1
+                logger.warning(f"[Attempt #{attempt}] Cannot approve reservation '{reservation.reservation_url}' "
+                               f"({remaining_seconds(deadline):.1f}s left). Trying again in {delay}s...")
+                await asyncio.sleep(max(0.0, min(delay, remaining_seconds(deadline))))
+
+        logger.warning(f"Approval retries limit exceeded for {slot}. Moving on...")
+        self.log_step_timings()
+        return None
+
+    def log_step_timings(self):
+        logger.info(f"Reservation step timings:\n{self.step_timer.summary()}")
@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+from datetime import datetime
+from html.parser import HTMLParser
+from typing import Callable, Awaitable, Optional
+
+from loguru import logger
+
+from config.configuration import AVAILABLE_DATES_TTL_SECONDS, AVAILABLE_DATES_REFRESH_INTERVAL_SECONDS
+
+
+class DataParamsParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.data_params: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag != 'a':
+            return
+
+        for name, value in attrs:
+            if name == 'data-params' and value:
+                self.data_params.append(value)
+
+
+def parse_available_dates(html: str) -> list[str]:
+    # Same as links parsing on step1 page in browser: every 'a[data-params]' carries bookable 'chdate'
+    parser = DataParamsParser()
+    parser.feed(html)
+
+    today = datetime.today().strftime('%Y-%m-%d')
+    dates = []
+
+    for data_params in parser.data_params:
+        try:
+            date = json.loads(data_params).get('chdate')
+        except ValueError as e:
+            logger.warning(f"Error parsing data-params '{data_params}': {str(e)}")
+            continue
+
+        if date and date != today and date not in dates:
+            dates.append(date)
+
+    return dates
+
+
+class CachedDates:
+    def __init__(self, dates: list[str]):
+        self.dates = dates
+        self.fetched_at = time.monotonic()
+
+
+# TTL'd cache of bookable dates per office, refreshed in background. Dates opened since previous refresh
+# are kept aside and 'dates_opened' is set, so search wakes up and probes them right away.
+class AvailableDatesCache:
+    def __init__(self, office_ids: list[int], fetch_dates: Callable[[bool], Awaitable[Optional[list[str]]]],
+                 ttl_seconds: float = AVAILABLE_DATES_TTL_SECONDS,
+                 refresh_interval_seconds: float = AVAILABLE_DATES_REFRESH_INTERVAL_SECONDS):
+        # Fetcher receives flag if browser could be used (background refresh should not navigate search browser)
+        self.office_ids = office_ids
+        self.fetch_dates = fetch_dates
+        self.ttl_seconds = ttl_seconds
+        self.refresh_interval_seconds = refresh_interval_seconds
+        self.entries: dict[int, CachedDates] = {}
+        self.newly_opened: dict[int, list[str]] = {}
+        self.dates_opened = asyncio.Event()
+        self.refresh_lock = asyncio.Lock()
+        self.refresh_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.refresh_task:
+            self.refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self.refresh_task:
+            self.refresh_task.cancel()
+            self.refresh_task = None
+
+    async def get_dates(self, office_id: int) -> list[str]:
+        entry = self.entries.get(office_id)
+
+        if not entry or time.monotonic() - entry.fetched_at > self.ttl_seconds:
+            logger.info(f"No fresh date records found for office {office_id}. Refreshing available dates...")
+            await self.refresh(allow_browser=True)
+            entry = self.entries.get(office_id)
+
+        return entry.dates if entry else []
+
+    def pop_newly_opened(self) -> list[tuple[int, str]]:
+        newly_opened = [(office_id, date) for office_id, dates in self.newly_opened.items() for date in dates]
+        self.newly_opened.clear()
+        self.dates_opened.clear()
+        return newly_opened
+
+    async def refresh(self, allow_browser: bool) -> bool:
+        async with self.refresh_lock:
+            dates = await self.fetch_dates(allow_browser)
+
+            # Failed fetch keeps previous dates, even if they are stale
+            if dates is None:
+                return False
+
+            today = datetime.today().strftime('%Y-%m-%d')
+            # Bookable dates are published per question, so one fetch refreshes all offices
+            for office_id in self.office_ids:
+                previous = self.entries.get(office_id)
+                self.entries[office_id] = CachedDates(dates=[date for date in dates if date > today])
+
+                if previous:
+                    opened = [date for date in dates if date not in previous.dates]
+                    if opened:
+                        logger.success(f"New dates opened for office {office_id}: {', '.join(opened)}")
+                        self.newly_opened.setdefault(office_id, []).extend(opened)
+                        self.dates_opened.set()
+
+            return True
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_interval_seconds)
+
+            try:
+                if not await self.refresh(allow_browser=False):
+                    logger.warning("Background refresh of available dates failed. Cached dates would be refreshed once they expire...")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Background refresh of available dates failed: {str(e)}")
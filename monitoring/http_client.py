@@ -0,0 +1,149 @@
+import json
+from io import BytesIO
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from auth.session_store import is_login_response
+from config.configuration import HSC_BASE_URL, HTTP_REQUEST_TIMEOUT_SECONDS
+from exceptions.exceptions import SessionExpiredException, AuthenticationExpiredException
+from utils.async_driver import AsyncDriver
+
+
+# Sends site XHR requests directly over HTTP, reusing cookies and csrf token of the authenticated browser
+class HscHttpClient:
+    def __init__(self, driver: AsyncDriver, base_url: str = HSC_BASE_URL):
+        self.driver = driver
+        self.base_url = base_url
+        self.csrf_token: Optional[str] = None
+        self.client: Optional[httpx.AsyncClient] = None
+
+    async def sync_session(self):
+        cookies = httpx.Cookies()
+        for cookie in await self.driver.get_cookies():
+            cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+
+        self.csrf_token = await self.driver.execute_script("""
+            const meta = document.getElementsByName('csrf-token')[0];
+            return meta ? meta.getAttribute('content') : null;
+        """)
+        user_agent = await self.driver.execute_script("return navigator.userAgent;")
+
+        await self.close()
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            cookies=cookies,
+            headers={
+                'User-Agent': user_agent,
+                'Accept-Language': 'uk-UA,uk;q=0.9,en-US;q=0.8,en;q=0.7',
+            },
+            timeout=HTTP_REQUEST_TIMEOUT_SECONDS,
+            follow_redirects=False,
+        )
+        logger.info(f"HTTP session synchronized with browser ({len(cookies.jar)} cookies, csrf token present: {bool(self.csrf_token)})")
+
+    async def close(self):
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+
+    async def post_xhr(self, path: str, data: dict) -> httpx.Response:
+        if not self.client or not self.csrf_token:
+            await self.sync_session()
+
+        return await self.client.post(
+            path,
+            data=data,
+            headers={
+                'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
+                'X-Csrf-Token': self.csrf_token,
+                'Accept': '*/*',
+                'Cache-Control': 'no-cache',
+                'X-Requested-With': 'XMLHttpRequest',
+            },
+        )
+
+    async def get_page(self, path: str) -> httpx.Response:
+        if not self.client:
+            await self.sync_session()
+
+        response = await self.client.get(path, headers={'Accept': 'text/html'})
+        self._check_authenticated(response)
+
+        # Redirect means either captcha or login page, both have to be handled inside the browser
+        if response.status_code != 200:
+            raise SessionExpiredException(f"Cannot get page '{path}' over HTTP. Status: {response.status_code}")
+
+        return response
+
+    async def get_free_times(self, office_id: int, date: str) -> dict:
+        data = {
+            'office_id': office_id,
+            'date_of_admission': date,
+            'question_id': 55,
+            'es_date': '',
+            'es_time': '',
+        }
+
+        for attempt in range(2):
+            response = await self.post_xhr('/site/freetimes', data)
+            self._check_authenticated(response)
+
+            # Captcha redirect has to be resolved inside the browser
+            if response.status_code == 302:
+                return {'content': response.text, 'status': 302}
+
+            if self._is_stale_response(response):
+                logger.warning(f"HTTP session looks stale (status {response.status_code}). Re-syncing with browser...")
+                await self.sync_session()
+                continue
+
+            return {'content': response.text, 'status': response.status_code}
+
+        raise SessionExpiredException(f"HTTP session is stale after re-sync with browser. Last status: {response.status_code}")
+
+    async def reserve(self, slot_id: int, email: str) -> dict:
+        response = await self.post_xhr('/site/reservecherga', {'id_chtime': slot_id, 'question_id': 55, 'email': email})
+        self._check_authenticated(response)
+
+        if response.status_code != 200:
+            raise SessionExpiredException(f"Cannot reserve slot over HTTP. Status: {response.status_code}")
+
+        return {'content': response.text, 'redirect-to': response.headers.get('X-Redirect')}
+
+    async def download(self, url: str) -> BytesIO:
+        if not self.client:
+            await self.sync_session()
+
+        buffer = BytesIO()
+
+        async with self.client.stream('GET', url) as response:
+            content_type = response.headers.get('Content-Type', '')
+
+            if response.status_code != 200 or 'pdf' not in content_type:
+                raise SessionExpiredException(f"Cannot download '{url}' over HTTP. Status: {response.status_code}, content type: '{content_type}'")
+
+            async for chunk in response.aiter_bytes():
+                buffer.write(chunk)
+
+        buffer.seek(0)
+        return buffer
+
+    @staticmethod
+    def _check_authenticated(response: httpx.Response):
+        if is_login_response(response.status_code, response.headers.get('Location'), response.text):
+            raise AuthenticationExpiredException(f"Site session expired (request '{response.request.url.path}' "
+                                                 f"responded with status {response.status_code})")
+
+    @staticmethod
+    def _is_stale_response(response: httpx.Response) -> bool:
+        if response.status_code in (400, 403, 419):
+            return True
+
+        try:
+            json.loads(response.text)
+            return False
+        except ValueError:
+            # Login or error page rendered instead of JSON payload
+            return True
@@ -0,0 +1,79 @@
+import json
+import math
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import HSC_OFFICES_FILE, HSC_OFFICE_ID, HSC_OFFICE_IDS, HSC_OFFICES_SEARCH_AREA, \
+    HSC_OFFICE_LOCATION
+from model.models import Office
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def load_offices(file_path: str = HSC_OFFICES_FILE) -> list[Office]:
+    with open(Path(file_path).absolute(), encoding='utf-8') as file:
+        raw_offices = json.load(file)
+
+    return [
+        Office(
+            office_id=item['id_offices'],
+            name=item['offices_name'],
+            address=item['offices_addr'],
+            latitude=float(item['lang']),
+            longitude=float(item['long']),
+            status=item.get('sts')
+        )
+        for item in raw_offices
+    ]
+
+
+def distance_km(latitude_from: float, longitude_from: float, latitude_to: float, longitude_to: float) -> float:
+    # Haversine formula
+    phi_from, phi_to = math.radians(latitude_from), math.radians(latitude_to)
+    delta_phi = math.radians(latitude_to - latitude_from)
+    delta_lambda = math.radians(longitude_to - longitude_from)
+
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi_from) * math.cos(phi_to) * math.sin(delta_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def select_offices(offices: list[Office], office_ids: Optional[list[int]] = None,
+                   search_area: Optional[dict] = None) -> list[Office]:
+    selected = {}
+
+    for office in offices:
+        if office_ids and office.id in office_ids:
+            selected[office.id] = office
+
+    if search_area:
+        for office in offices:
+            distance = distance_km(search_area['latitude'], search_area['longitude'], office.latitude, office.longitude)
+
+            if distance <= search_area['radius_km']:
+                selected[office.id] = office
+
+    return list(selected.values())
+
+
+def resolve_monitored_offices(office_ids: Optional[list[int]] = None,
+                              search_area: Optional[dict] = HSC_OFFICES_SEARCH_AREA) -> list[Office]:
+    if office_ids is None:
+        office_ids = HSC_OFFICE_IDS or ([HSC_OFFICE_ID] if HSC_OFFICE_ID else [])
+
+    offices = select_offices(load_offices(), office_ids=office_ids, search_area=search_area)
+
+    # Office could be missing in file, so it's monitored with configured location
+    known_ids = {office.id for office in offices}
+    for office_id in office_ids:
+        if office_id not in known_ids:
+            logger.warning(f"Office '{office_id}' not found in '{HSC_OFFICES_FILE}'. Using HSC_OFFICE_LOCATION for it...")
+            offices.append(Office(office_id=office_id, name=str(office_id), address='',
+                                  latitude=HSC_OFFICE_LOCATION['latitude'], longitude=HSC_OFFICE_LOCATION['longitude']))
+
+    if not offices:
+        raise ValueError("No HSC offices selected for monitoring. Check HSC_OFFICE_ID, HSC_OFFICE_IDS or HSC_OFFICES_SEARCH_AREA.")
+
+    logger.info(f"Monitoring {len(offices)} HSC offices: {', '.join(str(office.id) for office in offices)}")
+    return offices
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import os
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS, ADAPTIVE_POLLING_DELAY_RANGE_SECONDS, \
+    ADAPTIVE_POLLING_MIN_OBSERVATIONS, ADAPTIVE_POLLING_BURST_MIN_OBSERVATIONS, \
+    ADAPTIVE_POLLING_BURST_DURATION_SECONDS, SLOT_RELEASE_HISTORY_FILE, ADAPTIVE_POLLING_ENABLED
+from model.models import Slot
+
+# Time of week is split into 15 minutes buckets
+BUCKET_MINUTES = 15
+BUCKETS_PER_WEEK = 7 * 24 * 60 // BUCKET_MINUTES
+# Known release times are grouped with 5 minutes precision
+RELEASE_TIME_PRECISION_MINUTES = 5
+# Slots seen again within this gap are treated as the same release
+RELEASE_GAP_SECONDS = 1800
+# Wake up a bit after known release time, so slots are already published
+BURST_OFFSET_SECONDS = 5
+MAX_HISTORY_SIZE = 5000
+# Release history is written at most once per this interval (and on shutdown)
+HISTORY_SAVE_INTERVAL_SECONDS = 60
+
+
+def current_time() -> datetime:
+    # Derived from unix time, so search replay under virtual clock moves scheduler time as well
+    return datetime.fromtimestamp(time.time())
+
+
+def time_of_week_bucket(moment: datetime) -> int:
+    return (moment.weekday() * 24 * 60 + moment.hour * 60 + moment.minute) // BUCKET_MINUTES
+
+
+def time_of_week_release_key(moment: datetime) -> tuple[int, int, int]:
+    return moment.weekday(), moment.hour, moment.minute // RELEASE_TIME_PRECISION_MINUTES * RELEASE_TIME_PRECISION_MINUTES
+
+
+# Learns time of week when free slots are released and spends polling budget around those times.
+# When adaptive polling is disabled, releases are still learned, but delay is picked from fixed range.
+class AdaptivePollingScheduler:
+    def __init__(self, history_file: str = SLOT_RELEASE_HISTORY_FILE, enabled: bool = ADAPTIVE_POLLING_ENABLED):
+        self.enabled = enabled
+        self.history_file = Path(history_file).absolute()
+        self.releases: list[dict] = self._load_history()
+        self.last_seen_at: dict[tuple[int, str], datetime] = {}
+        self.bucket_counts = Counter(time_of_week_bucket(datetime.fromisoformat(item['seen_at'])) for item in self.releases)
+        self.unsaved = False
+        self.saved_at = time.monotonic()
+        # Unix time of the next poll shared by searches of all chats
+        self.next_poll_at: Optional[float] = None
+
+    def record_free_slots(self, slots: list[Slot]):
+        now = current_time()
+
+        for key in {(slot.office_id, slot.ch_date) for slot in slots}:
+            last_seen_at = self.last_seen_at.get(key)
+            self.last_seen_at[key] = now
+
+            if last_seen_at and (now - last_seen_at).total_seconds() < RELEASE_GAP_SECONDS:
+                continue
+
+            self.releases.append({'office_id': key[0], 'date': key[1], 'seen_at': now.isoformat()})
+            self.bucket_counts[time_of_week_bucket(now)] += 1
+            self.unsaved = True
+            logger.info(f"Recorded slot release in office {key[0]} on date {key[1]} at {now:%a %H:%M}")
+
+        if len(self.releases) > MAX_HISTORY_SIZE:
+            self.releases = self.releases[-MAX_HISTORY_SIZE:]
+            self.bucket_counts = Counter(time_of_week_bucket(datetime.fromisoformat(item['seen_at'])) for item in self.releases)
+
+        if time.monotonic() - self.saved_at >= HISTORY_SAVE_INTERVAL_SECONDS:
+            self.flush()
+
+    def flush(self):
+        if self.unsaved:
+            self._save_history()
+
+    def release_intensity(self, moment: datetime) -> float:
+        # Relative release probability of time of week bucket (1.0 is average), smoothed with neighbour buckets
+        bucket = time_of_week_bucket(moment)
+        smoothed = (0.25 * self.bucket_counts[(bucket - 1) % BUCKETS_PER_WEEK]
+                    + 0.5 * self.bucket_counts[bucket]
+                    + 0.25 * self.bucket_counts[(bucket + 1) % BUCKETS_PER_WEEK])
+        total = sum(self.bucket_counts.values())
+
+        return BUCKETS_PER_WEEK * (smoothed + 1) / (total + BUCKETS_PER_WEEK)
+
+    def known_release_times(self) -> list[tuple[int, int, int]]:
+        counts = Counter(time_of_week_release_key(datetime.fromisoformat(item['seen_at'])) for item in self.releases)
+        return [key for key, count in counts.items() if count >= ADAPTIVE_POLLING_BURST_MIN_OBSERVATIONS]
+
+    def next_delay(self, now: datetime = None) -> float:
+        now = now or current_time()
+
+        if not self.enabled or len(self.releases) < ADAPTIVE_POLLING_MIN_OBSERVATIONS:
+            return random.uniform(*DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS)
+
+        min_delay, max_delay = ADAPTIVE_POLLING_DELAY_RANGE_SECONDS
+        release_times = [self._next_occurrence(now, key) for key in self.known_release_times()]
+
+        # Poll hard right after known release time
+        if any(0 <= (now - release_time).total_seconds() <= ADAPTIVE_POLLING_BURST_DURATION_SECONDS
+               for release_time in release_times):
+            return min_delay
+
+        # Request rate is proportional to release intensity, so average rate over week stays the same as fixed delays
+        base_delay = random.uniform(*DELAYS_BETWEEN_SEARCH_ATTEMPT_SECONDS)
+        delay = min(max_delay, max(min_delay, base_delay / self.release_intensity(now)))
+
+        # Align wake up with the clock if known release time comes earlier
+        upcoming = [(release_time - now).total_seconds() + BURST_OFFSET_SECONDS
+                    for release_time in release_times if release_time > now]
+        upcoming = [seconds for seconds in upcoming if seconds < delay]
+
+        return min(upcoming) if upcoming else delay
+
+    async def sleep_until_next_poll(self, wake_up: Optional[asyncio.Event] = None):
+        now = time.time()
+
+        # Searches of all chats wake up together, so their probes of the same office and date are served by one request
+        if self.next_poll_at is None or self.next_poll_at <= now:
+            self.next_poll_at = now + self.next_delay()
+
+        sleep_time = self.next_poll_at - now
+        logger.info(f"Nothing was found during search attempt. Sleep for {sleep_time:.1f} seconds until next try...")
+
+        if not wake_up:
+            await asyncio.sleep(sleep_time)
+            return
+
+        # Search could be woken up earlier, e.g. by newly opened dates
+        try:
+            await asyncio.wait_for(wake_up.wait(), timeout=sleep_time)
+            logger.info("Woken up before next poll. Starting search attempt...")
+        except asyncio.TimeoutError:
+            pass
+
+    @staticmethod
+    def _next_occurrence(now: datetime, release_key: tuple[int, int, int]) -> datetime:
+        weekday, hour, minute = release_key
+        week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+        occurrence = week_start + timedelta(days=weekday, hours=hour, minutes=minute)
+
+        if occurrence + timedelta(seconds=ADAPTIVE_POLLING_BURST_DURATION_SECONDS) < now:
+            occurrence += timedelta(weeks=1)
+
+        return occurrence
+
+    def _load_history(self) -> list[dict]:
+        if not os.path.exists(self.history_file):
+            return []
+
+        try:
+            with open(self.history_file, encoding='utf-8') as file:
+                return json.load(file)
+        except (ValueError, OSError) as e:
+            logger.warning(f"Cannot load slot release history from '{self.history_file}': {str(e)}. Starting from scratch...")
+            return []
+
+    def _save_history(self):
+        # History is replaced atomically, so crash during write doesn't corrupt it
+        temp_file = self.history_file.with_name(self.history_file.name + '.tmp')
+
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as file:
+                json.dump(self.releases, file)
+            os.replace(temp_file, self.history_file)
+        except OSError as e:
+            logger.warning(f"Cannot save slot release history to '{self.history_file}': {str(e)}")
+            return
+
+        self.unsaved = False
+        self.saved_at = time.monotonic()
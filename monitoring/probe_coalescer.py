@@ -0,0 +1,80 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from config.configuration import PROBE_RESULT_SHARE_SECONDS
+from utils.metrics import metrics
+
+
+class SharedResult:
+    def __init__(self, value: Any):
+        self.value = value
+        self.completed_at = time.monotonic()
+
+
+# Single-flight of probes shared by all search sessions: concurrent (and recently answered) requests with the same key
+# are served by one upstream request, so request volume grows with distinct (office, date) pairs, not with users.
+# Search attempts of chats are aligned by shared polling scheduler, so their probes meet within share window.
+class ProbeCoalescer:
+    def __init__(self, share_seconds: float = PROBE_RESULT_SHARE_SECONDS):
+        self.share_seconds = share_seconds
+        self.in_flight: dict[Hashable, asyncio.Future] = {}
+        self.results: dict[Hashable, SharedResult] = {}
+        self.requested = 0
+        self.coalesced = 0
+
+    async def probe(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        self.requested += 1
+        metrics.inc('hsc_probe_requests_total')
+
+        result = self.results.get(key)
+        if result and time.monotonic() - result.completed_at <= self.share_seconds:
+            self._record_coalesced()
+            return result.value
+
+        in_flight = self.in_flight.get(key)
+        if in_flight:
+            try:
+                value = await asyncio.shield(in_flight)
+                self._record_coalesced()
+                return value
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # Leader sweep was stopped, so follower tries on its own
+                return await fetch()
+            except Exception:
+                # Leader failure could be specific to its session (e.g. expired), so follower tries on its own
+                return await fetch()
+
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+
+        try:
+            value = await fetch()
+            self.results[key] = SharedResult(value)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Exception is handled by followers, so it should not be reported as never retrieved
+            future.exception()
+            raise
+        finally:
+            self.in_flight.pop(key, None)
+            self._evict_expired()
+
+    def _record_coalesced(self):
+        self.coalesced += 1
+        metrics.inc('hsc_probe_requests_coalesced_total')
+
+    def summary(self) -> str:
+        return f"requested={self.requested} coalesced={self.coalesced} upstream={self.requested - self.coalesced}"
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        for key in [key for key, result in self.results.items() if now - result.completed_at > self.share_seconds]:
+            del self.results[key]
@@ -0,0 +1,182 @@
+import asyncio
+import statistics
+import time
+from collections import deque
+from enum import Enum
+from typing import Optional
+
+from loguru import logger
+
+from captcha.solve_budget import CaptchaSolveBudget, captcha_budget
+from config.configuration import SEARCH_FEEDBACK_WINDOW_SECONDS, SEARCH_CAPTCHA_TARGET_RATE, SEARCH_MIN_RATE_FRACTION, \
+    SEARCH_SLOW_PROBE_SECONDS, SEARCH_CIRCUIT_FAILURE_THRESHOLD, SEARCH_CIRCUIT_OPEN_SECONDS, \
+    HTTP_REQUEST_TIMEOUT_SECONDS
+from utils.metrics import metrics
+from utils.rate_limiter import TokenBucketRateLimiter
+
+# Request rate grows back by this fraction of configured rate after every successful request
+RATE_RECOVERY_STEP = 0.02
+# Request rate is slowed down by this factor after every slow request
+SLOW_PROBE_BACKOFF = 0.9
+# Another trial request is allowed if previous one hasn't reported back within this time (e.g. it was cancelled)
+HALF_OPEN_TRIAL_TIMEOUT_SECONDS = 2 * HTTP_REQUEST_TIMEOUT_SECONDS
+HALF_OPEN_POLL_SECONDS = 1
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+
+class ProbeOutcome:
+    def __init__(self, status: Optional[int], latency: float):
+        self.status = status
+        self.latency = latency
+        self.observed_at = time.monotonic()
+
+
+# Feedback controller of free slots requests shared by all search sessions. Request rate is halved when captchas
+# come more often than targeted and slowly grows back on successful requests (AIMD), so money spent on captchas
+# goes to slots found rather than to raw request throughput. Repeated failures open circuit, then search is paused
+# and resumed with a single trial request. Captcha solves are capped per hour by global budget.
+class SearchFeedbackController:
+    def __init__(self, rate_limiter: TokenBucketRateLimiter, window_seconds: float = SEARCH_FEEDBACK_WINDOW_SECONDS,
+                 captcha_target_rate: float = SEARCH_CAPTCHA_TARGET_RATE,
+                 solve_budget: CaptchaSolveBudget = captcha_budget):
+        self.rate_limiter = rate_limiter
+        self.base_rate = rate_limiter.rate_per_second
+        self.base_capacity = rate_limiter.capacity
+        self.rate_fraction = 1.0
+        self.window_seconds = window_seconds
+        self.captcha_target_rate = captcha_target_rate
+        self.solve_budget = solve_budget
+
+        self.outcomes: deque[ProbeOutcome] = deque()
+        self.captcha_timestamps: deque[float] = deque()
+
+        self.state = CircuitState.CLOSED
+        self.consecutive_failures = 0
+        self.open_count = 0
+        self.reopen_at = 0.0
+        self.trial_started_at: Optional[float] = None
+
+        self.slots_found = 0
+
+    async def before_probe(self):
+        while True:
+            now = time.monotonic()
+
+            if self.state == CircuitState.OPEN:
+                if now < self.reopen_at:
+                    await asyncio.sleep(self.reopen_at - now)
+                    continue
+
+                logger.info("Search circuit is half-open. Sending trial request...")
+                self.state = CircuitState.HALF_OPEN
+                self.trial_started_at = None
+
+            if self.state == CircuitState.HALF_OPEN:
+                if self.trial_started_at and now - self.trial_started_at < HALF_OPEN_TRIAL_TIMEOUT_SECONDS:
+                    await asyncio.sleep(HALF_OPEN_POLL_SECONDS)
+                    continue
+
+                self.trial_started_at = now
+
+            return
+
+    def record_probe(self, status: int, latency: float):
+        self._append_outcome(ProbeOutcome(status, latency))
+
+        # Captcha redirect is still a response of working site, its cost is handled in captcha feedback
+        if status not in (200, 302):
+            self._record_failure()
+            return
+
+        self._record_success()
+
+        if status != 200:
+            return
+
+        if latency > SEARCH_SLOW_PROBE_SECONDS:
+            self._set_rate_fraction(self.rate_fraction * SLOW_PROBE_BACKOFF)
+        elif self.captcha_rate() <= self.captcha_target_rate:
+            self._set_rate_fraction(self.rate_fraction + RATE_RECOVERY_STEP)
+
+    def record_error(self):
+        self._append_outcome(ProbeOutcome(None, 0))
+        self._record_failure()
+
+    def record_captcha(self):
+        self.captcha_timestamps.append(time.monotonic())
+        self._evict_expired()
+
+        captcha_rate = self.captcha_rate()
+        if captcha_rate > self.captcha_target_rate:
+            self._set_rate_fraction(self.rate_fraction / 2)
+            logger.warning(f"Captcha rate {captcha_rate:.3f} is above target {self.captcha_target_rate}. "
+                           f"Request rate is slowed down to {self.rate_limiter.rate_per_second:.3f}/s")
+
+    def record_slots_found(self, count: int):
+        self.slots_found += count
+
+    def captcha_rate(self) -> float:
+        # Single captcha among first few requests is not a reason to slow down yet
+        return len(self.captcha_timestamps) / max(len(self.outcomes), 1 / self.captcha_target_rate)
+
+    def summary(self) -> str:
+        latencies = [outcome.latency for outcome in self.outcomes if outcome.status == 200]
+        median_latency = statistics.median(latencies) if latencies else 0
+        spent = self.solve_budget.spent
+        slots_per_captcha = f"{self.slots_found / spent:.2f}" if spent else 'n/a'
+
+        return (f"circuit={self.state.value} rate={self.rate_limiter.rate_per_second:.3f}/s "
+                f"({self.rate_fraction:.0%}) captcha_rate={self.captcha_rate():.3f} "
+                f"median_latency={median_latency:.2f}s captchas_last_hour={self.solve_budget.summary()} "
+                f"slots_per_captcha={slots_per_captcha}")
+
+    def _record_success(self):
+        self.consecutive_failures = 0
+
+        if self.state == CircuitState.HALF_OPEN:
+            logger.success("Search circuit is closed after successful trial request")
+            self.state = CircuitState.CLOSED
+            self.open_count = 0
+
+    def _record_failure(self):
+        self.consecutive_failures += 1
+
+        if self.state == CircuitState.HALF_OPEN or (
+                self.state == CircuitState.CLOSED and self.consecutive_failures >= SEARCH_CIRCUIT_FAILURE_THRESHOLD):
+            self._open_circuit()
+
+    def _open_circuit(self):
+        open_seconds = SEARCH_CIRCUIT_OPEN_SECONDS[min(self.open_count, len(SEARCH_CIRCUIT_OPEN_SECONDS) - 1)]
+        self.open_count += 1
+        self.state = CircuitState.OPEN
+        self.reopen_at = time.monotonic() + open_seconds
+        metrics.inc('hsc_search_circuit_opened_total')
+        logger.error(f"Search circuit is opened after {self.consecutive_failures} failed requests. "
+                     f"Search is paused for {open_seconds} seconds...")
+
+    def _set_rate_fraction(self, fraction: float):
+        fraction = min(1.0, max(SEARCH_MIN_RATE_FRACTION, fraction))
+        if fraction == self.rate_fraction:
+            return
+
+        self.rate_fraction = fraction
+        self.rate_limiter.set_rate(rate_per_second=self.base_rate * self.rate_fraction,
+                                   capacity=max(1, round(self.base_capacity * self.rate_fraction)))
+
+    def _append_outcome(self, outcome: ProbeOutcome):
+        self.outcomes.append(outcome)
+        self._evict_expired()
+
+    def _evict_expired(self):
+        threshold = time.monotonic() - self.window_seconds
+
+        while self.outcomes and self.outcomes[0].observed_at < threshold:
+            self.outcomes.popleft()
+
+        while self.captcha_timestamps and self.captcha_timestamps[0] < threshold:
+            self.captcha_timestamps.popleft()
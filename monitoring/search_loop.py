@@ -0,0 +1,62 @@
+import random
+from typing import Optional, Callable, Awaitable
+
+from loguru import logger
+
+from config.configuration import RESERVATION_FAST_PATH_ENABLED
+from exceptions.exceptions import ReservationException
+from model.models import SlotReservation
+from monitoring.approval_engine import ApprovalEngine
+from monitoring.polling_scheduler import AdaptivePollingScheduler
+from monitoring.slot_reserver import SlotReserver
+
+
+# Search attempts of one search session: free slots are found, reserved right away and reservation is approved.
+# Bot search and benchmark replay run the same loop, side effects are left to event bus consumers.
+class SearchLoop:
+    def __init__(self, slot_reserver: SlotReserver, polling_scheduler: AdaptivePollingScheduler,
+                 approval_engine: Optional[ApprovalEngine] = None, fast_path: bool = RESERVATION_FAST_PATH_ENABLED,
+                 before_attempt: Optional[Callable[[], Awaitable]] = None):
+        self.slot_reserver = slot_reserver
+        self.polling_scheduler = polling_scheduler
+        self.approval_engine = approval_engine
+        self.fast_path = fast_path
+        self.before_attempt = before_attempt
+
+    async def run(self, should_continue: Callable[[], bool] = lambda: True) -> Optional[SlotReservation]:
+        # Expired authentication is raised to caller, which decides how to restore session
+        while should_continue():
+            if self.before_attempt:
+                await self.before_attempt()
+
+            try:
+                reservation = await self.attempt()
+            except ReservationException as e:
+                # Slots were found just now, so search goes on without sleep
+                logger.error(f"Error during slot reservation: {str(e)}. Continuing without fallback...")
+                continue
+
+            if reservation:
+                return reservation
+
+            await self.polling_scheduler.sleep_until_next_poll(wake_up=self.slot_reserver.dates_cache.dates_opened)
+
+        return None
+
+    async def attempt(self) -> Optional[SlotReservation]:
+        free_slots = await self.slot_reserver.get_free_slots()
+
+        if not free_slots:
+            return None
+
+        if self.fast_path:
+            reservation = await self.slot_reserver.reserve_best_slot(free_slots)
+        else:
+            reservation = await self.slot_reserver.reserve_slot(random.choice(free_slots))
+
+        if self.approval_engine:
+            # Slot approval could be given up early, then next ranked candidate is reserved
+            while not await self.approval_engine.approve(reservation):
+                reservation = await self.slot_reserver.reserve_best_slot()
+
+        return reservation
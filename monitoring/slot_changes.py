@@ -0,0 +1,94 @@
+import hashlib
+import time
+from typing import Callable
+
+from loguru import logger
+
+from config.configuration import LINGERING_SLOT_RETRY_SECONDS, RESERVATION_NEGATIVE_CACHE_SECONDS
+from model.models import Slot
+from utils.metrics import metrics
+
+
+def content_fingerprint(content: str) -> bytes:
+    return hashlib.blake2b(content.encode(), digest_size=16).digest()
+
+
+class FreeSlotsSnapshot:
+    def __init__(self, fingerprint: bytes, slots: list[Slot]):
+        self.fingerprint = fingerprint
+        self.slots = slots
+
+
+# Parsed free slots responses by (office, date) fingerprint. Unchanged response is not parsed again, and its slots
+# keep time of first detection. Returns all listed slots and the ones which were not listed in previous response.
+class FreeSlotsParser:
+    def __init__(self):
+        self.snapshots: dict[tuple[int, str], FreeSlotsSnapshot] = {}
+
+    def parse(self, office_id: int, date: str, content: str,
+              parse: Callable[[], list[Slot]]) -> tuple[list[Slot], list[Slot]]:
+        key = (office_id, date)
+        fingerprint = content_fingerprint(content)
+        snapshot = self.snapshots.get(key)
+
+        if snapshot and snapshot.fingerprint == fingerprint:
+            return snapshot.slots, []
+
+        previous_slots = {slot.id: slot for slot in snapshot.slots} if snapshot else {}
+        # Slots which are still listed keep time of first detection
+        slots = [previous_slots.get(slot.id, slot) for slot in parse()]
+        self.snapshots[key] = FreeSlotsSnapshot(fingerprint, slots)
+
+        return slots, [slot for slot in slots if slot.id not in previous_slots]
+
+
+# Tracks which free slots of (office, date) appeared or disappeared since previous probe, so search gets only slots
+# which are worth reserving: newly appeared ones, lingering ones from time to time, and none which just failed.
+# Slots count as offered only once search actually passes them on to reservation (see mark_offered).
+class SlotChangeDetector:
+    def __init__(self, lingering_retry_seconds: float = LINGERING_SLOT_RETRY_SECONDS,
+                 negative_cache_seconds: float = RESERVATION_NEGATIVE_CACHE_SECONDS):
+        self.lingering_retry_seconds = lingering_retry_seconds
+        self.negative_cache_seconds = negative_cache_seconds
+        self.listed_ids: dict[tuple[int, str], set[int]] = {}
+        self.offered_at: dict[int, float] = {}
+        self.failed_at: dict[int, float] = {}
+
+    def new_slots(self, office_id: int, date: str, slots: list[Slot]) -> list[Slot]:
+        key = (office_id, date)
+        ids = {slot.id for slot in slots}
+        previous_ids = self.listed_ids.get(key, set())
+        self.listed_ids[key] = ids
+
+        appeared, disappeared = ids - previous_ids, previous_ids - ids
+        if appeared or disappeared:
+            logger.info(f"Free slots changed in office {office_id} on date {date}: "
+                        f"appeared {sorted(appeared)}, disappeared {sorted(disappeared)}")
+            metrics.inc('hsc_slot_changes_total', len(appeared), change='appeared')
+            metrics.inc('hsc_slot_changes_total', len(disappeared), change='disappeared')
+
+        for slot_id in disappeared:
+            self.offered_at.pop(slot_id, None)
+
+        now = time.monotonic()
+        self._evict_failed(now)
+
+        return [
+            slot for slot in slots
+            if slot.id not in self.failed_at and (slot.id in appeared or slot.id not in self.offered_at
+                                                  or now - self.offered_at[slot.id] >= self.lingering_retry_seconds)
+        ]
+
+    def mark_offered(self, slots: list[Slot]):
+        now = time.monotonic()
+
+        for slot in slots:
+            self.offered_at[slot.id] = now
+
+    def mark_failed(self, slot: Slot):
+        self.failed_at[slot.id] = time.monotonic()
+
+    def _evict_failed(self, now: float):
+        for slot_id in [slot_id for slot_id, failed_at in self.failed_at.items()
+                        if now - failed_at >= self.negative_cache_seconds]:
+            del self.failed_at[slot_id]
@@ -0,0 +1,51 @@
+from config.configuration import PREFERRED_TIME_WINDOWS, PREFERRED_OFFICE_IDS
+from model.models import Slot
+
+
+# Keeps candidate slots indexed by (office, date, time) and ranks them by user preferences:
+# earliest date first, then slots inside preferred time windows, then preferred offices
+class SlotRanker:
+    def __init__(self, preferred_time_windows: list[tuple[str, str]] = PREFERRED_TIME_WINDOWS,
+                 preferred_office_ids: list[int] = PREFERRED_OFFICE_IDS):
+        self.preferred_time_windows = preferred_time_windows
+        self.office_ranks = {office_id: rank for rank, office_id in enumerate(preferred_office_ids)}
+        # Several slots (e.g. different examiners) could share the same time
+        self.index: dict[tuple[int, str, str], list[Slot]] = {}
+
+    def replace(self, slots: list[Slot]):
+        self.index = {}
+        for slot in slots:
+            self.index.setdefault(self._key(slot), []).append(slot)
+
+    def remove(self, slot: Slot):
+        key = self._key(slot)
+        candidates = [candidate for candidate in self.index.get(key, []) if candidate.id != slot.id]
+
+        if candidates:
+            self.index[key] = candidates
+        else:
+            self.index.pop(key, None)
+
+    def rank(self) -> list[Slot]:
+        return sorted((slot for slots in self.index.values() for slot in slots), key=self._rank_key)
+
+    def __len__(self):
+        return sum(len(slots) for slots in self.index.values())
+
+    def _in_preferred_window(self, slot: Slot) -> bool:
+        if not self.preferred_time_windows:
+            return True
+
+        return any(start <= slot.ch_time <= end for start, end in self.preferred_time_windows)
+
+    def _rank_key(self, slot: Slot) -> tuple:
+        return (
+            slot.ch_date,
+            not self._in_preferred_window(slot),
+            self.office_ranks.get(slot.office_id, len(self.office_ranks)),
+            slot.ch_time
+        )
+
+    @staticmethod
+    def _key(slot: Slot) -> tuple[int, str, str]:
+        return slot.office_id, slot.ch_date, slot.ch_time
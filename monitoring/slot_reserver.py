@@ -1,38 +1,110 @@
 import asyncio
 import json
-import os
 import random
+import shutil
+import time
+import uuid
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Callable, Awaitable
 
 from loguru import logger
-from selenium.webdriver import Chrome
 from selenium.webdriver.common.by import By
+from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.wait import WebDriverWait
 
+from auth.session_store import is_login_response
 from captcha.captcha_resolver import CaptchaResolver
+from captcha.captcha_state import CaptchaState
 from config.configuration import DELAYS_BETWEEN_DAY_MONITORING_SECONDS, BROWSER_DOWNLOADS_FOLDER, USER_EMAIL, \
-    DELAY_BEFORE_RESERVATION_SECONDS, START_FROM_DATE
-from exceptions.exceptions import ReservationException, ReservationApprovalException
-from model.models import Slot, SlotReservation
-from notification.notifier import Notifier
-from utils.driver_utils import take_screenshot
+    DELAY_BEFORE_RESERVATION_SECONDS, FAN_OUT_MODE_ENABLED, FAN_OUT_CONCURRENCY, \
+    REQUEST_RATE_LIMIT_PER_SECOND, REQUEST_RATE_LIMIT_BURST, PDF_DOWNLOAD_TIMEOUT_SECONDS
+from exceptions.exceptions import ReservationException, ReservationApprovalException, SessionExpiredException, \
+    AuthenticationExpiredException, ReservationExpiringException
+from model.events import SlotsFound, ReservationMade, ReservationFailed, ReservationApproved, TicketDownloaded
+from model.models import Slot, SlotReservation, Office
+from monitoring.date_cache import AvailableDatesCache, parse_available_dates
+from monitoring.http_client import HscHttpClient
+from monitoring.probe_coalescer import ProbeCoalescer
+from monitoring.search_controller import SearchFeedbackController
+from monitoring.slot_changes import FreeSlotsParser, SlotChangeDetector
+from monitoring.slot_ranking import SlotRanker
+from monitoring.tenants import SearchSettings
+from storage.observation_store import ObservationStore, ProbeObservation
+from storage.trace_recorder import TraceRecorder
+from utils.async_driver import AsyncDriver
+from utils.download_watcher import wait_for_download
+from utils.driver_utils import take_screenshot, set_geolocation
+from utils.event_bus import EventBus
+from utils.histogram import StepTimer
+from utils.metrics import metrics, STAGE_SECONDS
+from utils.rate_limiter import TokenBucketRateLimiter
 
 
 class SlotReserver:
-    def __init__(self, driver: Chrome, notifier: Notifier, captcha_resolver: CaptchaResolver, office_id: int):
-        self.notifier = notifier
+    def __init__(self, driver: AsyncDriver, event_bus: EventBus, captcha_resolver: CaptchaResolver, settings: SearchSettings,
+                 http_client: Optional[HscHttpClient] = None, observation_store: Optional[ObservationStore] = None,
+                 probe_coalescer: Optional[ProbeCoalescer] = None,
+                 rate_limiter: Optional[TokenBucketRateLimiter] = None, fan_out: bool = FAN_OUT_MODE_ENABLED,
+                 trace_recorder: Optional[TraceRecorder] = None,
+                 search_controller: Optional[SearchFeedbackController] = None):
+        self.event_bus = event_bus
         self.captcha_resolver = captcha_resolver
         self.driver = driver
-        self.office_id = office_id
-        self.available_dates_map = {}
-        self.driver_wait = WebDriverWait(driver=self.driver, timeout=30)
+        self.http_client = http_client
+        self.observation_store = observation_store
+        self.probe_coalescer = probe_coalescer
+        self.trace_recorder = trace_recorder
+        self.search_controller = search_controller
+        self.fan_out = fan_out
+        self.settings = settings
+        self.offices = settings.offices
+        self.offices_by_id = {office.id: office for office in self.offices}
+        self.slot_ranker = SlotRanker(preferred_time_windows=settings.preferred_time_windows,
+                                      preferred_office_ids=settings.preferred_office_ids)
+        self.free_slots_parser = FreeSlotsParser()
+        self.slot_changes = SlotChangeDetector()
+        self.step_timer = StepTimer(on_observe=lambda step, seconds: metrics.observe(STAGE_SECONDS, seconds, stage=step))
+        self.dates_cache = AvailableDatesCache(office_ids=list(self.offices_by_id), fetch_dates=self._fetch_available_dates)
+        # Limiter is shared between search sessions, since they all hit the same site
+        self.rate_limiter = rate_limiter or TokenBucketRateLimiter(rate_per_second=REQUEST_RATE_LIMIT_PER_SECOND,
+                                                                   capacity=REQUEST_RATE_LIMIT_BURST)
+        self.fan_out_semaphore = asyncio.Semaphore(FAN_OUT_CONCURRENCY)
+        self.captcha_lock = asyncio.Lock()
+        self.captcha_generation = 0
+
+    async def _fetch_available_dates(self, allow_browser: bool) -> Optional[list[str]]:
+        with metrics.measure_stage('date_discovery'):
+            dates = await self._discover_available_dates(allow_browser)
+
+        if dates is not None and self.trace_recorder:
+            self.trace_recorder.record_dates(dates)
+
+        return dates
+
+    async def _discover_available_dates(self, allow_browser: bool) -> Optional[list[str]]:
+        if self.http_client:
+            try:
+                # Bookable dates are the same for all chats
+                response = await self._coalesced(('dates',), lambda: self.http_client.get_page('/site/step1?value=55'))
+                dates = parse_available_dates(response.text)
+
+                # Captcha or login page (or changed markup) has no date links, it's not a proof that dates are gone
+                if dates:
+                    return dates
 
-    async def _propagate_available_dates(self):
-        self.driver.refresh()
+                logger.warning("No available dates found on step1 page fetched over HTTP")
+            except AuthenticationExpiredException:
+                raise
+            except Exception as e:
+                logger.warning(f"Cannot fetch available dates over HTTP: {str(e)}")
 
+        if not allow_browser:
+            return None
+
+        return await self._fetch_available_dates_in_browser()
+
+    async def _fetch_available_dates_in_browser(self) -> list[str]:
         if await self.captcha_resolver.has_captcha():
             await self.captcha_resolver.resolve_captcha_code()
 
@@ -40,8 +112,8 @@ class SlotReserver:
             location.href = 'https://eq.hsc.gov.ua/site/step1?value=55'
         """
 
-        self.driver.execute_script(go_to_dates_url_script)
-        self.driver_wait.until(EC.url_to_be('https://eq.hsc.gov.ua/site/step1?value=55'))
+        await self.driver.execute_script(go_to_dates_url_script)
+        await self.driver.wait_until(EC.url_to_be('https://eq.hsc.gov.ua/site/step1?value=55'))
 
         get_available_dates_script = """
             const dates = [];
@@ -67,80 +139,269 @@ class SlotReserver:
             return JSON.stringify(dates);
         """
 
-        available_dates_json = self.driver.execute_script(get_available_dates_script)
+        available_dates_json = await self.driver.execute_script(get_available_dates_script)
         available_dates = json.loads(available_dates_json)
 
-        if START_FROM_DATE:
-            available_dates = [date for date in available_dates if date >= START_FROM_DATE]
-
-        today = datetime.today().strftime('%Y-%m-%d')
-        self.available_dates_map[today] = available_dates
-
         go_to_base_url_back_script = """
             location.href = 'https://eq.hsc.gov.ua/site/step0'
         """
 
-        self.driver.execute_script(go_to_base_url_back_script)
-        self.driver_wait.until(EC.url_to_be('https://eq.hsc.gov.ua/site/step0'))
+        await self.driver.execute_script(go_to_base_url_back_script)
+        await self.driver.wait_until(EC.url_to_be('https://eq.hsc.gov.ua/site/step0'))
+
+        return available_dates
 
     async def get_free_slots(self) -> list[Slot]:
-        today = datetime.today().strftime('%Y-%m-%d')
+        self.dates_cache.start()
 
-        date_range = self.available_dates_map.get(today)
+        dates_by_office = {
+            office.id: [date for date in await self.dates_cache.get_dates(office.id) if self.settings.in_date_window(date)]
+            for office in self.offices
+        }
+        date_range = sorted({date for dates in dates_by_office.values() for date in dates})
 
         if not date_range:
-            logger.info(f"No date records found for '{today}'. Propagating new dates to map...")
-            await self._propagate_available_dates()
-            date_range = self.available_dates_map.get(today)
+            logger.warning("No available dates found for monitored offices. Skipping search attempt...")
+            return []
+
+        logger.info(f"Trying to get free slots in {len(self.offices)} offices with date range from {date_range[0]} to {date_range[-1]}")
+
+        # Newly opened dates are probed first
+        search_targets = [
+            (self.offices_by_id[office_id], date) for office_id, date in self.dates_cache.pop_newly_opened()
+            if office_id in self.offices_by_id and self.settings.in_date_window(date)
+        ]
+
+        # Interleave offices for each date, so all offices share one request budget evenly
+        search_targets += [
+            (office, date) for date in date_range for office in self.offices
+            if date in dates_by_office[office.id] and (office, date) not in search_targets
+        ]
+
+        if self.fan_out and self.http_client:
+            free_slots = await self._get_free_slots_concurrently(search_targets)
+        else:
+            free_slots = await self._get_free_slots_sequentially(search_targets)
 
-        logger.info(f"Trying to get free slots with date range from {date_range[0]} to {date_range[-1]}")
-        for date in date_range:
+        if free_slots:
+            # Slots of probes which were thrown away in this sweep are still offered next time
+            self.slot_changes.mark_offered(free_slots)
+            await self.event_bus.publish(SlotsFound(self.settings.chat_id, free_slots))
+
+        return free_slots
+
+    async def _get_free_slots_sequentially(self, search_targets: list[tuple[Office, str]]) -> list[Slot]:
+        for office, date in search_targets:
             try:
-                get_slots_script = f"""
-                    var xhr = new XMLHttpRequest();
-                    xhr.open('POST', 'https://eq.hsc.gov.ua/site/freetimes', false);
-                    xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded; charset=UTF-8');
-                    xhr.setRequestHeader('Accept-Language', 'uk-UA,uk;q=0.9,en-US;q=0.8,en;q=0.7');
-                    xhr.setRequestHeader('X-Csrf-Token', document.getElementsByName('csrf-token')[0].getAttribute('content'));
-                    xhr.setRequestHeader('Accept', '*/*');
-                    xhr.setRequestHeader('Cache-Control', 'no-cache');
-                    xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
-                    xhr.send('office_id={self.office_id}&date_of_admission={date}&question_id=55&es_date=&es_time=');
-                    return JSON.stringify({{
-                        "content": xhr.responseText,
-                        "status": xhr.status
-                    }});
-                """
-
-                response_json = await self.execute_search_script(get_slots_script)
-
-                # Process redirect request if captcha found
-                if response_json['status'] == 302:
-                    logger.warning(f"Captcha required by platform! Processing...")
-
-                    self.driver.refresh()
-
-                    if await self.captcha_resolver.has_captcha():
-                        await self.captcha_resolver.resolve_captcha_code()
-
-                    response_json = await self.execute_search_script(get_slots_script)
-
-                response_content = json.loads(response_json['content'])
-                free_slots = response_content['rows']
+                free_slots = await self._get_free_slots_on_date(office, date)
 
                 if free_slots:
-                    logger.success(f"Found free slots on date {date}! Processing...")
-                    return [Slot(slot_id=item['id'], date=date, ch_time=item['chtime']) for item in free_slots]
+                    logger.success(f"Found free slots in office {office.id} on date {date}! Processing...")
+                    return free_slots
 
                 sleep_time = random.uniform(*DELAYS_BETWEEN_DAY_MONITORING_SECONDS)
-                logger.info(f"Sleep for {sleep_time:.1f} seconds after requesting free slots for {date} date...")
+                logger.info(f"Sleep for {sleep_time:.1f} seconds after requesting free slots in office {office.id} for {date} date...")
                 await asyncio.sleep(sleep_time)
+            except AuthenticationExpiredException:
+                raise
             except Exception as e:
-                logger.error(f"Failed to fetch free slots on date {date}. Unexpected error '{str(e)}'. Continuing...")
+                logger.error(f"Failed to fetch free slots in office {office.id} on date {date}. Unexpected error '{str(e)}'. Continuing...")
                 continue
 
         return []
 
+    async def _get_free_slots_concurrently(self, search_targets: list[tuple[Office, str]]) -> list[Slot]:
+        in_flight: set[tuple[int, str]] = set()
+        tasks = {
+            (office.id, date): asyncio.create_task(self._probe_date(office, date, in_flight))
+            for office, date in search_targets
+        }
+
+        try:
+            # Stop the sweep as soon as any date returns free slots
+            for next_completed in asyncio.as_completed(tasks.values()):
+                free_slots = await next_completed
+
+                if free_slots:
+                    break
+            else:
+                return []
+
+            # Probes which are already sent are awaited, so ranking picks the best slot across offices and dates.
+            # The rest (queued for semaphore, rate limit token or closed circuit) are cancelled.
+            for key, task in tasks.items():
+                if key not in in_flight:
+                    task.cancel()
+
+            results = await asyncio.gather(*tasks.values(), return_exceptions=True)
+            free_slots = [slot for result in results if isinstance(result, list) for slot in result]
+
+            logger.success(f"Found {len(free_slots)} free slots in "
+                           f"{len({(slot.office_id, slot.ch_date) for slot in free_slots})} office dates! Processing...")
+            return free_slots
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+    async def _probe_date(self, office: Office, date: str, in_flight: set[tuple[int, str]]) -> list[Slot]:
+        async with self.fan_out_semaphore:
+            try:
+                # Probe counts as in flight only once request is sent, waiting for rate limit or open circuit doesn't
+                return await self._get_free_slots_on_date(office, date, on_sent=lambda: in_flight.add((office.id, date)))
+            except AuthenticationExpiredException:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to fetch free slots in office {office.id} on date {date}. Unexpected error '{str(e)}'. Continuing...")
+                return []
+
+    async def _get_free_slots_on_date(self, office: Office, date: str,
+                                      on_sent: Optional[Callable[[], None]] = None) -> list[Slot]:
+        # Chats watching the same office and date are served by one request
+        free_slots = await self._coalesced(('freetimes', office.id, date),
+                                           lambda: self._fetch_free_slots_on_date(office, date, on_sent))
+
+        # Slots which linger or were just taken by someone else should not be reserved (and notified) every cycle
+        return self.slot_changes.new_slots(office.id, date, free_slots)
+
+    async def _coalesced(self, key: tuple, fetch: Callable[[], Awaitable]):
+        if not self.probe_coalescer:
+            return await fetch()
+
+        return await self.probe_coalescer.probe(key, fetch)
+
+    async def _fetch_free_slots_on_date(self, office: Office, date: str,
+                                        on_sent: Optional[Callable[[], None]] = None) -> list[Slot]:
+        response_json = await self._request_free_slots(office.id, date, on_sent)
+
+        def parse() -> list[Slot]:
+            return [
+                Slot(slot_id=item['id'], date=date, ch_time=item['chtime'], office_id=office.id,
+                     detected_at=response_json['observed_at'])
+                for item in json.loads(response_json['content'])['rows']
+            ]
+
+        free_slots, appeared_slots = self.free_slots_parser.parse(office.id, date, response_json['content'], parse)
+
+        if appeared_slots and self.search_controller:
+            self.search_controller.record_slots_found(len(appeared_slots))
+
+        return free_slots
+
+    async def _request_free_slots(self, office_id: int, date: str,
+                                  on_sent: Optional[Callable[[], None]] = None) -> dict:
+        captcha_generation = self.captcha_generation
+        response_json = await self._execute_free_slots_request(office_id, date, on_sent)
+        self._check_authenticated(response_json.get('status'), response_json['content'])
+        self.captcha_resolver.state_tracker.on_freetimes_status(response_json['status'])
+
+        # Process redirect request if captcha found
+        if response_json['status'] == 302:
+            # Search pauses on spent budget before taking captcha lock, so other captcha paths are not blocked
+            await self.captcha_resolver.solve_budget.wait_available()
+            await self._resolve_captcha_redirect(captcha_generation)
+            response_json = await self._execute_free_slots_request(office_id, date)
+
+        return response_json
+
+    async def _resolve_captcha_redirect(self, captcha_generation: int):
+        async with self.captcha_lock:
+            # Captcha could be already resolved by concurrent request
+            if captcha_generation != self.captcha_generation:
+                return
+
+            logger.warning(f"Captcha required by platform! Processing...")
+
+            # Concurrent successful requests should not hide pending captcha, page is reloaded once inside captcha check
+            self.captcha_resolver.state_tracker.mark(CaptchaState.PENDING)
+
+            if self.search_controller:
+                self.search_controller.record_captcha()
+
+            if await self.captcha_resolver.has_captcha():
+                await self.captcha_resolver.resolve_captcha_code()
+
+            if self.http_client:
+                await self.http_client.sync_session()
+
+            self.captcha_generation += 1
+
+    async def _execute_free_slots_request(self, office_id: int, date: str,
+                                          on_sent: Optional[Callable[[], None]] = None) -> dict:
+        # Search waits here while circuit is open
+        if self.search_controller:
+            await self.search_controller.before_probe()
+
+        await self.rate_limiter.acquire()
+
+        if on_sent:
+            on_sent()
+
+        observed_at = time.time()
+        started_at = time.perf_counter()
+
+        try:
+            response_json = await self._send_free_slots_request(office_id, date)
+        except Exception:
+            if self.search_controller:
+                self.search_controller.record_error()
+
+            if self.observation_store:
+                self.observation_store.record(ProbeObservation(
+                    office_id=office_id, date=date, observed_at=observed_at,
+                    latency=time.perf_counter() - started_at, status=None
+                ))
+            raise
+
+        response_json['observed_at'] = observed_at
+        response_json['latency'] = time.perf_counter() - started_at
+
+        # Every request is stored, captcha redirects included
+        if self.observation_store:
+            self.observation_store.record(ProbeObservation(
+                office_id=office_id, date=date, observed_at=observed_at, latency=response_json['latency'],
+                status=response_json['status'], content=response_json['content']
+            ))
+
+        if self.search_controller:
+            self.search_controller.record_probe(response_json['status'], response_json['latency'])
+
+        metrics.observe(STAGE_SECONDS, response_json['latency'], stage='freetimes_probe')
+        metrics.inc('hsc_freetimes_probes_total', status=response_json['status'])
+
+        if self.trace_recorder:
+            self.trace_recorder.record_freetimes(office_id, date, status=response_json['status'],
+                                                 content=response_json['content'], latency=response_json['latency'],
+                                                 observed_at=observed_at)
+
+        return response_json
+
+    async def _send_free_slots_request(self, office_id: int, date: str) -> dict:
+        if self.http_client:
+            try:
+                response_json = await self.http_client.get_free_times(office_id, date)
+                logger.info(f"Server respond with data: {response_json}")
+                return response_json
+            except SessionExpiredException as e:
+                logger.warning(f"{str(e)}. Falling back to browser request...")
+
+        get_slots_script = f"""
+            var xhr = new XMLHttpRequest();
+            xhr.open('POST', 'https://eq.hsc.gov.ua/site/freetimes', false);
+            xhr.setRequestHeader('Content-Type', 'application/x-www-form-urlencoded; charset=UTF-8');
+            xhr.setRequestHeader('Accept-Language', 'uk-UA,uk;q=0.9,en-US;q=0.8,en;q=0.7');
+            xhr.setRequestHeader('X-Csrf-Token', document.getElementsByName('csrf-token')[0].getAttribute('content'));
+            xhr.setRequestHeader('Accept', '*/*');
+            xhr.setRequestHeader('Cache-Control', 'no-cache');
+            xhr.setRequestHeader('X-Requested-With', 'XMLHttpRequest');
+            xhr.send('office_id={office_id}&date_of_admission={date}&question_id=55&es_date=&es_time=');
+            return JSON.stringify({{
+                "content": xhr.responseText,
+                "status": xhr.status
+            }});
+        """
+
+        return await self.execute_search_script(get_slots_script)
+
     async def reserve_slot(self, slot: Slot) -> SlotReservation:
         sleep_time = random.uniform(*DELAY_BEFORE_RESERVATION_SECONDS)
         logger.info(f"Reserving first available slot... Sleep {sleep_time} seconds first...")
@@ -149,39 +410,123 @@ class SlotReserver:
         reservation = await self._get_reservation(slot)
 
         if not reservation:
-            await self.notifier.notify_reservation_failed()
+            await self.event_bus.publish(ReservationFailed(self.settings.chat_id, candidates_count=1))
             raise ReservationException(f"Cannot reserve slot {slot.ch_date} {slot.ch_time}. Seems it's already taken.")
         else:
             logger.success(f"Reserved slot on {slot.ch_date} {slot.ch_time}!")
-            await self.notifier.notify_reservation_start(slot)
+            await self.event_bus.publish(ReservationMade(self.settings.chat_id, reservation))
             return reservation
 
-    async def approve_reservation(self, reservation: SlotReservation):
+    async def reserve_best_slot(self, free_slots: Optional[list[Slot]] = None) -> SlotReservation:
+        # Without new slots search continues with candidates left from previous call
+        if free_slots is not None:
+            self.slot_ranker.replace(free_slots)
+
+        candidates_count = len(self.slot_ranker)
+
+        # Slots are reserved without delay, events are only published after the fact
+        for slot in self.slot_ranker.rank():
+            logger.info(f"Reserving best ranked slot {slot} ({len(self.slot_ranker)} candidates left)...")
+            with self.step_timer.measure('reserve'):
+                reservation = await self._get_reservation(slot)
+            self.slot_ranker.remove(slot)
+
+            if reservation:
+                logger.success(f"Reserved slot on {slot.ch_date} {slot.ch_time}!")
+                await self.event_bus.publish(ReservationMade(self.settings.chat_id, reservation))
+                return reservation
+
+        await self.event_bus.publish(ReservationFailed(self.settings.chat_id, candidates_count))
+        raise ReservationException(f"Cannot reserve any of {candidates_count} found slots. Seems they're already taken.")
+
+    async def renew_reservation(self, slot: Slot) -> Optional[SlotReservation]:
+        reservation = await self._get_reservation(slot)
+
+        if reservation:
+            logger.success(f"Reserved slot on {slot.ch_date} {slot.ch_time} again!")
+
+        return reservation
+
+    async def approve_reservation(self, reservation: SlotReservation, deadline: Optional[datetime] = None):
+        # Every browser wait is limited by time left until deadline (60 seconds without deadline)
+        def budget() -> float:
+            return max(1.0, (deadline - datetime.now()).total_seconds()) if deadline else 60
+
         try:
-            if await self.captcha_resolver.has_captcha():
-                await self.captcha_resolver.resolve_captcha_code()
+            # Captcha check and solve count against deadline as well, solve is not started when it cannot make it
+            with self.step_timer.measure('captcha_check'):
+                if await asyncio.wait_for(self.captcha_resolver.has_captcha(), timeout=budget()):
+                    expected_solve_seconds = self.captcha_resolver.expected_solve_seconds()
+
+                    if deadline and budget() < expected_solve_seconds:
+                        raise ReservationExpiringException(
+                            f"Captcha solve takes ~{expected_solve_seconds}s, only {budget():.1f}s left until deadline"
+                        )
+
+                    await asyncio.wait_for(self.captcha_resolver.resolve_captcha_code(), timeout=budget())
 
             logger.info(f"Approving reservation {reservation.slot.ch_date} {reservation.slot.ch_time}...")
 
-            self.driver.execute_script(f"window.location.href = '{reservation.reservation_url}';")
+            with self.step_timer.measure('navigate'):
+                # Location should follow the office, since reservation is approved in action with map
+                office = self.offices_by_id.get(reservation.slot.office_id)
+                if office:
+                    await set_geolocation(self.driver, office.location)
 
-            self.driver_wait.until(EC.url_to_be(reservation.reservation_url))
+                await self.driver.execute_script(f"window.location.href = '{reservation.reservation_url}';")
+                await self.driver.wait_until(EC.url_to_be(reservation.reservation_url), timeout=budget())
 
-            self.driver.implicitly_wait(60)
-            self.driver_wait.until(EC.visibility_of(
-                self.driver.find_element(by=By.CLASS_NAME, value="btn-hsc-green"))
-            ).click()
-            await self.notifier.notify_reservation_approved(slot=reservation.slot)
-            await self._download_file(slot=reservation.slot)
-            self.driver.implicitly_wait(0)
+            with self.step_timer.measure('approve'):
+                approve_button = await self.driver.wait_until(
+                    EC.visibility_of_element_located((By.CLASS_NAME, "btn-hsc-green")), timeout=budget()
+                )
+                await self.driver.click(approve_button)
 
             logger.success(f"Reservation {reservation.slot.ch_date} {reservation.slot.ch_time} approved!")
+            metrics.inc('hsc_approvals_total', result='approved')
+        except ReservationExpiringException:
+            metrics.inc('hsc_approvals_total', result='expiring')
+            raise
         except Exception as e:
+            # Failure could be caused by captcha, so state learned from earlier responses is not trusted on retry
+            self.captcha_resolver.state_tracker.invalidate()
             logger.error(f"Error during reservation approval: {str(e)}")
+            metrics.inc('hsc_approvals_total', result='failed')
             await take_screenshot(self.driver)
             raise ReservationApprovalException(e)
 
+        # Reservation is already approved, so notification and ticket downloading could not fail approval
+        await self.event_bus.publish(ReservationApproved(self.settings.chat_id, reservation))
+
+        with self.step_timer.measure('pdf'):
+            await self._download_file(slot=reservation.slot)
+
     async def _get_reservation(self, slot: Slot) -> Optional[SlotReservation]:
+        response_json = None
+
+        if self.http_client:
+            try:
+                response_json = await self.http_client.reserve(slot.id, USER_EMAIL)
+            except SessionExpiredException as e:
+                logger.warning(f"{str(e)}. Falling back to browser request...")
+
+        if not response_json:
+            response_json = await self._send_reservation_request_in_browser(slot)
+            self._check_authenticated(None, response_json['content'])
+
+        if self.trace_recorder:
+            self.trace_recorder.record_reservation(slot, reserved=response_json['content'] != 'error01')
+
+        if response_json['content'] == 'error01':
+            self.slot_changes.mark_failed(slot)
+            logger.warning(f"Cannot reserve slot {slot.ch_date} {slot.ch_time}. Seems it's already taken.")
+            metrics.inc('hsc_reservations_total', result='taken')
+            return None
+        else:
+            metrics.inc('hsc_reservations_total', result='reserved')
+            return SlotReservation(reserved_at=datetime.now(), reservation_url=response_json['redirect-to'], slot=slot)
+
+    async def _send_reservation_request_in_browser(self, slot: Slot) -> dict:
         reserve_slots_script = f"""
             var xhr = new XMLHttpRequest();
             xhr.open('POST', 'https://eq.hsc.gov.ua/site/reservecherga', false);
@@ -202,38 +547,66 @@ class SlotReserver:
             }});
         """
 
-        response = self.driver.execute_script(reserve_slots_script)
-        response_json = json.loads(response)
-
-        if response_json['content'] == 'error01':
-            logger.warning(f"Cannot reserve slot {slot.ch_date} {slot.ch_time}. Seems it's already taken.")
-            return None
-        else:
-            return SlotReservation(reserved_at=datetime.now(), reservation_url=response_json['redirect-to'], slot=slot)
+        response = await self.driver.execute_script(reserve_slots_script)
+        return json.loads(response)
 
     async def _download_file(self, slot: Slot):
         slot_date = datetime.strptime(slot.ch_date, "%Y-%m-%d").strftime("%d.%m.%y")
-        file_path = Path(f"{BROWSER_DOWNLOADS_FOLDER}/Талон.pdf").absolute()
         search_text = f"ДАТА {slot_date}"
+        file_name = f"Талон_{slot.ch_date.replace('-', '_')}.pdf"
 
         try:
-            self.driver_wait.until(
+            reservation_element = await self.driver.wait_until(
                 EC.presence_of_element_located((By.XPATH, f"//div[.//strong[contains(text(), '{search_text}')]]"))
-            ).find_element(By.XPATH, ".//a[contains(@href, '/site/mpdf')]").click()
-
-            # Wait for pdf to be downloaded
-            await asyncio.sleep(10)
-
-            with open(file_path, 'rb') as file:
-                file_name = f"Талон_{slot.ch_date.replace('-', '_')}.pdf"
-                await self.notifier.notify_with_pdf(file, file_name)
+            )
+            pdf_link = await self.driver.run(
+                'find_element', reservation_element.find_element, By.XPATH, ".//a[contains(@href, '/site/mpdf')]"
+            )
+
+            if self.http_client:
+                try:
+                    # PDF is streamed into memory with session cookies, so nothing is waited on disk
+                    pdf_file = await self.http_client.download(await self.driver.get_attribute(pdf_link, 'href'))
+                    await self.event_bus.publish(TicketDownloaded(self.settings.chat_id, pdf_file.read(), file_name))
+                    return
+                except SessionExpiredException as e:
+                    logger.warning(f"{str(e)}. Falling back to browser download...")
+
+            await self._download_file_in_browser(pdf_link, file_name)
         except Exception as e:
             logger.error(f"Error during file downloading: {str(e)}")
+
+    async def _download_file_in_browser(self, pdf_link: WebElement, file_name: str):
+        # Every download gets its own folder, so concurrent reservations don't collide on 'Талон.pdf'
+        download_folder = Path(f"{BROWSER_DOWNLOADS_FOLDER}/{uuid.uuid4().hex}").absolute()
+        download_folder.mkdir(parents=True, exist_ok=True)
+
+        try:
+            await self.driver.execute_cdp_cmd(
+                "Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": str(download_folder)}
+            )
+            await self.driver.click(pdf_link)
+
+            file_path = await wait_for_download(download_folder, timeout=PDF_DOWNLOAD_TIMEOUT_SECONDS)
+
+            await self.event_bus.publish(TicketDownloaded(self.settings.chat_id, file_path.read_bytes(), file_name))
         finally:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            await self.driver.execute_cdp_cmd(
+                "Browser.setDownloadBehavior",
+                {"behavior": "allow", "downloadPath": str(Path(BROWSER_DOWNLOADS_FOLDER).absolute())}
+            )
+            shutil.rmtree(download_folder, ignore_errors=True)
 
     async def execute_search_script(self, get_slots_script):
-        response = self.driver.execute_script(get_slots_script)
+        response = await self.driver.execute_script(get_slots_script)
         logger.info(f"Server respond with data: {response}")
         return json.loads(response)
+
+    @staticmethod
+    def _check_authenticated(status: Optional[int], content: str):
+        # Browser requests follow redirects, so expired session shows up as rendered login page
+        if is_login_response(status, None, content or ''):
+            raise AuthenticationExpiredException(f"Site session expired (status {status}, login page returned)")
+
+    async def close(self):
+        await self.dates_cache.stop()
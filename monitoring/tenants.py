@@ -0,0 +1,46 @@
+from typing import Optional
+
+from config.configuration import SEARCH_TENANTS, HSC_OFFICE_ID, HSC_OFFICE_IDS, HSC_OFFICES_SEARCH_AREA, \
+    START_FROM_DATE, PREFERRED_TIME_WINDOWS, PREFERRED_OFFICE_IDS
+from model.models import Office
+from monitoring.offices import resolve_monitored_offices
+
+
+class SearchSettings:
+    def __init__(self, chat_id: int, offices: list[Office], start_from_date: Optional[str] = None,
+                 end_date: Optional[str] = None, preferred_time_windows: Optional[list[tuple[str, str]]] = None,
+                 preferred_office_ids: Optional[list[int]] = None):
+        self.chat_id = chat_id
+        self.offices = offices
+        self.start_from_date = start_from_date
+        self.end_date = end_date
+        self.preferred_time_windows = preferred_time_windows or []
+        self.preferred_office_ids = preferred_office_ids or []
+
+    def in_date_window(self, date: str) -> bool:
+        if self.start_from_date and date < self.start_from_date:
+            return False
+
+        return not self.end_date or date <= self.end_date
+
+
+def resolve_search_settings(chat_id: int) -> SearchSettings:
+    # Chats without own settings search with global ones
+    tenant = SEARCH_TENANTS.get(chat_id, {})
+
+    # Tenant which sets any of office selectors picks offices on its own, so global offices are not mixed in
+    if 'office_ids' in tenant or 'search_area' in tenant:
+        office_ids = tenant.get('office_ids') or []
+        search_area = tenant.get('search_area')
+    else:
+        office_ids = HSC_OFFICE_IDS or ([HSC_OFFICE_ID] if HSC_OFFICE_ID else [])
+        search_area = HSC_OFFICES_SEARCH_AREA
+
+    return SearchSettings(
+        chat_id=chat_id,
+        offices=resolve_monitored_offices(office_ids=office_ids, search_area=search_area),
+        start_from_date=tenant.get('start_from_date', START_FROM_DATE),
+        end_date=tenant.get('end_date'),
+        preferred_time_windows=tenant.get('preferred_time_windows', PREFERRED_TIME_WINDOWS),
+        preferred_office_ids=tenant.get('preferred_office_ids', PREFERRED_OFFICE_IDS)
+    )
@@ -0,0 +1,30 @@
+from io import BytesIO
+
+from telegram import Bot
+
+from model.events import Event, ReservationMade, ReservationFailed, ReservationApproved, TicketDownloaded, SearchFailed
+from notification.notifier import Notifier
+from notification.outbox import NotificationOutbox
+
+NOTIFIED_EVENTS = (ReservationMade, ReservationFailed, ReservationApproved, TicketDownloaded, SearchFailed)
+
+
+# Event bus consumer which turns search events into notifications of the chat which runs the search
+class EventNotifier:
+    def __init__(self, bot: Bot, outbox: NotificationOutbox):
+        self.bot = bot
+        self.outbox = outbox
+
+    async def handle(self, event: Event):
+        notifier = Notifier(bot=self.bot, chat_id=event.chat_id, outbox=self.outbox)
+
+        if isinstance(event, ReservationMade):
+            await notifier.notify_reservation_start(event.reservation.slot)
+        elif isinstance(event, ReservationFailed):
+            await notifier.notify_reservation_failed()
+        elif isinstance(event, ReservationApproved):
+            await notifier.notify_reservation_approved(slot=event.reservation.slot)
+        elif isinstance(event, TicketDownloaded):
+            await notifier.notify_with_pdf(BytesIO(event.content), event.file_name)
+        elif isinstance(event, SearchFailed):
+            await notifier.notify_error(event.error)
@@ -1,21 +1,25 @@
+from typing import Optional
+
 from telegram import Bot, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.constants import ParseMode
 
 from model.models import Slot
+from notification.outbox import NotificationOutbox, NotificationPriority, OutboxMessage
 
 
 class Notifier:
-    def __init__(self, bot: Bot, chat_id: int):
+    def __init__(self, bot: Bot, chat_id: int, outbox: Optional[NotificationOutbox] = None):
         self.chat_id = chat_id
         self.tg_bot = bot
+        self.outbox = outbox
 
     async def notify_wait_auth(self, authorization_link: str):
         msg = f"""
             *Важливо:* ⚠ Вам необхідно авторизуватись у найближчий час (5-10 хвилин)! Будь-ласка, натисніть кнопку нижче, щоб завершити процес авторизації
         """
 
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.URGENT, 'send_message',
             text=msg,
             parse_mode=ParseMode.MARKDOWN,
             reply_markup=InlineKeyboardMarkup(
@@ -27,8 +31,8 @@ class Notifier:
         msg = f"""
             *Оновлення:* ✅ Вас було успішно авторизовано до сайту електронної черги МВС України!
         """
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.STATUS, 'send_message',
             text=msg,
             parse_mode=ParseMode.MARKDOWN
         )
@@ -37,8 +41,8 @@ class Notifier:
         msg = f"""
             *Оновлення:* 📅 Знайдено талон на дату *{slot.ch_date} {slot.ch_time}*. Запустив процес резервування часу...
         """
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.STATUS, 'send_message', coalesce_key='reservation_start',
             text=msg,
             parse_mode=ParseMode.MARKDOWN
         )
@@ -47,8 +51,8 @@ class Notifier:
         msg = f"""
             *Оновлення:* 🚨 Нажаль виникла помилка під час резервування часу. Схоже, що талон вже був заброньований...
         """
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.STATUS, 'send_message', coalesce_key='reservation_failed',
             text=msg,
             parse_mode=ParseMode.MARKDOWN
         )
@@ -58,17 +62,18 @@ class Notifier:
             *Оновлення:* 📅 Талон на здачу практичного іспиту (механічна коробка передачі) на машині сервісного центру МВС успішно зарезервовано на дату *{slot.ch_date} {slot.ch_time}*. Щасти на іспиті!
         """
 
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.URGENT, 'send_message',
             text=msg,
             parse_mode=ParseMode.MARKDOWN,
         )
 
     async def notify_with_pdf(self, file, filename):
-        await self.tg_bot.send_document(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.URGENT, 'send_document',
             caption="🎉 🎉 🎉 Вітаю! Для зручності вислав талон PDF файлом! Тепер ви можете зупинити роботу бота...",
-            document=file,
+            # File is read right away, since it could be closed before message is sent
+            document=file.read(),
             filename=filename
         )
 
@@ -77,8 +82,17 @@ class Notifier:
             *Оновлення:* 🚨 Виникла помилка під час роботи бота! Детальніше про помилку: `{str(error)}`
         """
 
-        await self.tg_bot.send_message(
-            chat_id=self.chat_id,
+        await self._send(
+            NotificationPriority.STATUS, 'send_message', coalesce_key='error',
             text=msg,
             parse_mode=ParseMode.MARKDOWN
         )
+
+    async def _send(self, priority: NotificationPriority, method: str, coalesce_key: Optional[str] = None, **kwargs):
+        if not self.outbox:
+            await getattr(self.tg_bot, method)(chat_id=self.chat_id, **kwargs)
+            return
+
+        # Only enqueued here, so caller doesn't wait on Telegram
+        self.outbox.put(OutboxMessage(chat_id=self.chat_id, priority=priority, method=method, kwargs=kwargs,
+                                      coalesce_key=coalesce_key))
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import time
+from collections import defaultdict
+from enum import IntEnum
+from typing import Optional
+
+import telegram.error
+from loguru import logger
+from telegram import Bot
+
+from config.configuration import NOTIFICATION_GLOBAL_RATE_PER_SECOND, NOTIFICATION_GLOBAL_BURST, \
+    NOTIFICATION_CHAT_RATE_PER_SECOND, NOTIFICATION_CHAT_BURST, NOTIFICATION_RETRY_DELAYS_SECONDS, \
+    NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS
+from utils.metrics import metrics, STAGE_SECONDS
+from utils.rate_limiter import TokenBucketRateLimiter
+
+
+class NotificationPriority(IntEnum):
+    # Auth links and reservation results go ahead of everything else
+    URGENT = 0
+    STATUS = 1
+
+
+class OutboxMessage:
+    def __init__(self, chat_id: int, priority: NotificationPriority, method: str, kwargs: dict,
+                 coalesce_key: Optional[str] = None):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.method = method
+        self.kwargs = kwargs
+        self.coalesce_key = coalesce_key
+        self.merged_count = 0
+        self.attempt = 0
+        self.enqueued_at = time.monotonic()
+
+    def merge(self, message: 'OutboxMessage'):
+        # Latest update wins, count of merged updates is shown in the message
+        self.kwargs = message.kwargs
+        self.merged_count += 1
+
+    def request_kwargs(self) -> dict:
+        kwargs = dict(self.kwargs, chat_id=self.chat_id)
+
+        if self.merged_count and 'text' in kwargs:
+            kwargs['text'] = f"{kwargs['text'].rstrip()}\n\n_+{self.merged_count} подібних оновлень_"
+
+        return kwargs
+
+
+# Queues bot messages, so callers never wait on Telegram. Messages are sent by priority under global and per-chat
+# rate limits, retried with backoff, and bursts of similar status updates are merged while they wait in queue.
+# Message of throttled chat is put aside until chat has token, so it doesn't hold up messages of other chats.
+class NotificationOutbox:
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self.sequence = itertools.count()
+        self.pending: dict[tuple[int, str], OutboxMessage] = {}
+        self.global_rate_limiter = TokenBucketRateLimiter(rate_per_second=NOTIFICATION_GLOBAL_RATE_PER_SECOND,
+                                                          capacity=NOTIFICATION_GLOBAL_BURST)
+        self.chat_rate_limiters: dict[int, TokenBucketRateLimiter] = defaultdict(
+            lambda: TokenBucketRateLimiter(rate_per_second=NOTIFICATION_CHAT_RATE_PER_SECOND,
+                                           capacity=NOTIFICATION_CHAT_BURST)
+        )
+        self.retry_tasks: set[asyncio.Task] = set()
+        self.throttled_tasks: set[asyncio.Task] = set()
+        self.sender_task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if not self.sender_task:
+            self.sender_task = asyncio.create_task(self._send_loop())
+
+    async def stop(self):
+        try:
+            # Queued messages (e.g. error report) are flushed on shutdown, but not forever
+            await asyncio.wait_for(self._flush(), timeout=NOTIFICATION_SHUTDOWN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Notification outbox stopped with {self.queue.qsize() + len(self.throttled_tasks)} unsent messages")
+
+        for task in [self.sender_task, *self.retry_tasks, *self.throttled_tasks]:
+            if task:
+                task.cancel()
+
+        self.sender_task = None
+
+    def put(self, message: OutboxMessage):
+        if message.coalesce_key:
+            key = (message.chat_id, message.coalesce_key)
+            pending_message = self.pending.get(key)
+
+            if pending_message:
+                pending_message.merge(message)
+                metrics.inc('hsc_notifications_total', result='coalesced')
+                return
+
+            self.pending[key] = message
+
+        self.queue.put_nowait((message.priority, next(self.sequence), message))
+
+    async def _flush(self):
+        await self.queue.join()
+
+        # Throttled messages are back in queue once their chat has token
+        while self.throttled_tasks:
+            await asyncio.gather(*self.throttled_tasks)
+            await self.queue.join()
+
+    async def _send_loop(self):
+        while True:
+            priority, sequence, message = await self.queue.get()
+
+            try:
+                chat_rate_limiter = self.chat_rate_limiters[message.chat_id]
+
+                if not chat_rate_limiter.try_acquire():
+                    # Message keeps its place in queue order, so messages of the chat are still sent in order
+                    self._put_later((priority, sequence, message), delay=chat_rate_limiter.wait_seconds(),
+                                    tasks=self.throttled_tasks)
+                    continue
+
+                if message.coalesce_key:
+                    self.pending.pop((message.chat_id, message.coalesce_key), None)
+
+                await self.global_rate_limiter.acquire()
+                await self._send(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error during notification sending: {str(e)}")
+            finally:
+                self.queue.task_done()
+
+    async def _send(self, message: OutboxMessage):
+        try:
+            await getattr(self.bot, message.method)(**message.request_kwargs())
+            # Notify stage is measured from enqueueing, so it includes waiting in queue, rate limits and retries
+            metrics.observe(STAGE_SECONDS, time.monotonic() - message.enqueued_at, stage='notify')
+            metrics.inc('hsc_notifications_total', result='sent')
+        except telegram.error.RetryAfter as e:
+            self._retry_later(message, delay=e.retry_after)
+        except (telegram.error.TimedOut, telegram.error.NetworkError) as e:
+            if message.attempt >= len(NOTIFICATION_RETRY_DELAYS_SECONDS):
+                logger.error(f"Notification to chat {message.chat_id} dropped after {message.attempt} retries: {str(e)}")
+                metrics.inc('hsc_notifications_total', result='dropped')
+                return
+
+            self._retry_later(message, delay=NOTIFICATION_RETRY_DELAYS_SECONDS[message.attempt])
+        except telegram.error.TelegramError as e:
+            # Blocked bot, invalid chat or bad markup won't be fixed by retry
+            logger.error(f"Notification to chat {message.chat_id} rejected by Telegram: {str(e)}")
+            metrics.inc('hsc_notifications_total', result='rejected')
+
+    def _retry_later(self, message: OutboxMessage, delay: float):
+        message.attempt += 1
+        logger.warning(f"Notification to chat {message.chat_id} failed. Retrying in {delay}s (attempt #{message.attempt})...")
+
+        self._put_later((message.priority, next(self.sequence), message), delay=delay, tasks=self.retry_tasks)
+
+    def _put_later(self, item: tuple, delay: float, tasks: set[asyncio.Task]):
+        async def put():
+            await asyncio.sleep(delay)
+            self.queue.put_nowait(item)
+
+        task = asyncio.create_task(put())
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
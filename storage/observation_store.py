@@ -0,0 +1,200 @@
+import asyncio
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import OBSERVATIONS_DB_FILE, OBSERVATIONS_RETENTION_DAYS
+
+BATCH_SIZE = 100
+FLUSH_INTERVAL_SECONDS = 5
+MAX_QUEUE_SIZE = 10000
+RETENTION_CHECK_INTERVAL_SECONDS = 3600
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS probes (
+        id INTEGER PRIMARY KEY,
+        office_id INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        observed_at REAL NOT NULL,
+        latency REAL NOT NULL,
+        status INTEGER NOT NULL,
+        slot_count INTEGER NOT NULL,
+        slots TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS probes_office_observed_at ON probes (office_id, observed_at);
+    CREATE INDEX IF NOT EXISTS probes_observed_at ON probes (observed_at);
+    CREATE INDEX IF NOT EXISTS probes_latency ON probes (latency, observed_at);
+"""
+
+
+# Every free slots request, including captcha redirects and failed ones (status 0). Response is parsed only when
+# it's written, so search doesn't parse unchanged responses just for the store.
+class ProbeObservation:
+    def __init__(self, office_id: int, date: str, observed_at: float, latency: float, status: Optional[int],
+                 content: Optional[str] = None):
+        self.office_id = office_id
+        self.date = date
+        self.observed_at = observed_at
+        self.latency = latency
+        self.status = status or 0
+        self.content = content
+
+    def parse_slots(self) -> list[list]:
+        if self.status != 200 or not self.content:
+            return []
+
+        try:
+            return [[item['id'], item['chtime']] for item in json.loads(self.content)['rows']]
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Cannot parse observed free slots of office {self.office_id} on {self.date}: {str(e)}")
+            return []
+
+    def as_row(self) -> tuple:
+        slots = self.parse_slots()
+        return self.office_id, self.date, self.observed_at, self.latency, self.status, len(slots), json.dumps(slots)
+
+
+# Append-only SQLite (WAL mode) store of every free slots response. Writes are batched on a dedicated thread,
+# so search only puts observation to in-memory queue.
+class ObservationStore:
+    def __init__(self, db_path: str = OBSERVATIONS_DB_FILE, retention_days: int = OBSERVATIONS_RETENTION_DAYS):
+        self.db_path = str(Path(db_path).absolute())
+        self.retention_days = retention_days
+        self.queue: asyncio.Queue[ProbeObservation] = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="observation-store")
+        self.connection: Optional[sqlite3.Connection] = None
+        self.writer_task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    async def start(self):
+        await self._run(self._open)
+        self.writer_task = asyncio.create_task(self._writer_loop())
+
+    async def stop(self):
+        if self.writer_task:
+            self.writer_task.cancel()
+            self.writer_task = None
+
+        # Store could be stopped without being started (e.g. startup failed)
+        if self.connection:
+            while await self._flush():
+                pass
+
+            await self._run(self.connection.close)
+            self.connection = None
+
+        self.executor.shutdown(wait=True)
+
+    def record(self, observation: ProbeObservation):
+        try:
+            self.queue.put_nowait(observation)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Observation store queue is full. Dropped {self.dropped} observations so far...")
+
+    async def slot_appearances(self, office_id: int, since: float = 0) -> list[tuple[str, float]]:
+        # Moments when slots appeared on date (previous probe of the same date had no slots)
+        query = """
+            SELECT date, observed_at FROM (
+                SELECT date, observed_at, slot_count,
+                       LAG(slot_count) OVER (PARTITION BY date ORDER BY observed_at) AS previous_slot_count
+                FROM probes
+                WHERE office_id = ? AND observed_at >= ? AND status = 200
+            )
+            WHERE slot_count > 0 AND (previous_slot_count IS NULL OR previous_slot_count = 0)
+            ORDER BY observed_at
+        """
+        return await self._run(lambda: self.connection.execute(query, (office_id, since)).fetchall())
+
+    async def latency_percentiles(self, since: float = 0, percentiles: tuple = (0.5, 0.9, 0.99)) -> dict[float, float]:
+        def query():
+            count = self.connection.execute("SELECT COUNT(*) FROM probes WHERE observed_at >= ?", (since,)).fetchone()[0]
+            result = {}
+
+            for percentile in percentiles:
+                if not count:
+                    result[percentile] = 0.0
+                    continue
+
+                offset = min(count - 1, int(percentile * count))
+                result[percentile] = self.connection.execute(
+                    "SELECT latency FROM probes WHERE observed_at >= ? ORDER BY latency LIMIT 1 OFFSET ?", (since, offset)
+                ).fetchone()[0]
+
+            return result
+
+        return await self._run(query)
+
+    async def summary(self, office_ids: list[int], since: float) -> str:
+        # Store could be enabled, but not started yet
+        if not self.connection:
+            return "not started"
+
+        latencies = await self.latency_percentiles(since=since)
+        appearances = {office_id: len(await self.slot_appearances(office_id, since=since)) for office_id in office_ids}
+
+        return (' '.join(f"latency_p{round(percentile * 100)}={latency:.2f}s" for percentile, latency in latencies.items())
+                + f" slot_appearances={','.join(f'{office_id}:{count}' for office_id, count in appearances.items())}"
+                + f" dropped={self.dropped}")
+
+    async def _run(self, fn):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn)
+
+    def _open(self):
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self._apply_retention()
+
+    def _write(self, rows: list[tuple]):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO probes (office_id, date, observed_at, latency, status, slot_count, slots) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def _apply_retention(self):
+        with self.connection:
+            deleted = self.connection.execute(
+                "DELETE FROM probes WHERE observed_at < ?", (time.time() - self.retention_days * 86400,)
+            ).rowcount
+
+        if deleted:
+            logger.info(f"Removed {deleted} observations older than {self.retention_days} days")
+
+    async def _flush(self) -> int:
+        observations = []
+        while not self.queue.empty() and len(observations) < BATCH_SIZE:
+            observations.append(self.queue.get_nowait())
+
+        # Responses are parsed on writer thread as well
+        if observations:
+            await self._run(lambda: self._write([observation.as_row() for observation in observations]))
+
+        return len(observations)
+
+    async def _writer_loop(self):
+        retention_checked_at = time.monotonic()
+
+        while True:
+            try:
+                # Full batch is written immediately, otherwise whatever is collected during flush interval
+                if self.queue.qsize() < BATCH_SIZE:
+                    await asyncio.sleep(FLUSH_INTERVAL_SECONDS)
+
+                await self._flush()
+
+                if time.monotonic() - retention_checked_at > RETENTION_CHECK_INTERVAL_SECONDS:
+                    await self._run(self._apply_retention)
+                    retention_checked_at = time.monotonic()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Failed to write observations: {str(e)}")
@@ -0,0 +1,58 @@
+import json
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import TRACE_RECORDING_FILE
+from model.models import Slot
+
+BATCH_SIZE = 50
+
+
+def parse_rows(content: str) -> Optional[list[dict]]:
+    try:
+        return [{'id': row['id'], 'chtime': row['chtime']} for row in json.loads(content)['rows']]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# Records timeline of site responses seen by search (bookable dates, free slots, captcha redirects, reservation
+# outcomes) as JSON lines, so production traffic could be replayed against search code under virtual clock.
+# Every event has unix time 't' and 'kind': 'dates', 'freetimes' or 'reservation'.
+class TraceRecorder:
+    def __init__(self, file_path: str = TRACE_RECORDING_FILE):
+        self.file_path = Path(file_path).absolute()
+        self.buffer: list[dict] = []
+
+    def record_dates(self, dates: list[str]):
+        self._record('dates', dates=dates)
+
+    def record_freetimes(self, office_id: int, date: str, status: int, content: str, latency: float,
+                         observed_at: float):
+        rows = parse_rows(content) if status == 200 else None
+        self._record('freetimes', t=observed_at, office_id=office_id, date=date, status=status, rows=rows,
+                     latency=round(latency, 4))
+
+    def record_reservation(self, slot: Slot, reserved: bool):
+        self._record('reservation', office_id=slot.office_id, date=slot.ch_date, slot_id=slot.id, reserved=reserved)
+
+    def flush(self):
+        if not self.buffer:
+            return
+
+        try:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.file_path, 'a', encoding='utf-8') as file:
+                file.writelines(json.dumps(event) + '\n' for event in self.buffer)
+        except OSError as e:
+            logger.warning(f"Cannot write search trace to '{self.file_path}': {str(e)}")
+
+        self.buffer.clear()
+
+    def _record(self, kind: str, t: Optional[float] = None, **fields):
+        self.buffer.append({'t': t or time.time(), 'kind': kind, **fields})
+
+        if len(self.buffer) >= BATCH_SIZE:
+            self.flush()
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.virtual_clock import VirtualClock
+from captcha.captcha_state import CaptchaStateTracker
+from config.configuration import APPROVE_RESERVATION_RETRY_THRESHOLD, APPROVAL_RE_RESERVE_MARGIN_SECONDS, \
+    APPROVAL_MAX_RESERVATIONS_PER_SLOT
+from exceptions.exceptions import ReservationApprovalException, ReservationExpiringException
+from model.models import Slot, SlotReservation, Office
+from monitoring.approval_engine import ApprovalEngine
+from monitoring.slot_reserver import SlotReserver
+from monitoring.tenants import SearchSettings
+from utils.event_bus import EventBus
+from utils.histogram import StepTimer
+
+SLOT = Slot(date='2099-01-01', slot_id=1, ch_time='09:00', office_id=151)
+
+
+def reservation(reserved_seconds_ago: float = 0) -> SlotReservation:
+    return SlotReservation(reserved_at=datetime.now() - timedelta(seconds=reserved_seconds_ago),
+                           reservation_url='https://eq.hsc.gov.ua/site/step3', slot=SLOT)
+
+
+# Slot reserver which fails approval with given errors (one per attempt) and then approves
+class FakeSlotReserver:
+    def __init__(self, errors: list[Exception] = (), renewals: int = 10):
+        self.errors = list(errors)
+        self.renewals = renewals
+        self.step_timer = StepTimer()
+        self.approved_deadlines: list[datetime] = []
+        self.renewed = 0
+
+    async def approve_reservation(self, reservation: SlotReservation, deadline: datetime = None):
+        self.approved_deadlines.append(deadline)
+
+        if self.errors:
+            raise self.errors.pop(0)
+
+    async def renew_reservation(self, slot: Slot):
+        if self.renewed >= self.renewals:
+            return None
+
+        self.renewed += 1
+        return reservation()
+
+
+def approve(slot_reserver: FakeSlotReserver, reservation_to_approve: SlotReservation):
+    # Retry delays are skipped by virtual clock
+    return VirtualClock(start=1000).run(ApprovalEngine(slot_reserver).approve(reservation_to_approve))
+
+
+def test_approval_deadline_leaves_margin_before_reservation_expires():
+    slot_reserver = FakeSlotReserver()
+    made_reservation = reservation()
+
+    assert approve(slot_reserver, made_reservation) is made_reservation
+    assert slot_reserver.approved_deadlines == [
+        made_reservation.expired_at - timedelta(seconds=APPROVAL_RE_RESERVE_MARGIN_SECONDS)
+    ]
+
+
+def test_failed_approval_is_retried():
+    slot_reserver = FakeSlotReserver(errors=[ReservationApprovalException('no button')] * 2)
+
+    assert approve(slot_reserver, reservation()) is not None
+    assert len(slot_reserver.approved_deadlines) == 3
+    assert slot_reserver.renewed == 0
+
+
+def test_slot_is_given_up_after_retries_limit():
+    slot_reserver = FakeSlotReserver(errors=[ReservationApprovalException('no button')] * APPROVE_RESERVATION_RETRY_THRESHOLD)
+
+    assert approve(slot_reserver, reservation()) is None
+    assert len(slot_reserver.approved_deadlines) == APPROVE_RESERVATION_RETRY_THRESHOLD
+
+
+def test_expiring_reservation_is_renewed_right_away():
+    slot_reserver = FakeSlotReserver(errors=[ReservationExpiringException('captcha takes too long')])
+
+    approved = approve(slot_reserver, reservation())
+
+    assert slot_reserver.renewed == 1
+    assert approved is not None
+    # Second attempt is made with deadline of renewed reservation
+    assert slot_reserver.approved_deadlines[1] > slot_reserver.approved_deadlines[0]
+
+
+def test_reservation_past_deadline_is_renewed_before_approval():
+    slot_reserver = FakeSlotReserver()
+
+    assert approve(slot_reserver, reservation(reserved_seconds_ago=70)) is not None
+    assert slot_reserver.renewed == 1
+    assert len(slot_reserver.approved_deadlines) == 1
+
+
+def test_slot_is_given_up_when_it_cannot_be_reserved_again():
+    slot_reserver = FakeSlotReserver(renewals=0)
+
+    assert approve(slot_reserver, reservation(reserved_seconds_ago=70)) is None
+    assert slot_reserver.approved_deadlines == []
+
+
+def test_slot_is_given_up_after_max_reservations():
+    slot_reserver = FakeSlotReserver(errors=[ReservationExpiringException('captcha takes too long')] * 10)
+
+    assert approve(slot_reserver, reservation()) is None
+    assert slot_reserver.renewed == APPROVAL_MAX_RESERVATIONS_PER_SLOT - 1
+
+
+class SlowCaptchaResolver:
+    def __init__(self):
+        self.state_tracker = CaptchaStateTracker()
+        self.solved = False
+
+    async def has_captcha(self) -> bool:
+        return True
+
+    def expected_solve_seconds(self) -> float:
+        return 40
+
+    async def resolve_captcha_code(self):
+        self.solved = True
+
+
+def test_captcha_solve_is_not_started_when_it_cannot_make_deadline():
+    captcha_resolver = SlowCaptchaResolver()
+    settings = SearchSettings(chat_id=0, offices=[Office(151, 'Office', '', 50.45, 30.52)])
+    slot_reserver = SlotReserver(driver=None, event_bus=EventBus(), captcha_resolver=captcha_resolver, settings=settings)
+
+    with pytest.raises(ReservationExpiringException):
+        VirtualClock(start=1000).run(
+            slot_reserver.approve_reservation(reservation(), deadline=datetime.now() + timedelta(seconds=5))
+        )
+
+    assert not captcha_resolver.solved
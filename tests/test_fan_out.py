@@ -0,0 +1,80 @@
+import asyncio
+import html
+import json
+import time
+
+from benchmarks.virtual_clock import VirtualClock
+from captcha.captcha_state import CaptchaStateTracker
+from model.models import Office
+from monitoring.slot_reserver import SlotReserver
+from monitoring.tenants import SearchSettings
+from utils.event_bus import EventBus
+from utils.rate_limiter import TokenBucketRateLimiter
+
+OFFICE_ID = 151
+DATES = [f'2099-01-0{day}' for day in range(1, 7)]
+
+
+class DatesPage:
+    def __init__(self, dates: list[str]):
+        self.text = ''.join(f'<a data-params="{html.escape(json.dumps({"chdate": date}))}"></a>' for date in dates)
+
+
+# Site with response latency per date, free slots are listed on some of dates
+class FakeHttpClient:
+    def __init__(self, latency_by_date: dict[str, float], slots_by_date: dict[str, list[int]]):
+        self.latency_by_date = latency_by_date
+        self.slots_by_date = slots_by_date
+        self.sent_dates = []
+
+    async def get_page(self, path: str) -> DatesPage:
+        return DatesPage(DATES)
+
+    async def get_free_times(self, office_id: int, date: str) -> dict:
+        self.sent_dates.append(date)
+        await asyncio.sleep(self.latency_by_date.get(date, 1))
+        rows = [{'id': slot_id, 'chtime': '09:00'} for slot_id in self.slots_by_date.get(date, [])]
+        return {'content': json.dumps({'rows': rows}), 'status': 200}
+
+
+class FakeCaptchaResolver:
+    def __init__(self):
+        self.state_tracker = CaptchaStateTracker()
+
+
+def search(http_client: FakeHttpClient, rate_per_second: float, burst: int) -> tuple[list[int], float]:
+    async def scenario():
+        # Limiter is created under virtual clock, since it keeps time of refill
+        rate_limiter = TokenBucketRateLimiter(rate_per_second=rate_per_second, capacity=burst)
+        settings = SearchSettings(chat_id=0, offices=[Office(OFFICE_ID, 'Office', '', 50.45, 30.52)])
+        slot_reserver = SlotReserver(driver=None, event_bus=EventBus(), captcha_resolver=FakeCaptchaResolver(),
+                                     settings=settings, http_client=http_client, rate_limiter=rate_limiter, fan_out=True)
+
+        try:
+            started_at = time.monotonic()
+            free_slots = await slot_reserver.get_free_slots()
+            return sorted(slot.id for slot in free_slots), time.monotonic() - started_at
+        finally:
+            await slot_reserver.close()
+
+    return VirtualClock(start=1000).run(scenario())
+
+
+def test_sweep_stops_at_first_hit_without_waiting_for_rate_limited_probes():
+    http_client = FakeHttpClient(latency_by_date={}, slots_by_date={DATES[0]: [1]})
+    # Only the first probe has token, the rest wait 10 seconds each
+    slot_ids, elapsed = search(http_client, rate_per_second=0.1, burst=1)
+
+    assert slot_ids == [1]
+    assert elapsed == 1
+    assert http_client.sent_dates == [DATES[0]]
+
+
+def test_sweep_gathers_slots_of_probes_already_sent():
+    http_client = FakeHttpClient(latency_by_date={DATES[0]: 1, DATES[1]: 3, DATES[2]: 2},
+                                 slots_by_date={DATES[0]: [1], DATES[1]: [2]})
+    slot_ids, elapsed = search(http_client, rate_per_second=0.1, burst=3)
+
+    assert slot_ids == [1, 2]
+    assert elapsed == 3
+    assert http_client.sent_dates == DATES[:3]
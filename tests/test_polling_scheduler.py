@@ -0,0 +1,24 @@
+import asyncio
+import time
+
+from benchmarks.virtual_clock import VirtualClock
+from monitoring.polling_scheduler import AdaptivePollingScheduler
+
+
+def test_searches_of_all_chats_wake_up_at_the_same_poll(tmp_path):
+    async def scenario():
+        scheduler = AdaptivePollingScheduler(history_file=str(tmp_path / 'history.json'), enabled=False)
+        woken_at = {}
+
+        async def search(chat_id: int, attempt_seconds: float):
+            # Chats finish their search attempts at different times
+            await asyncio.sleep(attempt_seconds)
+            await scheduler.sleep_until_next_poll()
+            woken_at[chat_id] = time.time()
+
+        await asyncio.gather(search(1, attempt_seconds=1), search(2, attempt_seconds=7))
+        return woken_at
+
+    woken_at = VirtualClock(start=1000).run(scenario())
+
+    assert woken_at[1] == woken_at[2]
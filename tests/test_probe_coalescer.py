@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+from benchmarks.virtual_clock import VirtualClock
+from monitoring.probe_coalescer import ProbeCoalescer
+
+
+def run(coroutine):
+    return VirtualClock(start=1000).run(coroutine)
+
+
+class FakeFetch:
+    def __init__(self, value='slots', latency: float = 1, error: Exception = None):
+        self.value = value
+        self.latency = latency
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+        if self.error:
+            raise self.error
+
+        return self.value
+
+
+def test_concurrent_probes_with_the_same_key_share_one_request():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=0)
+        fetch = FakeFetch()
+
+        results = await asyncio.gather(*(coalescer.probe(('freetimes', 1, '2099-01-01'), fetch) for _ in range(3)))
+        return results, fetch.calls, coalescer.summary()
+
+    results, calls, summary = run(scenario())
+
+    assert results == ['slots'] * 3
+    assert calls == 1
+    assert summary == 'requested=3 coalesced=2 upstream=1'
+
+
+def test_probes_with_different_keys_are_not_shared():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=20)
+        fetch = FakeFetch()
+
+        await asyncio.gather(coalescer.probe(('freetimes', 1, '2099-01-01'), fetch),
+                             coalescer.probe(('freetimes', 1, '2099-01-02'), fetch))
+        return fetch.calls
+
+    assert run(scenario()) == 2
+
+
+def test_result_is_shared_within_share_window_only():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=20)
+        fetch = FakeFetch()
+        key = ('freetimes', 1, '2099-01-01')
+
+        await coalescer.probe(key, fetch)
+        await asyncio.sleep(19)
+        await coalescer.probe(key, fetch)
+        calls_within_window = fetch.calls
+
+        await asyncio.sleep(2)
+        await coalescer.probe(key, fetch)
+        return calls_within_window, fetch.calls
+
+    assert run(scenario()) == (1, 2)
+
+
+def test_follower_fetches_on_its_own_when_leader_fails():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=20)
+        key = ('freetimes', 1, '2099-01-01')
+        failing_fetch = FakeFetch(error=ValueError('session expired'))
+        fetch = FakeFetch()
+
+        leader = asyncio.create_task(coalescer.probe(key, failing_fetch))
+        await asyncio.sleep(0)
+        follower_result = await coalescer.probe(key, fetch)
+
+        with pytest.raises(ValueError):
+            await leader
+
+        return follower_result, fetch.calls
+
+    assert run(scenario()) == ('slots', 1)
+
+
+def test_follower_fetches_on_its_own_when_leader_is_cancelled():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=20)
+        key = ('freetimes', 1, '2099-01-01')
+        fetch = FakeFetch()
+
+        leader = asyncio.create_task(coalescer.probe(key, FakeFetch(latency=10)))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(coalescer.probe(key, fetch))
+        await asyncio.sleep(1)
+        leader.cancel()
+
+        return await follower, fetch.calls
+
+    assert run(scenario()) == ('slots', 1)
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def scenario():
+        coalescer = ProbeCoalescer(share_seconds=20)
+        key = ('freetimes', 1, '2099-01-01')
+
+        leader = asyncio.create_task(coalescer.probe(key, FakeFetch()))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(coalescer.probe(key, FakeFetch()))
+        await asyncio.sleep(0.5)
+        follower.cancel()
+
+        return await leader
+
+    assert run(scenario()) == 'slots'
@@ -0,0 +1,89 @@
+import asyncio
+import time
+
+from benchmarks.virtual_clock import VirtualClock
+from utils.rate_limiter import TokenBucketRateLimiter
+
+
+def run(coroutine):
+    return VirtualClock(start=1000).run(coroutine)
+
+
+def test_burst_is_not_delayed_and_next_request_waits_for_refill():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(rate_per_second=0.5, capacity=3)
+        started_at = time.monotonic()
+        acquired_at = []
+
+        for _ in range(5):
+            await limiter.acquire()
+            acquired_at.append(time.monotonic() - started_at)
+
+        return acquired_at
+
+    assert run(scenario()) == [0, 0, 0, 2, 4]
+
+
+def test_tokens_are_not_gathered_above_capacity():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(rate_per_second=1, capacity=2)
+        await asyncio.sleep(100)
+        started_at = time.monotonic()
+
+        for _ in range(3):
+            await limiter.acquire()
+
+        return time.monotonic() - started_at
+
+    assert run(scenario()) == 1
+
+
+def test_concurrent_waiters_are_released_in_order_one_by_one():
+    async def scenario():
+        limiter = TokenBucketRateLimiter(rate_per_second=1, capacity=1)
+        started_at = time.monotonic()
+        acquired = []
+
+        async def acquire(name: str):
+            await limiter.acquire()
+            acquired.append((name, time.monotonic() - started_at))
+
+        await asyncio.gather(*(acquire(name) for name in 'abc'))
+        return acquired
+
+    assert run(scenario()) == [('a', 0), ('b', 1), ('c', 2)]
+
+
+def test_rate_change_keeps_tokens_gathered_with_previous_rate():
+    with VirtualClock(start=1000).patched() as clock:
+        limiter = TokenBucketRateLimiter(rate_per_second=1, capacity=5)
+        limiter.tokens = 0
+
+        clock.advance(2)
+        limiter.set_rate(rate_per_second=0.1, capacity=5)
+
+        assert limiter.tokens == 2
+        clock.advance(10)
+        assert limiter.wait_seconds() == 0
+        assert limiter.try_acquire() and limiter.try_acquire() and limiter.try_acquire()
+        assert not limiter.try_acquire()
+
+
+def test_lower_capacity_drops_extra_tokens():
+    limiter = TokenBucketRateLimiter(rate_per_second=1, capacity=10)
+
+    limiter.set_rate(rate_per_second=1, capacity=2)
+
+    assert limiter.tokens == 2
+
+
+def test_try_acquire_does_not_wait_and_reports_wait_time():
+    with VirtualClock(start=1000).patched() as clock:
+        limiter = TokenBucketRateLimiter(rate_per_second=0.5, capacity=1)
+
+        assert limiter.try_acquire()
+        assert not limiter.try_acquire()
+        assert limiter.wait_seconds() == 2
+
+        clock.advance(2)
+        assert limiter.try_acquire()
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+import pytest
+
+from benchmarks.virtual_clock import VirtualClock
+from captcha.solve_budget import CaptchaSolveBudget
+from config.configuration import SEARCH_CIRCUIT_FAILURE_THRESHOLD, SEARCH_CIRCUIT_OPEN_SECONDS, SEARCH_MIN_RATE_FRACTION
+from monitoring.search_controller import SearchFeedbackController, CircuitState, RATE_RECOVERY_STEP, \
+    SLOW_PROBE_BACKOFF
+from utils.rate_limiter import TokenBucketRateLimiter
+
+
+@pytest.fixture
+def clock():
+    with VirtualClock(start=1000).patched() as clock:
+        yield clock
+
+
+def controller(captcha_target_rate: float = 0.02) -> SearchFeedbackController:
+    return SearchFeedbackController(rate_limiter=TokenBucketRateLimiter(rate_per_second=1, capacity=10),
+                                    captcha_target_rate=captcha_target_rate, solve_budget=CaptchaSolveBudget(20))
+
+
+def test_single_captcha_among_first_requests_does_not_slow_down(clock):
+    search_controller = controller()
+
+    search_controller.record_captcha()
+
+    assert search_controller.rate_fraction == 1.0
+
+
+def test_captcha_rate_above_target_halves_request_rate(clock):
+    search_controller = controller()
+
+    search_controller.record_captcha()
+    search_controller.record_captcha()
+
+    assert search_controller.rate_fraction == 0.5
+    assert search_controller.rate_limiter.rate_per_second == 0.5
+    assert search_controller.rate_limiter.capacity == 5
+
+
+def test_request_rate_is_not_slowed_down_below_min_fraction(clock):
+    search_controller = controller()
+
+    for _ in range(20):
+        search_controller.record_captcha()
+
+    assert search_controller.rate_fraction == SEARCH_MIN_RATE_FRACTION
+
+
+def test_successful_requests_recover_rate_additively(clock):
+    search_controller = controller(captcha_target_rate=0.5)
+    search_controller._set_rate_fraction(0.5)
+
+    search_controller.record_probe(200, latency=0.1)
+    search_controller.record_probe(200, latency=0.1)
+
+    assert search_controller.rate_fraction == pytest.approx(0.5 + 2 * RATE_RECOVERY_STEP)
+
+
+def test_slow_request_slows_rate_down(clock):
+    search_controller = controller()
+
+    search_controller.record_probe(200, latency=60)
+
+    assert search_controller.rate_fraction == pytest.approx(SLOW_PROBE_BACKOFF)
+
+
+def test_captcha_redirect_is_not_counted_as_failure(clock):
+    search_controller = controller()
+
+    for _ in range(SEARCH_CIRCUIT_FAILURE_THRESHOLD):
+        search_controller.record_probe(302, latency=0.1)
+
+    assert search_controller.state == CircuitState.CLOSED
+
+
+def test_old_outcomes_leave_feedback_window(clock):
+    search_controller = controller()
+    search_controller.record_captcha()
+
+    clock.advance(search_controller.window_seconds + 1)
+    search_controller.record_captcha()
+
+    assert len(search_controller.captcha_timestamps) == 1
+    assert search_controller.rate_fraction == 1.0
+
+
+def test_circuit_opens_after_failures_and_closes_after_successful_trial():
+    async def scenario():
+        search_controller = controller()
+
+        for _ in range(SEARCH_CIRCUIT_FAILURE_THRESHOLD - 1):
+            search_controller.record_error()
+        assert search_controller.state == CircuitState.CLOSED
+
+        search_controller.record_probe(500, latency=0.1)
+        assert search_controller.state == CircuitState.OPEN
+
+        started_at = time.monotonic()
+        await search_controller.before_probe()
+        paused_seconds = time.monotonic() - started_at
+        assert search_controller.state == CircuitState.HALF_OPEN
+
+        search_controller.record_probe(200, latency=0.1)
+        return paused_seconds, search_controller.state
+
+    assert VirtualClock(start=1000).run(scenario()) == (SEARCH_CIRCUIT_OPEN_SECONDS[0], CircuitState.CLOSED)
+
+
+def test_failed_trial_reopens_circuit_for_longer_pause():
+    async def scenario():
+        search_controller = controller()
+
+        for _ in range(SEARCH_CIRCUIT_FAILURE_THRESHOLD):
+            search_controller.record_error()
+
+        await search_controller.before_probe()
+        search_controller.record_error()
+
+        started_at = time.monotonic()
+        await search_controller.before_probe()
+        return time.monotonic() - started_at
+
+    assert VirtualClock(start=1000).run(scenario()) == SEARCH_CIRCUIT_OPEN_SECONDS[1]
+
+
+def test_only_one_trial_request_is_sent_while_half_open():
+    async def scenario():
+        search_controller = controller()
+
+        for _ in range(SEARCH_CIRCUIT_FAILURE_THRESHOLD):
+            search_controller.record_error()
+
+        trial_sent_at = []
+
+        async def probe():
+            await search_controller.before_probe()
+            trial_sent_at.append(time.monotonic())
+            await asyncio.sleep(0.5)
+            search_controller.record_probe(200, latency=0.5)
+
+        await asyncio.gather(probe(), probe())
+        return trial_sent_at[1] - trial_sent_at[0]
+
+    # Second request waits until trial reports back
+    assert VirtualClock(start=1000).run(scenario()) >= 0.5
+
+
+def test_captcha_budget_caps_solves_per_hour(clock):
+    solve_budget = CaptchaSolveBudget(max_solves_per_hour=2)
+
+    assert solve_budget.try_acquire()
+    clock.advance(600)
+    assert solve_budget.try_acquire()
+    assert not solve_budget.try_acquire()
+    assert solve_budget.wait_seconds() == 3000
+
+    clock.advance(3000)
+    assert solve_budget.try_acquire()
+    assert solve_budget.spent == 3
+    assert solve_budget.summary() == '2/2'
@@ -0,0 +1,110 @@
+import json
+
+from benchmarks.virtual_clock import VirtualClock
+from model.models import Slot
+from monitoring.slot_changes import FreeSlotsParser, SlotChangeDetector
+
+OFFICE_ID = 151
+DATE = '2099-01-01'
+
+
+def slot(slot_id: int, detected_at: float = None) -> Slot:
+    return Slot(date=DATE, slot_id=slot_id, ch_time='09:00', office_id=OFFICE_ID, detected_at=detected_at)
+
+
+def response(*slot_ids: int) -> str:
+    return json.dumps({'rows': [{'id': slot_id, 'chtime': '09:00'} for slot_id in slot_ids]})
+
+
+def ids(slots: list[Slot]) -> list[int]:
+    return [slot.id for slot in slots]
+
+
+class CountingParse:
+    def __init__(self, content: str, detected_at: float = None):
+        self.content = content
+        self.detected_at = detected_at
+        self.calls = 0
+
+    def __call__(self) -> list[Slot]:
+        self.calls += 1
+        return [slot(item['id'], self.detected_at) for item in json.loads(self.content)['rows']]
+
+
+def test_unchanged_response_is_not_parsed_again():
+    parser = FreeSlotsParser()
+    slots, appeared = parser.parse(OFFICE_ID, DATE, response(1, 2), CountingParse(response(1, 2)))
+    assert ids(appeared) == [1, 2]
+
+    parse = CountingParse(response(1, 2))
+    slots_again, appeared_again = parser.parse(OFFICE_ID, DATE, response(1, 2), parse)
+
+    assert parse.calls == 0
+    assert slots_again == slots
+    assert appeared_again == []
+
+
+def test_listed_slot_keeps_time_of_first_detection():
+    parser = FreeSlotsParser()
+    parser.parse(OFFICE_ID, DATE, response(1), CountingParse(response(1), detected_at=100))
+
+    slots, appeared = parser.parse(OFFICE_ID, DATE, response(1, 2), CountingParse(response(1, 2), detected_at=200))
+
+    assert {slot.id: slot.detected_at for slot in slots} == {1: 100, 2: 200}
+    assert ids(appeared) == [2]
+
+
+def test_same_response_of_other_date_is_parsed():
+    parser = FreeSlotsParser()
+    parser.parse(OFFICE_ID, DATE, response(1), CountingParse(response(1)))
+
+    parse = CountingParse(response(1))
+    _, appeared = parser.parse(OFFICE_ID, '2099-01-02', response(1), parse)
+
+    assert parse.calls == 1
+    assert ids(appeared) == [1]
+
+
+def test_offered_slot_is_offered_again_only_after_lingering_retry():
+    with VirtualClock(start=1000).patched() as clock:
+        detector = SlotChangeDetector(lingering_retry_seconds=600, negative_cache_seconds=60)
+
+        assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1)])) == [1]
+        detector.mark_offered([slot(1)])
+
+        clock.advance(599)
+        assert detector.new_slots(OFFICE_ID, DATE, [slot(1)]) == []
+
+        clock.advance(1)
+        assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1)])) == [1]
+
+
+def test_slot_which_was_not_offered_is_returned_again():
+    # Slots of probe thrown away in fan-out sweep are not lost
+    detector = SlotChangeDetector()
+    detector.new_slots(OFFICE_ID, DATE, [slot(1)])
+
+    assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1)])) == [1]
+
+
+def test_reappeared_slot_is_offered_right_away():
+    detector = SlotChangeDetector(lingering_retry_seconds=600)
+    detector.new_slots(OFFICE_ID, DATE, [slot(1)])
+    detector.mark_offered([slot(1)])
+    detector.new_slots(OFFICE_ID, DATE, [])
+
+    assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1)])) == [1]
+
+
+def test_failed_slot_is_skipped_until_negative_cache_expires():
+    with VirtualClock(start=1000).patched() as clock:
+        detector = SlotChangeDetector(lingering_retry_seconds=600, negative_cache_seconds=60)
+        detector.new_slots(OFFICE_ID, DATE, [slot(1)])
+        detector.mark_failed(slot(1))
+        detector.new_slots(OFFICE_ID, DATE, [])
+
+        # Reappeared slot is still skipped
+        assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1), slot(2)])) == [2]
+
+        clock.advance(60)
+        assert ids(detector.new_slots(OFFICE_ID, DATE, [slot(1), slot(2)])) == [1, 2]
@@ -0,0 +1,66 @@
+from model.models import Slot
+from monitoring.slot_ranking import SlotRanker
+
+
+def slot(slot_id: int, date: str, ch_time: str, office_id: int = 1) -> Slot:
+    return Slot(date=date, slot_id=slot_id, ch_time=ch_time, office_id=office_id)
+
+
+def ranked_ids(ranker: SlotRanker) -> list[int]:
+    return [slot.id for slot in ranker.rank()]
+
+
+def test_earliest_date_goes_first_regardless_of_preferences():
+    ranker = SlotRanker(preferred_time_windows=[('08:00', '10:00')], preferred_office_ids=[2])
+    ranker.replace([slot(1, '2099-01-02', '09:00', office_id=2), slot(2, '2099-01-01', '16:00', office_id=1)])
+
+    assert ranked_ids(ranker) == [2, 1]
+
+
+def test_preferred_time_window_goes_before_preferred_office():
+    ranker = SlotRanker(preferred_time_windows=[('08:00', '10:00')], preferred_office_ids=[2, 1])
+    ranker.replace([
+        slot(1, '2099-01-01', '16:00', office_id=2),
+        slot(2, '2099-01-01', '09:40', office_id=1),
+        slot(3, '2099-01-01', '09:00', office_id=3),
+    ])
+
+    # Office 3 is not preferred at all, so it goes after both preferred offices within the same window
+    assert ranked_ids(ranker) == [2, 3, 1]
+
+
+def test_time_window_bounds_are_inclusive():
+    ranker = SlotRanker(preferred_time_windows=[('08:00', '10:00')])
+    ranker.replace([slot(1, '2099-01-01', '07:40'), slot(2, '2099-01-01', '10:00'), slot(3, '2099-01-01', '08:00')])
+
+    assert ranked_ids(ranker) == [3, 2, 1]
+
+
+def test_without_preferences_slots_are_ranked_by_date_and_time():
+    ranker = SlotRanker(preferred_time_windows=[], preferred_office_ids=[])
+    ranker.replace([slot(1, '2099-01-01', '12:00'), slot(2, '2099-01-01', '08:00'), slot(3, '2098-12-31', '17:00')])
+
+    assert ranked_ids(ranker) == [3, 2, 1]
+
+
+def test_slots_sharing_time_are_kept_and_removed_one_by_one():
+    ranker = SlotRanker(preferred_time_windows=[], preferred_office_ids=[])
+    first, second = slot(1, '2099-01-01', '09:00'), slot(2, '2099-01-01', '09:00')
+    ranker.replace([first, second])
+    assert len(ranker) == 2
+
+    ranker.remove(first)
+    assert ranked_ids(ranker) == [2]
+
+    ranker.remove(second)
+    assert len(ranker) == 0
+    assert ranker.rank() == []
+
+
+def test_replace_drops_candidates_of_previous_sweep():
+    ranker = SlotRanker(preferred_time_windows=[], preferred_office_ids=[])
+    ranker.replace([slot(1, '2099-01-01', '09:00')])
+
+    ranker.replace([slot(2, '2099-01-02', '09:00')])
+
+    assert ranked_ids(ranker) == [2]
@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Any
+
+from loguru import logger
+from selenium.webdriver import Chrome
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+from utils.histogram import LatencyHistogram
+
+DEFAULT_WAIT_TIMEOUT_SECONDS = 30
+
+
+# Runs blocking WebDriver commands on a dedicated thread of the browser, so the event loop stays responsive.
+# Single worker serializes all commands, since WebDriver session is not thread-safe.
+class AsyncDriver:
+    def __init__(self, webdriver: Chrome, name: str = 'browser'):
+        self.webdriver = webdriver
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"webdriver-{name}")
+        self.command_latency: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+
+    async def run(self, command: str, fn: Callable, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        started_at = time.perf_counter()
+
+        try:
+            return await loop.run_in_executor(self.executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self.command_latency[command].observe(time.perf_counter() - started_at)
+
+    async def get(self, url: str):
+        await self.run('get', self.webdriver.get, url)
+
+    async def refresh(self):
+        await self.run('refresh', self.webdriver.refresh)
+
+    async def current_url(self) -> str:
+        return await self.run('current_url', lambda: self.webdriver.current_url)
+
+    async def page_source(self) -> str:
+        return await self.run('page_source', lambda: self.webdriver.page_source)
+
+    async def execute_script(self, script: str, *args) -> Any:
+        return await self.run('execute_script', self.webdriver.execute_script, script, *args)
+
+    async def execute_cdp_cmd(self, cmd: str, params: dict) -> Any:
+        return await self.run(f'cdp:{cmd}', self.webdriver.execute_cdp_cmd, cmd, params)
+
+    async def find_element(self, by: str, value: str) -> WebElement:
+        return await self.run('find_element', self.webdriver.find_element, by=by, value=value)
+
+    async def find_elements(self, by: str, value: str) -> list[WebElement]:
+        return await self.run('find_elements', self.webdriver.find_elements, by=by, value=value)
+
+    async def implicitly_wait(self, seconds: float):
+        await self.run('implicitly_wait', self.webdriver.implicitly_wait, seconds)
+
+    async def get_cookies(self) -> list[dict]:
+        return await self.run('get_cookies', self.webdriver.get_cookies)
+
+    async def add_cookie(self, cookie: dict):
+        await self.run('add_cookie', self.webdriver.add_cookie, cookie)
+
+    async def delete_all_cookies(self):
+        await self.run('delete_all_cookies', self.webdriver.delete_all_cookies)
+
+    async def save_screenshot(self, file_path: str) -> bool:
+        return await self.run('save_screenshot', self.webdriver.save_screenshot, file_path)
+
+    async def click(self, element: WebElement):
+        await self.run('click', element.click)
+
+    async def send_keys(self, element: WebElement, text: str):
+        await self.run('send_keys', element.send_keys, text)
+
+    async def get_attribute(self, element: WebElement, name: str) -> str:
+        return await self.run('get_attribute', element.get_attribute, name)
+
+    async def wait_until(self, condition: Callable, timeout: float = DEFAULT_WAIT_TIMEOUT_SECONDS) -> Any:
+        return await self.run('wait_until', WebDriverWait(driver=self.webdriver, timeout=timeout).until, condition)
+
+    async def wait_visible(self, by: str, value: str, timeout: float = DEFAULT_WAIT_TIMEOUT_SECONDS) -> WebElement:
+        def command():
+            element = self.webdriver.find_element(by=by, value=value)
+            return WebDriverWait(driver=self.webdriver, timeout=timeout).until(EC.visibility_of(element))
+
+        return await self.run('wait_visible', command)
+
+    async def click_when_clickable(self, by: str, value: str, timeout: float = DEFAULT_WAIT_TIMEOUT_SECONDS):
+        def command():
+            element = self.webdriver.find_element(by=by, value=value)
+            WebDriverWait(driver=self.webdriver, timeout=timeout).until(EC.element_to_be_clickable(element)).click()
+
+        await self.run('click_when_clickable', command)
+
+    def latency_report(self) -> str:
+        lines = [f"WebDriver command latency for '{self.name}':"]
+        for command, histogram in sorted(self.command_latency.items(), key=lambda item: -item[1].sum):
+            lines.append(f"  {command}: {histogram.summary()}")
+
+        return '\n'.join(lines)
+
+    def log_latency_report(self):
+        if self.command_latency:
+            logger.info(self.latency_report())
+
+    async def quit(self):
+        try:
+            await self.run('quit', self.webdriver.quit)
+        finally:
+            self.executor.shutdown(wait=False)
@@ -0,0 +1,163 @@
+import asyncio
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+
+from config.configuration import BROWSER_POOL_MAX_SESSIONS, BROWSER_POOL_MAX_MEMORY_MB, BROWSER_SESSION_MEMORY_MB, \
+    BROWSER_SESSION_MAX_AGE_HOURS, BROWSER_PROFILES_FOLDER
+from utils.async_driver import AsyncDriver
+from utils.driver_utils import setup_chrome_driver
+
+HEALTH_CHECK_TIMEOUT_SECONDS = 10
+QUIT_TIMEOUT_SECONDS = 30
+
+
+class BrowserSession:
+    def __init__(self, session_id: int, driver: AsyncDriver, profile_dir: str):
+        self.id = session_id
+        self.driver = driver
+        self.profile_dir = profile_dir
+        self.created_at = time.monotonic()
+        self.leased = False
+
+    @property
+    def age_hours(self) -> float:
+        return (time.monotonic() - self.created_at) / 3600
+
+    def __repr__(self):
+        return f"BrowserSession(id={self.id}, profile_dir='{self.profile_dir}' leased={self.leased})"
+
+
+class BrowserPool:
+    def __init__(self, max_sessions: int = BROWSER_POOL_MAX_SESSIONS, max_memory_mb: int = BROWSER_POOL_MAX_MEMORY_MB,
+                 session_memory_mb: int = BROWSER_SESSION_MEMORY_MB, profiles_folder: str = BROWSER_PROFILES_FOLDER):
+        self.capacity = max(1, min(max_sessions, max_memory_mb // session_memory_mb))
+        self.profiles_folder = profiles_folder
+        self.sessions: list[BrowserSession] = []
+        # Sessions which are being started count towards capacity as well
+        self.starting_count = 0
+        self.start_tasks: set[asyncio.Task] = set()
+        self.next_session_id = 1
+        self.condition = asyncio.Condition()
+
+    async def lease(self, timeout: Optional[float] = None) -> BrowserSession:
+        return await asyncio.wait_for(self._lease(), timeout=timeout)
+
+    async def _lease(self) -> BrowserSession:
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(
+                    lambda: any(not s.leased for s in self.sessions) or self._total_count() < self.capacity
+                )
+
+                idle_session = next((s for s in self.sessions if not s.leased), None)
+                if idle_session:
+                    idle_session.leased = True
+                else:
+                    self.starting_count += 1
+
+            if idle_session:
+                try:
+                    healthy = await self._is_healthy(idle_session)
+                except asyncio.CancelledError:
+                    # Lease timed out or search was stopped during health check, so session goes back to pool
+                    await self.release(idle_session)
+                    raise
+
+                if healthy:
+                    logger.info(f"Leased {idle_session} from browser pool")
+                    return idle_session
+
+                logger.warning(f"{idle_session} failed health check. Recycling...")
+                await self._destroy(idle_session)
+                continue
+
+            # Browser start in thread cannot be interrupted, so it runs apart from waiter, which could give up on it
+            lease = asyncio.get_running_loop().create_future()
+            start_task = asyncio.create_task(self._start_session(lease))
+            self.start_tasks.add(start_task)
+            start_task.add_done_callback(self.start_tasks.discard)
+
+            session = await lease
+            logger.info(f"Leased new {session} from browser pool ({len(self.sessions)}/{self.capacity} sessions)")
+            return session
+
+    async def _start_session(self, lease: asyncio.Future):
+        session = None
+
+        try:
+            session = await self._create_session()
+        except Exception as e:
+            if not lease.done():
+                lease.set_exception(e)
+        finally:
+            async with self.condition:
+                self.starting_count -= 1
+
+                if session:
+                    self.sessions.append(session)
+
+                    # Session started for waiter which is gone (timeout or stopped search) is left idle in pool
+                    if not lease.done():
+                        session.leased = True
+                        lease.set_result(session)
+                elif not lease.done():
+                    lease.cancel()
+
+                self.condition.notify_all()
+
+    async def release(self, session: BrowserSession, recycle: bool = False):
+        if recycle or session.age_hours > BROWSER_SESSION_MAX_AGE_HOURS:
+            logger.info(f"Recycling {session} on return to browser pool")
+            await self._destroy(session)
+            return
+
+        async with self.condition:
+            session.leased = False
+            self.condition.notify_all()
+
+    async def close(self):
+        # Browsers being started are registered first, so none of them is left running
+        await asyncio.gather(*self.start_tasks, return_exceptions=True)
+
+        for session in list(self.sessions):
+            await self._destroy(session)
+
+    def _total_count(self) -> int:
+        return len(self.sessions) + self.starting_count
+
+    async def _create_session(self) -> BrowserSession:
+        session_id = self.next_session_id
+        self.next_session_id += 1
+
+        profile_dir = str(Path(f"{self.profiles_folder}/session_{session_id}").absolute())
+        webdriver = await asyncio.to_thread(setup_chrome_driver, profile_dir)
+
+        return BrowserSession(session_id=session_id, driver=AsyncDriver(webdriver=webdriver, name=f"session-{session_id}"),
+                              profile_dir=profile_dir)
+
+    @staticmethod
+    async def _is_healthy(session: BrowserSession) -> bool:
+        try:
+            await asyncio.wait_for(session.driver.current_url(), timeout=HEALTH_CHECK_TIMEOUT_SECONDS)
+            return True
+        except Exception as e:
+            logger.warning(f"Health check of {session} failed: {str(e)}")
+            return False
+
+    async def _destroy(self, session: BrowserSession):
+        try:
+            await asyncio.wait_for(session.driver.quit(), timeout=QUIT_TIMEOUT_SECONDS)
+        except Exception as e:
+            logger.warning(f"Cannot quit {session} gracefully: {str(e)}. Killing browser service...")
+            session.driver.webdriver.service.stop()
+        finally:
+            shutil.rmtree(session.profile_dir, ignore_errors=True)
+
+            async with self.condition:
+                if session in self.sessions:
+                    self.sessions.remove(session)
+                self.condition.notify_all()
@@ -0,0 +1,52 @@
+import asyncio
+from pathlib import Path
+
+from watchdog.events import FileSystemEventHandler, FileSystemEvent
+from watchdog.observers import Observer
+
+# Chrome keeps file with this suffix until download is completed, then renames it
+PARTIAL_DOWNLOAD_SUFFIX = '.crdownload'
+
+
+def is_completed_download(path: Path) -> bool:
+    return path.is_file() and path.suffix != PARTIAL_DOWNLOAD_SUFFIX and not path.name.startswith('.')
+
+
+class DownloadCompletedHandler(FileSystemEventHandler):
+    def __init__(self, loop: asyncio.AbstractEventLoop, future: asyncio.Future):
+        self.loop = loop
+        self.future = future
+
+    def on_created(self, event: FileSystemEvent):
+        self._complete(event.src_path)
+
+    def on_moved(self, event: FileSystemEvent):
+        self._complete(event.dest_path)
+
+    def _complete(self, file_path: str):
+        if is_completed_download(Path(file_path)):
+            self.loop.call_soon_threadsafe(self._set_result, Path(file_path))
+
+    def _set_result(self, file_path: Path):
+        if not self.future.done():
+            self.future.set_result(file_path)
+
+
+async def wait_for_download(directory: Path, timeout: float) -> Path:
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    observer = Observer()
+    observer.schedule(DownloadCompletedHandler(loop, future), str(directory), recursive=False)
+    observer.start()
+
+    try:
+        # File could be completed before observer has started
+        for file_path in directory.iterdir():
+            if is_completed_download(file_path):
+                return file_path
+
+        return await asyncio.wait_for(future, timeout=timeout)
+    finally:
+        observer.stop()
+        await asyncio.to_thread(observer.join)
@@ -0,0 +1,66 @@
+import json
+import re
+import subprocess
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from webdriver_manager.core.os_manager import OperationSystemManager, ChromeType
+
+from config.configuration import CHROMEDRIVER_CACHE_FILE
+
+VERSION_COMMAND_TIMEOUT_SECONDS = 10
+
+
+def major_version(version: Optional[str]) -> Optional[str]:
+    match = re.search(r'(\d+)\.\d+', version or '')
+    return match.group(1) if match else None
+
+
+def local_chrome_version() -> Optional[str]:
+    # Version is read from installed browser binary or registry, without network access
+    return OperationSystemManager().get_browser_version_from_os(ChromeType.GOOGLE)
+
+
+def chromedriver_version(driver_path: str) -> Optional[str]:
+    try:
+        output = subprocess.run([driver_path, '--version'], capture_output=True, text=True,
+                                timeout=VERSION_COMMAND_TIMEOUT_SECONDS).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.warning(f"Cannot get version of chromedriver '{driver_path}': {str(e)}")
+        return None
+
+    return major_version(output)
+
+
+def install_chromedriver() -> str:
+    # Imported only when cached driver doesn't match local browser, since resolution goes over network
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    return ChromeDriverManager().install()
+
+
+@lru_cache(maxsize=1)
+def resolve_chromedriver(cache_file: str = CHROMEDRIVER_CACHE_FILE) -> str:
+    cache_path = Path(cache_file)
+    cached = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+    cached_path = cached.get('driver_path')
+    chrome_major = major_version(local_chrome_version())
+
+    if cached_path and Path(cached_path).exists() and chrome_major and cached.get('driver_major') == chrome_major:
+        logger.info(f"Using cached chromedriver '{cached_path}' (Chrome {chrome_major})")
+        return cached_path
+
+    logger.info(f"Cached chromedriver doesn't match local Chrome {chrome_major}. Resolving chromedriver...")
+
+    try:
+        driver_path = install_chromedriver()
+    except Exception as e:
+        if cached_path and Path(cached_path).exists():
+            logger.warning(f"Cannot resolve chromedriver: {str(e)}. Falling back to cached '{cached_path}'...")
+            return cached_path
+        raise
+
+    cache_path.write_text(json.dumps({'driver_path': driver_path, 'driver_major': chromedriver_version(driver_path)}))
+    return driver_path
@@ -1,17 +1,20 @@
-import asyncio
 from pathlib import Path
-from time import time
+from time import time, perf_counter
+from typing import Optional
+from urllib.parse import urlsplit
 
-from selenium.webdriver import Keys, ActionChains
+from loguru import logger
 from selenium.webdriver import Chrome
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 
-from config.configuration import SCREENSHOTS_FOLDER, HSC_OFFICE_LOCATION, BROWSER_DOWNLOADS_FOLDER, HEADLESS_MODE
+from config.configuration import SCREENSHOTS_FOLDER, HSC_OFFICE_LOCATION, BROWSER_DOWNLOADS_FOLDER, HEADLESS_MODE, \
+    HSC_BASE_URL
+from utils.async_driver import AsyncDriver
+from utils.driver_resolver import resolve_chromedriver
 
 
-def setup_chrome_driver() -> Chrome:
+def setup_chrome_driver(profile_dir: Optional[str] = None) -> Chrome:
     options = webdriver.ChromeOptions()
     options.add_argument("--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/127.0.0.0 Safari/537.36")
     options.add_argument("--start-maximized")
@@ -19,6 +22,9 @@ def setup_chrome_driver() -> Chrome:
     if HEADLESS_MODE:
         options.add_argument('--headless')
     options.add_argument("--disable-blink-features=AutomationControlled")
+    if profile_dir:
+        # Isolated profile keeps cookies and storage of pooled sessions apart
+        options.add_argument(f"--user-data-dir={Path(profile_dir).absolute()}")
     prefs = {
         'download.default_directory': str(Path(BROWSER_DOWNLOADS_FOLDER).absolute()),
         "download.prompt_for_download": False,
@@ -30,7 +36,7 @@ def setup_chrome_driver() -> Chrome:
     options.add_experimental_option('prefs', prefs)
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
-    chrome_service = Service(executable_path=ChromeDriverManager().install())
+    chrome_service = Service(executable_path=resolve_chromedriver())
     driver = webdriver.Chrome(service=chrome_service, options=options)
 
     driver.execute_cdp_cmd("Emulation.setGeolocationOverride", HSC_OFFICE_LOCATION)
@@ -39,29 +45,39 @@ def setup_chrome_driver() -> Chrome:
     return driver
 
 
-async def take_screenshot(driver: Chrome) -> bool:
+async def set_geolocation(driver: AsyncDriver, location: dict):
+    await driver.execute_cdp_cmd("Emulation.setGeolocationOverride", location)
+
+
+async def take_screenshot(driver: AsyncDriver) -> bool:
     ts = int(time()) * 1000
     screenshot_file_path = Path(f"{SCREENSHOTS_FOLDER}/screenshot_{ts}.png").absolute()
-    return driver.save_screenshot(screenshot_file_path)
-
-
-async def cleanup_browser(driver: Chrome):
-    driver.delete_all_cookies()
-    driver.get('data:,')
-    # Cleanup browser cache
-    driver.execute_script("window.open('');")
-    await asyncio.sleep(2)
-    driver.switch_to.window(driver.window_handles[-1])
-    await asyncio.sleep(2)
-    driver.get('chrome://settings/clearBrowserData')
-    await asyncio.sleep(2)
-    actions = ActionChains(driver)
-    actions.send_keys(Keys.TAB * 3 + Keys.DOWN * 3)
-    actions.perform()
-    await asyncio.sleep(2)
-    actions = ActionChains(driver)
-    actions.send_keys(Keys.TAB * 4 + Keys.ENTER)
-    actions.perform()
-    await asyncio.sleep(5)
-    driver.close()
-    driver.switch_to.window(driver.window_handles[0])
+    return await driver.save_screenshot(str(screenshot_file_path))
+
+
+async def cleanup_browser(driver: AsyncDriver) -> bool:
+    # Browser data is cleared via DevTools commands, so it doesn't depend on Chrome settings page layout and locale
+    started_at = perf_counter()
+
+    try:
+        origins = {HSC_BASE_URL, urlsplit(await driver.current_url())._replace(path='', query='', fragment='').geturl()}
+
+        # Extra tabs and popups are closed, the current one is kept for the next search
+        current_target = await driver.run('current_window_handle', lambda: driver.webdriver.current_window_handle)
+        targets = (await driver.execute_cdp_cmd('Target.getTargets', {}))['targetInfos']
+        for target in targets:
+            if target['type'] == 'page' and target['targetId'] != current_target:
+                await driver.execute_cdp_cmd('Target.closeTarget', {'targetId': target['targetId']})
+
+        await driver.get('data:,')
+        await driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        await driver.execute_cdp_cmd('Network.clearBrowserCache', {})
+        for origin in origins:
+            if origin.startswith('http'):
+                await driver.execute_cdp_cmd('Storage.clearDataForOrigin', {'origin': origin, 'storageTypes': 'all'})
+    except Exception as e:
+        logger.error(f"Cannot cleanup browser: {str(e)}")
+        return False
+
+    logger.info(f"Browser data cleared in {perf_counter() - started_at:.3f}s")
+    return True
@@ -0,0 +1,89 @@
+import asyncio
+import inspect
+import time
+from typing import Any, Awaitable, Callable, Optional, Union
+
+from loguru import logger
+
+from config.configuration import EVENT_BUS_QUEUE_SIZE, EVENT_BUS_SHUTDOWN_TIMEOUT_SECONDS
+from model.events import Event
+from utils.metrics import metrics
+
+EventHandler = Callable[[Event], Union[Awaitable[Any], Any]]
+
+
+class Subscription:
+    def __init__(self, name: str, handler: EventHandler, event_types: tuple[type, ...], max_queue_size: int):
+        self.name = name
+        self.handler = handler
+        self.event_types = event_types
+        # Single queue per consumer keeps its events in publishing order (e.g. reservation before its approval)
+        self.queue: asyncio.Queue[Event] = asyncio.Queue(maxsize=max_queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+# In-process pub/sub of search events. Every consumer handles its events in its own task, so slow side effects
+# (history persistence, notifications) overlap with search instead of stalling it. Queues are bounded: when consumer
+# falls behind, publisher waits (backpressure) rather than piling events up in memory.
+class EventBus:
+    def __init__(self, max_queue_size: int = EVENT_BUS_QUEUE_SIZE):
+        self.max_queue_size = max_queue_size
+        self.subscriptions: list[Subscription] = []
+
+    def subscribe(self, name: str, handler: EventHandler, *event_types: type, max_queue_size: Optional[int] = None):
+        subscription = Subscription(name, handler, event_types or (Event,), max_queue_size or self.max_queue_size)
+        self.subscriptions.append(subscription)
+
+    def start(self):
+        for subscription in self.subscriptions:
+            if not subscription.task:
+                subscription.task = asyncio.create_task(self._consume(subscription))
+
+    async def stop(self):
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(subscription.queue.join() for subscription in self.subscriptions)),
+                timeout=EVENT_BUS_SHUTDOWN_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Event bus stopped with unhandled events: {self.summary()}")
+
+        for subscription in self.subscriptions:
+            if subscription.task:
+                subscription.task.cancel()
+                subscription.task = None
+
+    async def publish(self, event: Event):
+        metrics.inc('hsc_events_total', event=type(event).__name__)
+
+        for subscription in self.subscriptions:
+            if not isinstance(event, subscription.event_types) or not subscription.task:
+                continue
+
+            if subscription.queue.full():
+                metrics.inc('hsc_event_backpressure_total', consumer=subscription.name)
+                logger.warning(f"Event consumer '{subscription.name}' falls behind. Waiting to publish {event}...")
+
+            await subscription.queue.put(event)
+
+    def summary(self) -> str:
+        return ' '.join(f"{subscription.name}={subscription.queue.qsize()}" for subscription in self.subscriptions)
+
+    async def _consume(self, subscription: Subscription):
+        while True:
+            event = await subscription.queue.get()
+            started_at = time.perf_counter()
+
+            try:
+                result = subscription.handler(event)
+                if inspect.isawaitable(result):
+                    await result
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event consumer '{subscription.name}' failed to handle {event}: {str(e)}")
+                metrics.inc('hsc_event_handler_errors_total', consumer=subscription.name)
+            finally:
+                metrics.observe('hsc_event_handler_seconds', time.perf_counter() - started_at,
+                                consumer=subscription.name)
+                subscription.queue.task_done()
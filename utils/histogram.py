@@ -0,0 +1,67 @@
+import bisect
+import math
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+# Upper bounds of latency buckets in seconds
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, math.inf)
+
+
+class LatencyHistogram:
+    def __init__(self, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.bucket_counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        # Upper bound of the bucket containing requested percentile (exact max for the last one)
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(bound, self.max)
+
+        return self.max
+
+    def summary(self) -> str:
+        return (f"count={self.count} mean={self.mean:.3f}s p50<={self.percentile(0.5):.3f}s "
+                f"p95<={self.percentile(0.95):.3f}s max={self.max:.3f}s")
+
+
+class StepTimer:
+    def __init__(self, on_observe: Optional[Callable[[str, float], None]] = None):
+        self.steps: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.on_observe = on_observe
+
+    @contextmanager
+    def measure(self, step: str):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started_at
+            self.steps[step].observe(seconds)
+
+            if self.on_observe:
+                self.on_observe(step, seconds)
+
+    def summary(self) -> str:
+        return '\n'.join(f"  {step}: {histogram.summary()}" for step, histogram in self.steps.items())
@@ -0,0 +1,116 @@
+import asyncio
+import math
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from loguru import logger
+
+from utils.histogram import LatencyHistogram
+
+STAGE_SECONDS = 'hsc_stage_seconds'
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _render_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(labels) + list(extra or ())
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}' if pairs else ''
+
+
+# In-process counters and latency histograms of search pipeline stages, rendered for Prometheus and /stats command
+class MetricsRegistry:
+    def __init__(self):
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.histograms: dict[str, dict[tuple, LatencyHistogram]] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = _labels_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels):
+        series = self.histograms.setdefault(name, {})
+        series.setdefault(_labels_key(labels), LatencyHistogram()).observe(seconds)
+
+    @contextmanager
+    def measure(self, name: str, **labels):
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started_at, **labels)
+
+    def measure_stage(self, stage: str):
+        return self.measure(STAGE_SECONDS, stage=stage)
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        for name, series in self.counters.items():
+            lines.append(f"# TYPE {name} counter")
+            lines += [f"{name}{_render_labels(labels)} {value}" for labels, value in series.items()]
+
+        for name, series in self.histograms.items():
+            lines.append(f"# TYPE {name} histogram")
+
+            for labels, histogram in series.items():
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets, histogram.bucket_counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if math.isinf(bound) else str(bound)
+                    lines.append(f"{name}_bucket{_render_labels(labels, (('le', le),))} {cumulative}")
+
+                lines.append(f"{name}_sum{_render_labels(labels)} {histogram.sum}")
+                lines.append(f"{name}_count{_render_labels(labels)} {histogram.count}")
+
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> str:
+        lines = [f"uptime={(time.time() - self.started_at) / 3600:.1f}h"]
+
+        for name, series in self.histograms.items():
+            for labels, histogram in sorted(series.items()):
+                lines.append(f"{name.removeprefix('hsc_')}{_render_labels(labels)}: {histogram.summary()}")
+
+        for name, series in self.counters.items():
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name.removeprefix('hsc_')}{_render_labels(labels)}: {value:g}")
+
+        return '\n'.join(lines)
+
+
+metrics = MetricsRegistry()
+
+
+async def start_metrics_server(host: str, port: int, registry: MetricsRegistry = metrics) -> asyncio.Server:
+    # Plain HTTP responder is enough for Prometheus scraping, so no web framework is needed
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Headers are not needed, but have to be read before responding
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            path = request_line.decode(errors='replace').split(' ')[1] if request_line.count(b' ') >= 2 else ''
+
+            if path.split('?')[0] == '/metrics':
+                status, body = '200 OK', registry.render_prometheus()
+            else:
+                status, body = '404 Not Found', 'Not found\n'
+
+            payload = body.encode()
+            writer.write(f"HTTP/1.1 {status}\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload)
+            await writer.drain()
+        except Exception as e:
+            logger.warning(f"Cannot serve metrics request: {str(e)}")
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host=host, port=port)
+    logger.info(f"Metrics are exposed on http://{host}:{port}/metrics")
+    return server
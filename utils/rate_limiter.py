@@ -0,0 +1,51 @@
+import asyncio
+import time
+
+
+class TokenBucketRateLimiter:
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate_per_second)
+        self.updated_at = now
+
+    def set_rate(self, rate_per_second: float, capacity: int):
+        # Tokens gathered so far are counted with previous rate
+        self._refill()
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def try_acquire(self) -> bool:
+        # Token is not taken over waiters queued in 'acquire'
+        if self.lock.locked():
+            return False
+
+        self._refill()
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+    def wait_seconds(self) -> float:
+        self._refill()
+        return max(0.0, (1 - self.tokens) / self.rate_per_second)
+
+    async def acquire(self):
+        # Lock keeps waiters in FIFO order, so concurrent probes are released one by one
+        async with self.lock:
+            self._refill()
+
+            if self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate_per_second)
+                self._refill()
+
+            self.tokens -= 1